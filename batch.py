@@ -0,0 +1,162 @@
+from array import array
+from itertools import islice
+
+from extract import Point
+
+# Valor usado para coordenadas nulas nos arrays de coordenadas
+NAN = float('nan')
+
+class Dictionary:
+    '''
+    Codificação em dicionário de textos: cada valor distinto recebe um código
+    inteiro. O código 0 é reservado para valores nulos.
+    '''
+    def __init__(self):
+        # Valores, pelo código
+        self.values = [None]
+        self._codes = {None: 0}
+
+
+    def encode(self, value):
+        '''
+        Método para pegar o código de um valor, criando-o caso o valor seja novo
+
+        Returns:
+            int
+                Código do valor (posição em self.values)
+        '''
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+    def __len__(self):
+        return len(self.values) - 1
+
+
+class PointBatch:
+    '''
+    Lote colunar de Points, usado entre a geocodificação e a carga.
+    As coordenadas ficam em arrays de double (NaN para nulos) e os textos,
+    já normalizados (ver transform.Normalizer), são codificados em
+    dicionário, então cada Ponto ocupa apenas alguns números.
+    País, Estado, Cidade e Bairro formam um único lugar, para que as tabelas
+    de dimensão sejam consultadas uma vez por lugar distinto.
+    '''
+    def __init__(self):
+        self.lat = array('d')
+        self.lng = array('d')
+        self.street = array('l')
+        self.housenumber = array('l')
+        self.postal = array('l')
+        self.place = array('l')
+        self.streets = Dictionary()
+        self.housenumbers = Dictionary()
+        self.postals = Dictionary()
+        # Tuplas (País, Estado, Cidade, Bairro)
+        self.places = Dictionary()
+
+
+    @classmethod
+    def from_points(cls, points):
+        '''
+        Método para criar um lote a partir de Points
+
+        Args:
+            points : generator | list
+                Points (ver extract.Point)
+
+        Returns:
+            PointBatch
+                Lote com os Points
+        '''
+        batch = cls()
+        batch.extend(points)
+        return batch
+
+
+    def append(self, point):
+        '''
+        Método para adicionar um Point ao lote
+
+        Args:
+            point : Point
+                Dados do Ponto (ver extract.Point)
+        '''
+        self.lat.append(NAN if point.lat is None else point.lat)
+        self.lng.append(NAN if point.lng is None else point.lng)
+        self.street.append(self.streets.encode(point.street))
+        self.housenumber.append(self.housenumbers.encode(point.housenumber))
+        self.postal.append(self.postals.encode(point.postal))
+        self.place.append(self.places.encode((point.country, point.state,
+                                            point.city, point.suburb)))
+
+
+    def extend(self, points):
+        '''
+        Método para adicionar vários Points ao lote
+        '''
+        for point in points:
+            self.append(point)
+
+
+    def __len__(self):
+        return len(self.lat)
+
+
+    def point(self, i):
+        '''
+        Método para montar o Point de uma posição do lote
+
+        Returns:
+            Point
+                Dados do Ponto
+        '''
+        lat, lng = self.lat[i], self.lng[i]
+        country, state, city, suburb = self.places.values[self.place[i]] or (None,) * 4
+        return Point(lat=None if lat != lat else lat,
+                    lng=None if lng != lng else lng,
+                    street=self.streets.values[self.street[i]],
+                    housenumber=self.housenumbers.values[self.housenumber[i]],
+                    suburb=suburb,
+                    city=city,
+                    postal=self.postals.values[self.postal[i]],
+                    state=state,
+                    country=country)
+
+
+    def points(self):
+        '''
+        Método para percorrer os Points do lote
+
+        Returns:
+            Point : generator
+                Um gerador dos Points
+        '''
+        for i in range(len(self)):
+            yield self.point(i)
+
+
+def batches(points, size):
+    '''
+    Função para agrupar um gerador de Points em lotes
+
+    Args:
+        points : generator | list
+            Points (ver extract.Point)
+
+        size : int
+            Quantidade de Points por lote
+
+    Returns:
+        PointBatch : generator
+            Um gerador dos lotes. O último pode ter menos Points
+    '''
+    points = iter(points)
+    while True:
+        batch = PointBatch.from_points(islice(points, size))
+        if not len(batch):
+            return
+        yield batch
@@ -0,0 +1,406 @@
+'''
+Benchmark das etapas do ETL com dados sintéticos.
+
+São gerados arquivos de coordenadas no mesmo formato de data_points/
+(linhas de Latitude, Longitude e Distance), com uma proporção configurável
+de linhas 'sujas' (Latitudes e Longitudes sem par). Cada etapa é executada
+em um processo novo, para que o pico de memória (RSS) seja o da etapa:
+
+    read        leitura das linhas (extract.get_points)
+    clear       tratamento linha a linha (transform.clear_points)
+    clear_numpy tratamento em blocos (transform.clear_points_numpy)
+    geocode     acesso a um geocodificador falso com latência configurável
+    load        carga na Base de Dados (ETL.load_data)
+    etl         execução completa: leitura, tratamento, geocodificação e carga
+
+As etapas load e etl usam um database MySQL local separado (por padrão
+'etl_benchmark', que precisa existir e tem suas tabelas recriadas);
+sem conexão, são registradas como ignoradas.
+
+Os resultados (linhas/s, pontos/s e pico de RSS) são gravados em JSON,
+junto com o commit atual, para comparar execuções de commits diferentes.
+
+Exemplos de execução:
+
+    $ python3 benchmark.py -n 100000 -o bench.json
+
+    $ python3 benchmark.py -n 100000 -s read clear clear_numpy -cmp bench.json
+
+    $ python3 benchmark.py -H localhost -U root -P toor -D etl_benchmark -b 500
+'''
+import argparse
+import json
+import random
+import resource
+import subprocess
+import sys
+from datetime import date, datetime, timedelta
+from math import atan2, cos, degrees, radians, sqrt
+from multiprocessing import Pool
+from os import makedirs
+from os.path import abspath, dirname, join
+from shutil import rmtree
+from tempfile import mkdtemp
+from time import perf_counter, sleep
+
+import extract as exct
+import transform as trm
+from settings import DATABASE_SETTINGS
+
+STAGES = ('read', 'clear', 'clear_numpy', 'geocode', 'load', 'etl')
+
+
+class DatabaseUnavailable(Exception):
+    '''
+    Erro usado quando não é possível conectar ao database do benchmark
+    '''
+
+
+def _dms(value, positive, negative):
+    '''
+    Função auxiliar para formatar uma coordenada em graus, minutos e segundos
+    (ex.: 30°2′59″S), como nos arquivos de data_points/
+    '''
+    hemisphere = positive if value >= 0 else negative
+    value = abs(value)
+    minutes, seconds = divmod(round(value * 3600), 60)
+    degrees_, minutes = divmod(minutes, 60)
+    return '{}°{}′{}″{}'.format(degrees_, minutes, seconds, hemisphere)
+
+
+def generate_traces(path, n_points, n_files=1, dirty_ratio=0.05, seed=0,
+                    center=(-30.04, -51.2), radius=0.05):
+    '''
+    Função para gerar arquivos de coordenadas sintéticas no formato de data_points/
+
+    Args:
+        path : str
+            Diretório onde os arquivos são criados
+
+        n_points : int
+            Quantidade total de coordenadas
+
+        n_files : int
+            Quantidade de arquivos (um por dia)
+
+        dirty_ratio : float
+            Proporção de coordenadas com a linha de Latitude ou de Longitude faltando
+
+        seed : int
+            Semente do gerador de números aleatórios
+
+        center : tuple
+            Coordenada (lat, lng) em torno da qual as coordenadas são sorteadas
+
+        radius : float
+            Distância máxima (em graus) entre as coordenadas e o centro
+
+    Returns:
+        int
+            Quantidade de linhas escritas
+    '''
+    makedirs(path, exist_ok=True)
+    rand = random.Random(seed)
+    n_lines = 0
+    for i in range(n_files):
+        day = date(2018, 1, 1) + timedelta(days=i)
+        file_points = n_points // n_files + (1 if i < n_points % n_files else 0)
+        with open(join(path, 'data_points_{:%Y%m%d}.txt'.format(day)), 'w') as file:
+            for _ in range(file_points):
+                lat = center[0] + rand.uniform(-radius, radius)
+                lng = center[1] + rand.uniform(-radius, radius)
+                # Distância e direção a partir do centro, como nos arquivos originais
+                dlat, dlng = radians(lat - center[0]), radians(lng - center[1])
+                distance = 6371.0 * sqrt(dlat ** 2 + (dlng * cos(radians(center[0]))) ** 2)
+                bearing = degrees(atan2(dlng * cos(radians(center[0])), dlat)) % 360
+
+                lines = ['Latitude: {}   {:.8f}\n'.format(_dms(lat, 'N', 'S'), lat),
+                        'Longitude: {}   {:.8f}\n'.format(_dms(lng, 'E', 'W'), lng)]
+                if rand.random() < dirty_ratio:
+                    del lines[rand.randrange(2)]
+                lines.append('Distance: {:.4f} km  Bearing: {:.3f}°\n'.format(distance, bearing))
+                file.writelines(lines)
+                n_lines += len(lines)
+    return n_lines
+
+
+class StubGeocoder:
+    '''
+    Backend de geocodificação falso (ver geocoders.py), que aguarda `latency`
+    segundos por requisição e retorna um endereço determinístico, para medir
+    o ETL sem acessar a API de Mapas
+    '''
+    rate_limited = False
+
+    def __init__(self, latency=0.0, n_suburbs=50):
+        '''
+        Args:
+            latency : float
+                Tempo (em segundos) de cada requisição
+
+            n_suburbs : int
+                Quantidade de bairros distintos retornados
+        '''
+        self.latency = latency
+        self.n_suburbs = n_suburbs
+
+
+    def reverse(self, point):
+        '''
+        Método para pegar os dados (falsos) de uma coordenada
+
+        Returns:
+            dict
+                Dados do ponto (ver geocoders.FIELDS)
+        '''
+        if self.latency:
+            sleep(self.latency)
+        suburb = int(abs(point[0] * 1000 + point[1] * 1000)) % self.n_suburbs
+        return {'lat': point[0], 'lng': point[1],
+                'street': 'rua {}'.format(int(abs(point[1]) * 10000) % 1000),
+                'housenumber': str(int(abs(point[0]) * 1000000) % 2000),
+                'suburb': 'bairro {}'.format(suburb),
+                'city': 'cidade {}'.format(suburb % 5),
+                'postal': '90{:03d}-000'.format(suburb),
+                'state': 'rs',
+                'country': 'brasil'}
+
+
+def _geocoded_points(options, n_points):
+    '''
+    Função auxiliar que lê, trata e geocodifica (sem latência) as primeiras
+    `n_points` coordenadas dos arquivos sintéticos
+    '''
+    points = trm.clear_points(exct.get_points(options['path']))
+    data = exct.get_data_points((point for _, point in zip(range(n_points), points)),
+                                backend=StubGeocoder())
+    return list(trm.Normalizer().normalize_points(data))
+
+
+def _etl(options):
+    '''
+    Função auxiliar para criar um ETL conectado ao database do benchmark, com as tabelas vazias
+    '''
+    from etl import ETL
+
+    etl = ETL()
+    try:
+        etl.connect(**options['database'])
+    except Exception as e:
+        raise DatabaseUnavailable(str(e))
+    # Na ordem das chaves estrangeiras (ver main.TABLES)
+    etl.drop_tables(['Point', 'Ledger', 'Suburb', 'City', 'State', 'Country'])
+    etl.create_tables()
+    return etl
+
+
+def _counted(items, counter):
+    '''
+    Função auxiliar para contar os itens de um gerador à medida que são consumidos
+    '''
+    for item in items:
+        counter[0] += 1
+        yield item
+
+
+def _stage_read(options):
+    '''
+    Etapa de leitura das linhas dos arquivos
+    '''
+    start = perf_counter()
+    n_lines = sum(1 for _ in exct.get_points(options['path']))
+    return {'lines': n_lines, 'points': 0, 'seconds': perf_counter() - start}
+
+
+def _stage_clear(options):
+    '''
+    Etapa de tratamento das linhas, uma a uma
+    '''
+    start = perf_counter()
+    n_points = sum(1 for _ in trm.clear_points(exct.get_points(options['path'])))
+    return {'lines': options['lines'], 'points': n_points, 'seconds': perf_counter() - start}
+
+
+def _stage_clear_numpy(options):
+    '''
+    Etapa de tratamento das linhas em blocos, com NumPy
+    '''
+    start = perf_counter()
+    chunks = trm.clear_points_numpy(exct.get_files(options['path']))
+    n_points = sum(len(chunk) for chunk in chunks)
+    return {'lines': options['lines'], 'points': n_points, 'seconds': perf_counter() - start}
+
+
+def _stage_geocode(options):
+    '''
+    Etapa de geocodificação das primeiras coordenadas, com o geocodificador falso
+    '''
+    points = list(trm.clear_points(exct.get_points(options['path'])))[:options['geocode_points']]
+    start = perf_counter()
+    n_points = sum(1 for _ in exct.get_data_points(points, workers=options['workers'],
+                                                    backend=StubGeocoder(options['latency'])))
+    return {'lines': 0, 'points': n_points, 'seconds': perf_counter() - start}
+
+
+def _stage_load(options):
+    '''
+    Etapa de carga de Pontos já geocodificados na Base de Dados
+    '''
+    data = _geocoded_points(options, options['load_points'])
+    etl = _etl(options)
+    etl.data = data
+    start = perf_counter()
+    etl.load_data(commit=options['commit'], batch_size=options['batch_size'])
+    seconds = perf_counter() - start
+    etl.close()
+    return {'lines': 0, 'points': len(data), 'seconds': seconds}
+
+
+def _stage_etl(options):
+    '''
+    Execução completa do ETL com o geocodificador falso
+    '''
+    etl = _etl(options)
+    etl.geocoder = StubGeocoder(options['latency'])
+    start = perf_counter()
+    etl.extract_points_from_file(options['path'])
+    etl.clear_points()
+    etl.extract_data_from_API(workers=options['workers'])
+    n_points = [0]
+    etl.data = _counted(etl.data, n_points)
+    etl.load_data(commit=options['commit'], batch_size=options['batch_size'])
+    seconds = perf_counter() - start
+    etl.close()
+    return {'lines': options['lines'], 'points': n_points[0], 'seconds': seconds}
+
+
+def _run_stage(name, options):
+    '''
+    Função executada no processo de cada etapa: mede a etapa e o pico de memória do processo
+
+    Returns:
+        dict
+            Resultado da etapa: linhas/s, pontos/s, tempo e pico de RSS (em KB),
+            ou o motivo pelo qual a etapa foi ignorada
+    '''
+    try:
+        result = globals()['_stage_' + name](options)
+    except ImportError as e:
+        return {'skipped': 'missing module: {}'.format(e.name)}
+    except DatabaseUnavailable as e:
+        return {'skipped': 'database unavailable: {}'.format(e)}
+
+    seconds = max(result['seconds'], 1e-9)
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        # No macOS ru_maxrss é dado em bytes
+        peak_rss //= 1024
+    return {'lines': result['lines'],
+            'points': result['points'],
+            'seconds': round(seconds, 4),
+            'lines_per_sec': round(result['lines'] / seconds, 1),
+            'points_per_sec': round(result['points'] / seconds, 1),
+            'peak_rss_kb': peak_rss}
+
+
+def _commit():
+    '''
+    Função auxiliar para pegar o commit atual do repositório (None fora de um repositório git)
+    '''
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                    cwd=dirname(abspath(__file__)),
+                                    stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _compare(results, baseline_path):
+    '''
+    Função auxiliar para mostrar a variação da vazão de cada etapa em relação a um JSON anterior
+    '''
+    with open(baseline_path) as file:
+        baseline = json.load(file)
+    print('\nComparison with {} (commit {})'.format(baseline_path, baseline.get('commit')))
+    for name, result in results['stages'].items():
+        old = baseline.get('stages', {}).get(name, {})
+        metric = 'points_per_sec' if result.get('points') else 'lines_per_sec'
+        if metric not in result or not old.get(metric):
+            continue
+        change = (result[metric] / old[metric] - 1) * 100
+        print('{:<12} {:>12.1f} -> {:>12.1f} {}   {:+.1f}%'.format(
+            name, old[metric], result[metric], metric, change))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark das etapas do ETL com dados sintéticos')
+    parser.add_argument('-n', '--points', type=int, default=100000, help='Quantidade de coordenadas geradas')
+    parser.add_argument('-f', '--files', type=int, default=3, help='Quantidade de arquivos gerados')
+    parser.add_argument('-d', '--dirtyratio', type=float, default=0.05, help='Proporção de coordenadas sem Latitude ou Longitude')
+    parser.add_argument('-sd', '--seed', type=int, default=0, help='Semente do gerador de coordenadas')
+    parser.add_argument('-s', '--stages', nargs='+', choices=STAGES, default=list(STAGES), help='Etapas executadas')
+    parser.add_argument('-gp', '--geocodepoints', type=int, default=2000, help='Quantidade de coordenadas geocodificadas')
+    parser.add_argument('-l', '--latency', type=float, default=0.001, help='Latência (em segundos) do geocodificador falso')
+    parser.add_argument('-w', '--workers', type=int, default=8, help='Quantidade de threads acessando o geocodificador')
+    parser.add_argument('-lp', '--loadpoints', type=int, default=20000, help='Quantidade de Pontos carregados na etapa load')
+    parser.add_argument('-c', '--commit', type=int, default=DATABASE_SETTINGS['commit'], help='Intervalo de commits')
+    parser.add_argument('-b', '--batchsize', type=int, default=DATABASE_SETTINGS['batch_size'], help='Tamanho dos lotes de Pontos')
+    parser.add_argument('-H', '--host', type=str, default=DATABASE_SETTINGS['host'], help='Host da Base de Dados')
+    parser.add_argument('-U', '--user', type=str, default=DATABASE_SETTINGS['user'], help='Usuário da Base de Dados')
+    parser.add_argument('-P', '--password', type=str, default=DATABASE_SETTINGS['password'], help='Senha da Base de Dados')
+    parser.add_argument('-D', '--database', type=str, default='etl_benchmark', help='Database do benchmark (suas tabelas são recriadas)')
+    parser.add_argument('-p', '--path', type=str, help='Diretório dos arquivos gerados (mantidos ao final)')
+    parser.add_argument('-o', '--output', type=str, help='Arquivo JSON com os resultados')
+    parser.add_argument('-cmp', '--compare', type=str, help='Arquivo JSON de uma execução anterior para comparação')
+    args = parser.parse_args()
+
+    path = args.path or mkdtemp(prefix='etl_benchmark_')
+    try:
+        n_lines = generate_traces(path, args.points, n_files=args.files,
+                                dirty_ratio=args.dirtyratio, seed=args.seed)
+        options = {
+            'path': path,
+            'lines': n_lines,
+            'geocode_points': args.geocodepoints,
+            'latency': args.latency,
+            'workers': args.workers,
+            'load_points': args.loadpoints,
+            'commit': args.commit,
+            'batch_size': args.batchsize,
+            'database': {'host': args.host, 'user': args.user,
+                        'password': args.password, 'database': args.database},
+        }
+        results = {
+            'commit': _commit(),
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'params': {key: value for key, value in vars(args).items()
+                    if key not in ('password', 'output', 'compare', 'path')},
+            'stages': {},
+        }
+        for name in args.stages:
+            # Um processo novo por etapa, para medir o pico de memória de cada uma
+            with Pool(1) as pool:
+                results['stages'][name] = pool.apply(_run_stage, (name, options))
+    finally:
+        if not args.path:
+            rmtree(path, ignore_errors=True)
+
+    print('\nBenchmark ({} lines, commit {})'.format(n_lines, results['commit']))
+    for name, result in results['stages'].items():
+        if 'skipped' in result:
+            print('{:<12} skipped ({})'.format(name, result['skipped']))
+            continue
+        print('{:<12} {:>12.1f} lines/s {:>12.1f} points/s {:>8.3f}s {:>10} KB peak RSS'.format(
+            name, result['lines_per_sec'], result['points_per_sec'],
+            result['seconds'], result['peak_rss_kb']))
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+    if args.compare:
+        _compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
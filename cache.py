@@ -0,0 +1,200 @@
+import json
+import sqlite3
+from os import makedirs
+from os.path import dirname
+from time import time
+from log import get_logger
+
+LOGGER = get_logger('cache')
+
+# Quantidade máxima de horários de acesso mantidos em memória antes de escrevê-los
+ACCESS_BUFFER_SIZE = 1000
+
+class GeocodeCache:
+    '''
+    Cache persistente (SQLite) para os dados obtidos através da API de Mapas.
+    As coordenadas são arredondadas para `precision` casas decimais e usadas
+    como chave, de forma que pontos já consultados em execuções anteriores
+    não precisem acessar a API novamente.
+    '''
+    def __init__(self, path, precision=5, ttl=None, max_entries=None):
+        '''
+        Args:
+            path : str
+                Caminho do arquivo SQLite do cache
+
+            precision : int
+                Quantidade de casas decimais usadas para arredondar as coordenadas
+
+            ttl : int
+                Tempo de vida (em segundos) de cada entrada. None para não expirar
+
+            max_entries : int
+                Quantidade máxima de entradas. Ao ultrapassar este valor as
+                entradas menos usadas recentemente são removidas
+        '''
+        self.path = path
+        self.precision = precision
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # Horários de acesso dos acertos ainda não escritos: {chave: horário}.
+        # São escritos junto com o próximo set (ou no close), para que um
+        # acerto não deixe uma transação aberta bloqueando os outros processos
+        self._accessed = {}
+
+        if dirname(path):
+            makedirs(dirname(path), exist_ok=True)
+        # O timeout permite que vários processos compartilhem o mesmo arquivo.
+        # A conexão pode ser usada por outra thread (ex.: a do cache em
+        # pipeline.AsyncPipeline), desde que por uma thread de cada vez
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute(
+            '''
+                CREATE TABLE IF NOT EXISTS Geocode (
+                    lat REAL NOT NULL,
+                    lng REAL NOT NULL,
+                    data TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL,
+                    PRIMARY KEY (lat, lng)
+                );
+            '''
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS GeocodeAccessed ON Geocode (accessed);')
+        self._size = self._conn.execute('SELECT COUNT(*) FROM Geocode;').fetchone()[0]
+
+
+    def _key(self, point):
+        '''
+        Método auxiliar para gerar a chave do cache a partir da coordenada
+
+        Args:
+            point : tuple
+                Coordenada (lat, lng)
+
+        Returns:
+            tuple
+                Coordenada arredondada
+        '''
+        return (round(point[0], self.precision), round(point[1], self.precision))
+
+
+    def get(self, point):
+        '''
+        Método para buscar os dados de uma coordenada no cache
+
+        Args:
+            point : tuple
+                Coordenada (lat, lng)
+
+        Returns:
+            dict | None
+                Dados da coordenada ou None caso não exista (ou esteja expirado)
+        '''
+        key = self._key(point)
+        row = self._conn.execute('SELECT data, created FROM Geocode WHERE lat=? AND lng=?;',
+                                key).fetchone()
+        now = time()
+        if row and self.ttl is not None and now - row[1] > self.ttl:
+            # Entrada expirada
+            self._conn.execute('DELETE FROM Geocode WHERE lat=? AND lng=?;', key)
+            self._conn.commit()
+            self._size -= 1
+            row = None
+
+        if not row:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._accessed[key] = now
+        if len(self._accessed) >= ACCESS_BUFFER_SIZE:
+            self._flush_accessed()
+            self._conn.commit()
+        return json.loads(row[0])
+
+
+    def _flush_accessed(self):
+        '''
+        Método auxiliar para escrever os horários de acesso dos acertos
+        (sem commit, que é feito por quem o chama)
+        '''
+        if self._accessed:
+            self._conn.executemany('UPDATE Geocode SET accessed=? WHERE lat=? AND lng=?;',
+                                ((now,) + key for key, now in self._accessed.items()))
+            self._accessed.clear()
+
+
+    def set(self, point, data):
+        '''
+        Método para armazenar os dados de uma coordenada no cache
+
+        Args:
+            point : tuple
+                Coordenada (lat, lng)
+
+            data : dict
+                Dados da coordenada
+        '''
+        key = self._key(point)
+        now = time()
+        values = (json.dumps(data), now, now)
+        # Apenas as novas entradas aumentam o tamanho do cache
+        updated = self._conn.execute(
+            'UPDATE Geocode SET data=?, created=?, accessed=? WHERE lat=? AND lng=?;',
+            values + key).rowcount
+        if not updated:
+            self._conn.execute('INSERT OR REPLACE INTO Geocode VALUES (?, ?, ?, ?, ?);',
+                               key + values)
+            self._size += 1
+        self._accessed.pop(key, None)
+        self._flush_accessed()
+        if self.max_entries and self._size > self.max_entries:
+            self._evict()
+        self._conn.commit()
+
+
+    def _evict(self):
+        '''
+        Método auxiliar para remover as entradas menos usadas recentemente.
+        São removidos 10% das entradas de uma só vez para não executar a
+        remoção a cada nova inserção.
+        '''
+        n_rows = self._size - self.max_entries + max(1, self.max_entries // 10)
+        self._conn.execute(
+            '''
+                DELETE FROM Geocode WHERE rowid IN (
+                    SELECT rowid FROM Geocode ORDER BY accessed LIMIT ?
+                );
+            ''', (n_rows,)
+        )
+        self._size = self._conn.execute('SELECT COUNT(*) FROM Geocode;').fetchone()[0]
+
+
+    def config(self):
+        '''
+        Método para obter os parâmetros do cache, usados para abri-lo em outros processos
+
+        Returns:
+            dict
+                Parâmetros do construtor do cache
+        '''
+        return {'path': self.path, 'precision': self.precision,
+                'ttl': self.ttl, 'max_entries': self.max_entries}
+
+
+    def close(self, report=True):
+        '''
+        Método para fechar o cache e mostrar a quantidade de acertos e falhas
+
+        Args:
+            report : bool
+                Flag para mostrar a quantidade de acertos e falhas
+        '''
+        self._flush_accessed()
+        self._conn.commit()
+        self._conn.close()
+        if report:
+            LOGGER.info('Geocode cache: %d hits, %d misses', self.hits, self.misses)
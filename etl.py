@@ -1,8 +1,162 @@
-import pandas as pd
+import csv
+import logging
+from copy import copy
+from functools import lru_cache
+from os import remove
+from os.path import relpath
+from itertools import chain, islice
+from time import time
 
+# Módulos usados apenas por alguns métodos (multiprocessing, tempfile, pipeline,
+# export, pandas) são importados nos próprios métodos, para que os comandos
+# administrativos da main.py (create, drop, show...) iniciem rapidamente
 import extract as exct
 import transform as trm
-from load import Model
+from batch import PointBatch, batches
+from cache import GeocodeCache
+from geocoders import get_geocoder
+from load import Model, VIEW_COLUMNS
+from log import Progress, get_logger
+from metrics import REGISTRY, timed, timed_iter
+
+LOGGER = get_logger('etl')
+
+# Colunas da tabela Point usadas na inserção em lotes
+POINT_COLUMNS = ('pointLAT', 'pointLNG', 'pointStreetName', 'pointHouseNumber',
+                'pointPostalCode', 'suburbID')
+
+# Nomes das colunas da visão dos Pontos (ver load.VIEW_COLUMNS) usados em show
+SHOW_COLUMNS = {
+    'pointLAT'          :   'Latitude',
+    'pointLNG'          :   'Longitude',
+    'pointStreetName'   :   'Rua',
+    'pointHouseNumber'  :   'Número',
+    'suburbName'        :   'Bairro',
+    'cityName'          :   'Cidade',
+    'pointPostalCode'   :   'CEP',
+    'stateUF'           :   'Estado',
+    'countryName'       :   'País',
+    'pointCreatedAt'    :   'Carregado em',
+}
+
+# Quantidade de Points por lote escrito no arquivo temporário de bulk_load
+BULK_BATCH_SIZE = 10000
+
+# Backends de geocodificação já criados em cada processo do modo paralelo,
+# para que o arquivo de endereços do backend 'offline' seja lido apenas uma vez
+_BACKENDS = {}
+
+# Etapa de normalização de cada processo do modo paralelo, cujos caches
+# são mantidos entre os arquivos processados
+_NORMALIZER = {}
+
+@lru_cache(maxsize=10000)
+def _display(value):
+    '''
+    Função auxiliar para tornar um texto mais apresentável em show (siglas
+    de duas letras em maiúsculas, os demais com title()), uma vez por valor distinto
+    '''
+    return value.upper() if len(value) == 2 else value.title()
+
+def _numpy_points(files, chunk_size):
+    '''
+    Função auxiliar para tratar os arquivos com a engine 'numpy',
+    convertendo os arrays de coordenadas em tuplas (lat, lng)
+    '''
+    chunks = trm.clear_points_numpy(files, chunk_size=chunk_size)
+    return (tuple(point) for chunk in chunks for point in chunk.tolist())
+
+
+def _file_points(file_name, options, offset=0, simplifier=None):
+    '''
+    Função auxiliar que monta as etapas de leitura, tratamento e agrupamento
+    das coordenadas de um único arquivo.
+
+    Args:
+        file_name : str
+            Caminho do arquivo com os dados dos Pontos
+
+        options : dict
+            Dicionário de opções (ver ETL.extract_parallel)
+
+        offset : int
+            Quantidade de coordenadas iniciais a serem ignoradas (já simplificadas)
+
+        simplifier : transform.Simplifier
+            Etapa de simplificação da trajetória do arquivo. None para não simplificar
+
+    Returns:
+        generator | tuples
+            Um gerador de coordenadas (ou de tuplas (célula, coordenada), se agrupadas)
+    '''
+    if options['engine'] == 'numpy':
+        points = _numpy_points([file_name], options['chunk_size'])
+    else:
+        lines = timed_iter('extract', exct.read_file(file_name, options['buffer_size']))
+        points = trm.clear_points(lines)
+    points = timed_iter('transform', points)
+
+    if simplifier is not None:
+        points = timed_iter('simplify', simplifier.simplify(points, file_name))
+
+    if offset:
+        points = islice(points, offset, None)
+
+    if options['cluster_radius']:
+        points = timed_iter('cluster', trm.cluster_points(points, options['cluster_radius']))
+    return points
+
+
+def _process_file(args):
+    '''
+    Função executada pelos processos do modo paralelo: lê, trata e acessa
+    a API de Mapas para as coordenadas de um único arquivo.
+
+    Args:
+        args : tuple
+            Nome do arquivo e dicionário de opções (ver ETL.extract_parallel)
+
+    Returns:
+        tuple
+            Lote (PointBatch) com os Points do arquivo, acertos e falhas do
+            cache, acertos e falhas da normalização, totais da simplificação
+            e métricas do processo.
+            O lote colunar é bem menor que uma lista de Points ao ser enviado
+            ao processo principal
+    '''
+    file_name, options = args
+    # As métricas do processo são enviadas junto com os Points de cada arquivo
+    REGISTRY.reset()
+    cache = GeocodeCache(**options['cache']) if options['cache'] else None
+    key = tuple(sorted(options['backend'].items()))
+    if key not in _BACKENDS:
+        _BACKENDS[key] = get_geocoder(**options['backend'])
+
+    cache_size = options['normalize_cache_size']
+    if cache_size not in _NORMALIZER:
+        _NORMALIZER.clear()
+        _NORMALIZER[cache_size] = trm.Normalizer(cache_size=cache_size)
+    normalizer = _NORMALIZER[cache_size]
+    before = normalizer.stats()
+    simplifier = trm.Simplifier(**options['simplify']) if options['simplify'] else None
+    simplified = simplifier.stats() if simplifier is not None else (0, 0, 0)
+
+    data = exct.get_data_points(_file_points(file_name, options, simplifier=simplifier), cache=cache,
+                                backend=_BACKENDS[key],
+                                clustered=bool(options['cluster_radius']),
+                                **options['geocoder'])
+    data = PointBatch.from_points(timed_iter('normalize', normalizer.normalize_points(
+                                    timed_iter('geocode', data))))
+    # Apenas os acertos e falhas deste arquivo são enviados
+    normalized = {field: (hits - before[field][0], misses - before[field][1])
+                for field, (hits, misses) in normalizer.stats().items()}
+    if simplifier is not None:
+        simplified = simplifier.stats()
+    if cache is None:
+        return data, 0, 0, normalized, simplified, REGISTRY.snapshot()
+    cache.close(report=False)
+    return data, cache.hits, cache.misses, normalized, simplified, REGISTRY.snapshot()
+
 
 class ETL:
     '''
@@ -11,35 +165,287 @@ class ETL:
     '''
     def __init__(self):
         self.data = None
+        self.files_path = None
+        self.cache = None
+        self.geocoder = None
+        self.normalizer = trm.Normalizer()
+        self.simplifier = None
+        self.buffer_size = 1024 * 1024
+        # Registro (Ledger) do arquivo sendo carregado por load_incremental
+        self._ledger_ID = None
+        # Flag do esquema espacial da tabela Point, verificada na primeira carga (ver _rows)
+        self._spatial = None
+        self._geocoder_config = {}
+        self._clustered = False
         self.model = Model()
 
-    def extract_points_from_file(self, files_path):
+    @timed('etl_method_seconds', method='extract_points_from_file')
+    def extract_points_from_file(self, files_path, buffer_size=1024 * 1024):
         '''
         Método para pegar coordenadas dos arquivos de texto
 
         Args:
             files_path : str
                 Diretório onde encontram-se os arquivos com os dados dos Pontos
+
+            buffer_size : int
+                Tamanho (em bytes) do buffer de leitura dos arquivos
+        '''
+        self.files_path = files_path
+        self.buffer_size = buffer_size
+        self.data = timed_iter('extract', exct.get_points(files_path, buffer_size=buffer_size))
+
+    @timed('etl_method_seconds', method='count_points')
+    def count_points(self, files_path):
+        '''
+        Método para estimar a quantidade de Pontos dos arquivos, usada no
+        relatório de progresso da carga (ver load_data)
+
+        Args:
+            files_path : str
+                Diretório onde encontram-se os arquivos com os dados dos Pontos
+
+        Returns:
+            int
+                Quantidade estimada de Pontos
         '''
-        self.data = exct.get_points(files_path)
+        return exct.count_points(exct.get_files(files_path))
 
-    def extract_data_from_API(self):
+    @timed('etl_method_seconds', method='set_geocoder')
+    def set_geocoder(self, backend='osm', url=None, path=None, max_distance=200):
+        '''
+        Método para escolher o backend de geocodificação usado para pegar os
+        dados das coordenadas (por padrão, a API OpenStreetMap)
+
+        Args:
+            backend : str
+                'osm' para a API do OpenStreetMap ou 'offline' para um
+                arquivo local de endereços (sem acesso à rede)
+
+            url : str
+                URL do serviço de geocodificação. None para usar o OpenStreetMap
+
+            path : str
+                Arquivo de endereços (CSV ou GeoJSON) do backend 'offline'
+
+            max_distance : float
+                Distância máxima (em metros) até o endereço mais próximo no backend 'offline'
+        '''
+        self._geocoder_config = {'backend': backend, 'url': url, 'path': path,
+                                'max_distance': max_distance}
+        self.geocoder = get_geocoder(**self._geocoder_config)
+
+    @timed('etl_method_seconds', method='extract_data_from_API')
+    def extract_data_from_API(self, workers=1, rate=None, ordered=True):
         '''
         Método para pegar dados das coordenadas da API de Mapas
+        (ou do backend escolhido em set_geocoder)
+
+        Args:
+            workers : int
+                Quantidade de threads acessando a API simultaneamente
+
+            rate : float
+                Quantidade máxima de requisições por segundo à API
+
+            ordered : bool
+                Flag para manter os pontos na mesma ordem das coordenadas
+        '''
+        self.data = timed_iter('geocode', exct.get_data_points(self.data, cache=self.cache,
+                                                            workers=workers, rate=rate,
+                                                            ordered=ordered, backend=self.geocoder,
+                                                            clustered=self._clustered))
+        self.data = self._normalized(self.data)
+
+    @timed('etl_method_seconds', method='set_normalizer')
+    def set_normalizer(self, cache_size=100000):
+        '''
+        Método para configurar a etapa de normalização dos dados da API de Mapas
+        (ver transform.Normalizer), executada entre a geocodificação e a carga
+
+        Args:
+            cache_size : int
+                Quantidade máxima de valores normalizados em cache por campo
+        '''
+        self.normalizer = trm.Normalizer(cache_size=cache_size)
+
+    @timed('etl_method_seconds', method='set_simplifier')
+    def set_simplifier(self, min_distance=0, tolerance=0, segment_size=1000, max_gap=None):
+        '''
+        Método para configurar a etapa de simplificação das trajetórias
+        (ver transform.Simplifier), executada entre o tratamento e a
+        geocodificação. Sem distância mínima nem tolerância, a etapa é desativada.
+
+        Args:
+            min_distance : float
+                Distância mínima (em metros) até a última coordenada mantida
+
+            tolerance : float
+                Tolerância (em metros) do Douglas-Peucker
+
+            segment_size : int
+                Quantidade máxima de coordenadas por segmento simplificado
+
+            max_gap : float
+                Distância (em metros) a partir da qual a trajetória é dividida
+        '''
+        if not min_distance and not tolerance:
+            self.simplifier = None
+            return
+        self.simplifier = trm.Simplifier(min_distance=min_distance, tolerance=tolerance,
+                                        segment_size=segment_size, max_gap=max_gap)
+
+    def _normalized(self, data):
+        '''
+        Método auxiliar para adicionar a etapa de normalização a um gerador de Points
+        '''
+        return timed_iter('normalize', self.normalizer.normalize_points(data))
+
+    @timed('etl_method_seconds', method='extract_parallel')
+    def extract_parallel(self, files_path, processes, engine='python', chunk_size=1024 * 1024,
+                        buffer_size=1024 * 1024, cluster_radius=None, workers=1, rate=None,
+                        ordered=True):
+        '''
+        Método para ler, tratar e pegar os dados da API de Mapas em paralelo.
+        Cada arquivo é processado por um processo do pool; os Points resultantes
+        são entregues, arquivo por arquivo, para a carga na Base de Dados, que
+        continua sendo feita por uma única conexão.
 
         Args:
-            data : gererator | list
-                Lista de coordenadas limpas (tratadas)
+            files_path : str
+                Diretório onde encontram-se os arquivos com os dados dos Pontos
+
+            processes : int
+                Quantidade de processos
+
+            engine, chunk_size : ver clear_points
+
+            buffer_size : ver extract_points_from_file
+
+            cluster_radius : float
+                Tamanho (em metros) das células do agrupamento. None para não agrupar
+
+            workers, ordered : ver extract_data_from_API
+
+            rate : float
+                Quantidade máxima de requisições por segundo à API, somando
+                todos os processos: cada processo recebe rate / processes
         '''
-        self.data = exct.get_data_points(self.data)
+        self.files_path = files_path
+        options = self._options(engine, chunk_size, buffer_size, cluster_radius,
+                                workers, rate / processes if rate else None, ordered)
+        files = exct.get_files(files_path)
+        # Tempo de espera pelos processos (as etapas de cada processo são somadas às métricas)
+        self.data = timed_iter('parallel', self._parallel(((file_name, options) for file_name in files),
+                                                        processes))
 
-    def clear_points(self):
+    def _options(self, engine, chunk_size, buffer_size, cluster_radius, workers, rate,
+                ordered):
+        '''
+        Método auxiliar para montar o dicionário de opções usado no
+        processamento de um arquivo (ver _file_points e _process_file)
+        '''
+        return {
+            'cache': self.cache.config() if self.cache is not None else None,
+            'engine': engine,
+            'chunk_size': chunk_size,
+            'buffer_size': buffer_size,
+            'cluster_radius': cluster_radius,
+            # Cada processo cria o seu backend a partir da configuração
+            'backend': self._geocoder_config,
+            'geocoder': {'workers': workers,
+                        'rate': rate,
+                        'ordered': ordered},
+            'normalize_cache_size': self.normalizer.cache_size,
+            'simplify': self.simplifier.config() if self.simplifier is not None else None,
+        }
+
+    def _parallel(self, tasks, processes):
+        '''
+        Método auxiliar que distribui os arquivos entre os processos e
+        retorna os Points na ordem dos arquivos
+
+        Returns:
+            Point : generator
+                Um gerador dos Points de todos os arquivos
+        '''
+        from multiprocessing import Pool
+
+        with Pool(processes) as pool:
+            for data, hits, misses, normalized, simplified, metrics in pool.imap(_process_file, tasks):
+                REGISTRY.merge(metrics)
+                self.normalizer.merge(normalized)
+                if self.simplifier is not None:
+                    self.simplifier.merge(simplified)
+                if self.cache is not None:
+                    self.cache.hits += hits
+                    self.cache.misses += misses
+                yield from data.points()
+
+    @timed('etl_method_seconds', method='open_cache')
+    def open_cache(self, path, precision=5, ttl=None, max_entries=None):
+        '''
+        Método para abrir o cache persistente dos dados da API de Mapas
+
+        Args:
+            path : str
+                Caminho do arquivo SQLite do cache
+
+            precision : int
+                Quantidade de casas decimais usadas para arredondar as coordenadas
+
+            ttl : int
+                Tempo de vida (em segundos) de cada entrada
+
+            max_entries : int
+                Quantidade máxima de entradas armazenadas no cache
+        '''
+        self.cache = GeocodeCache(path, precision=precision, ttl=ttl,
+                                max_entries=max_entries)
+
+    @timed('etl_method_seconds', method='clear_points')
+    def clear_points(self, engine='python', chunk_size=1024 * 1024):
         '''
         Método para tratar coordenadas dos arquivos de texto
+
+        Args:
+            engine : str
+                'python' para tratar as linhas uma a uma ou 'numpy' para
+                tratar os arquivos em blocos com operações vetorizadas
+
+            chunk_size : int
+                Tamanho aproximado (em bytes) dos blocos lidos pela engine 'numpy'
+        '''
+        if self.simplifier is not None:
+            # Cada arquivo é uma trajetória, então os arquivos são lidos e tratados um a um
+            options = {'engine': engine, 'chunk_size': chunk_size,
+                    'buffer_size': self.buffer_size, 'cluster_radius': None}
+            self.data = chain.from_iterable(_file_points(file_name, options, simplifier=self.simplifier)
+                                            for file_name in exct.get_files(self.files_path))
+            return
+
+        if engine == 'numpy':
+            self.data = _numpy_points(exct.get_files(self.files_path), chunk_size)
+        else:
+            self.data = trm.clear_points(self.data)
+        self.data = timed_iter('transform', self.data)
+
+    @timed('etl_method_seconds', method='cluster_points')
+    def cluster_points(self, radius):
         '''
-        self.data = trm.clear_points(self.data)
+        Método para agrupar coordenadas próximas antes de acessar a API de Mapas.
+        Apenas uma coordenada por agrupamento é consultada na API.
 
-    def connect(self, host, user, password, database):
+        Args:
+            radius : float
+                Tamanho (em metros) das células do agrupamento
+        '''
+        self.data = timed_iter('cluster', trm.cluster_points(self.data, radius))
+        self._clustered = True
+
+    @timed('etl_method_seconds', method='connect')
+    def connect(self, host, user, password, database, cache_size=None, local_infile=False,
+                pool_size=1, retries=3, backoff=1.0):
         '''
         Método para conectar-se à Base de Dados
 
@@ -55,14 +461,37 @@ class ETL:
 
             database : str
                 Nome do Database a ser utilizado
+
+            cache_size : int
+                Quantidade máxima de IDs em memória por tabela de dimensão
+
+            local_infile : bool
+                Flag para permitir o uso de LOAD DATA LOCAL INFILE (ver bulk_load)
+
+            pool_size : int
+                Quantidade máxima de conexões do pool
+
+            retries : int
+                Quantidade de novas tentativas ao perder a conexão
+
+            backoff : float
+                Tempo (em segundos) de espera antes da primeira nova tentativa
         '''
-        self.model.connect(host, user, password, database)
+        self.model.connect(host, user, password, database, cache_size=cache_size,
+                        local_infile=local_infile, pool_size=pool_size,
+                        retries=retries, backoff=backoff)
 
+    @timed('etl_method_seconds', method='close')
     def close(self):
         '''
-        Método para fechar a conexão com a Base de Dados
+        Método para fechar a conexão com a Base de Dados e o cache
         '''
         self.model.close()
+        if self.cache is not None:
+            self.cache.close()
+        self.normalizer.report()
+        if self.simplifier is not None:
+            self.simplifier.report()
 
     def _commit(self):
         '''
@@ -70,12 +499,20 @@ class ETL:
         '''
         self.model.commit()
 
-    def create_tables(self):
+    @timed('etl_method_seconds', method='create_tables')
+    def create_tables(self, spatial=False):
         '''
         Método para criar as tabelas
+
+        Args:
+            spatial : bool
+                Flag para criar a tabela Point com a coluna espacial pointGeom
+                e seu SPATIAL INDEX, usados por points_in_box e points_near
         '''
-        self.model.create_tables()
+        self.model.create_tables(spatial=spatial)
+        self._spatial = None
 
+    @timed('etl_method_seconds', method='drop_tables')
     def drop_tables(self, tables):
         '''
         Método para deletar as tabelas da Base de Dados
@@ -87,112 +524,756 @@ class ETL:
         tables = [tables] if not isinstance(tables, list) else tables
         for table in tables:
             self.model.drop_table(table)
+        self._spatial = None
+
+    def _insert_dimensions(self, place):
+        '''
+        Método auxiliar para inserir (ou buscar) os dados de País, Estado,
+        Cidade e Bairro de um lugar
+
+        Args:
+            place : tuple
+                País, Estado, Cidade e Bairro, já normalizados (ver batch.PointBatch)
+
+        Returns:
+            suburb_ID : int | None
+                ID do Bairro do lugar ou None caso não haja informação sobre Bairro
+        '''
+        country, state, city, suburb = place
+        country_ID = state_ID = city_ID = suburb_ID = None
+        # Se há informação sobre País
+        if country:
+            country_ID = self.model.insert(table='Country',
+                                        columns='countryName',
+                                        values=country)
+        # Se há informação sobre Estado
+        if state and country_ID:
+            state_ID = self.model.insert(table='State',
+                                        columns=('stateUF',
+                                                'countryID'),
+                                        values=(state,
+                                                country_ID))
+        # Se há informação sobre Cidade
+        if city and state_ID:
+            city_ID = self.model.insert(table='City',
+                                        columns=('cityName',
+                                                'stateID'),
+                                        values=(city,
+                                                state_ID))
+        # Se há informação sobre Bairro
+        if suburb and city_ID:
+            suburb_ID = self.model.insert(table='Suburb',
+                                        columns=('suburbName',
+                                                  'cityID'),
+                                        values=(suburb,
+                                                city_ID))
+        return suburb_ID
+
+    def _rows(self, batch):
+        '''
+        Método auxiliar para montar as linhas da tabela Point de um lote.
+        Os IDs de País, Estado, Cidade e Bairro são buscados (ou inseridos)
+        uma vez por lugar distinto do lote.
+
+        Args:
+            batch : PointBatch
+                Lote de Points
+
+        Returns:
+            tuple : generator
+                Um gerador de tuplas (posição no lote, linha na ordem de
+                _point_columns). A linha é None para Points que não são
+                armazenados: sem Bairro, sem nenhuma outra informação ou,
+                no esquema espacial (ver create_tables), sem coordenadas.
+                Todos os modos de carga (linha a linha, em lotes e
+                bulk_load) usam este filtro, então carregam as mesmas linhas
+        '''
+        if self._spatial is None:
+            self._spatial = self.model.has_spatial_schema()
+        # Os lugares são inseridos em ordem, para que intervalos inseridos ao mesmo
+        # tempo (ver _load_concurrent) bloqueiem as linhas de dimensão na mesma ordem
+        places = batch.places.values
+        suburb_IDs = [None] * len(places)
+        for code in sorted(range(1, len(places)),
+                        key=lambda code: tuple(value or '' for value in places[code])):
+            suburb_IDs[code] = self._insert_dimensions(places[code])
+        streets = batch.streets.values
+        housenumbers = batch.housenumbers.values
+        postals = batch.postals.values
+        columns = zip(batch.lat, batch.lng, batch.street, batch.housenumber,
+                    batch.postal, batch.place)
+        for i, (lat, lng, street, housenumber, postal, place) in enumerate(columns):
+            suburb_ID = suburb_IDs[place]
+            if not suburb_ID:
+                yield i, None
+                continue
+            # NaN (diferente de si mesmo) representa coordenadas nulas
+            row = [None if lat != lat else lat,
+                    None if lng != lng else lng,
+                    streets[street],
+                    housenumbers[housenumber],
+                    postals[postal],
+                    suburb_ID]
+            # Pontos sem nenhuma informação além do Bairro não são armazenados
+            if all(value is None for value in row[:-1]):
+                yield i, None
+                continue
+            # A coluna pointGeom, gerada a partir das coordenadas, não aceita nulos
+            if self._spatial and (row[0] is None or row[1] is None):
+                yield i, None
+                continue
+            if self._ledger_ID is not None:
+                row.append(self._ledger_ID)
+            yield i, row
+
+    def _point_columns(self):
+        '''
+        Método auxiliar para pegar as colunas da tabela Point inseridas pela carga:
+        POINT_COLUMNS e, na carga incremental, o registro do arquivo (ledgerID)
+        '''
+        if self._ledger_ID is None:
+            return POINT_COLUMNS
+        return POINT_COLUMNS + ('ledgerID',)
 
-    def load_data(self, commit=1):
+    def _flush(self, rows):
         '''
-        Método para inserir dados na Base de Dados
+        Método auxiliar para inserir de uma só vez os Pontos armazenados em memória
+
+        Args:
+            rows : list
+                Lista de valores dos Pontos, na ordem de _point_columns
+        '''
+        if rows:
+            self.model.insert_many(table='Point', columns=self._point_columns(), rows=rows)
+            rows.clear()
+
+    def _load_interval(self, batch, batch_size, checkpoint, n_points):
+        '''
+        Método auxiliar para inserir os Points de um intervalo de commit.
+        Tudo o que é feito aqui pertence a uma única transação, que termina com
+        o commit; assim, se a conexão for perdida, o intervalo pode ser
+        inserido novamente em uma nova conexão (ver Model.retry).
+
+        Args:
+            batch : PointBatch
+                Lote com os Points do intervalo
+
+            batch_size, checkpoint : ver load_data
+
+            n_points : int
+                Quantidade de Points consumidos até o final do intervalo
+
+        Returns:
+            tuple
+                Quantidade de linhas inseridas e de Points ignorados (sem Bairro ou sem outras informações)
+        '''
+        rows = []
+        n_rows = n_skipped = 0
+        # Os dados de cada Ponto são mostrados apenas no nível DEBUG
+        debug = LOGGER.isEnabledFor(logging.DEBUG)
+        for i, row in self._rows(batch):
+            # Dados sem Bairro (Suburb) ou sem outras informações não são armazenados
+            if row is None:
+                n_skipped += 1
+
+            elif batch_size:
+                n_rows += 1
+                if debug:
+                    LOGGER.debug('Point: %s', batch.point(i))
+                rows.append(row)
+                if len(rows) >= batch_size:
+                    self._flush(rows)
+
+            # Apenas as colunas com informação são inseridas
+            else:
+                point_ID = self.model.insert(table='Point',
+                                            columns=tuple(column for column, value
+                                                        in zip(self._point_columns(), row)
+                                                        if value is not None),
+                                            values=[value for value in row if value is not None])
+                n_rows += 1
+                if debug:
+                    LOGGER.debug('ID: %s, Point: %s', point_ID, batch.point(i))
+
+        self._flush(rows)
+        if checkpoint is not None:
+            checkpoint(n_points)
+        self._commit()
+        return n_rows, n_skipped
+
+    def _loaded(self, progress, n_points, n_rows, n_skipped):
+        '''
+        Método auxiliar para registrar um intervalo de commit já escrito na
+        Base de Dados nas métricas e no relatório de progresso
+
+        Args:
+            progress : Progress
+                Relatório de progresso da carga
+
+            n_points : int
+                Quantidade de Points do intervalo
+
+            n_rows, n_skipped : ver _load_interval
+        '''
+        REGISTRY.inc('load_rows_total', n_rows)
+        REGISTRY.inc('load_points_skipped_total', n_skipped)
+        progress.update(n_points, n_rows, n_skipped)
+
+    @timed('etl_method_seconds', stage='load', method='load_data')
+    def load_data(self, commit=1, batch_size=None, checkpoint=None, total=None, progress=None):
+        '''
+        Método para inserir dados na Base de Dados.
+        Os Points de cada intervalo de commit ficam em memória até o commit,
+        em um lote colunar (ver batch.PointBatch), para que sejam inseridos
+        novamente caso a conexão seja perdida. Com mais de uma conexão no pool
+        (pool_size) e sem checkpoint, os intervalos são inseridos em paralelo,
+        um por conexão (ver _load_concurrent).
 
         Args:
             commit : int
                 Este valor refere-se à frequência que os dados serão escritos
                 na Base de Dados. 
+
+            batch_size : int
+                Se informado, os Pontos são armazenados em memória e inseridos
+                em lotes deste tamanho com uma única instrução. Os lotes
+                pendentes também são inseridos a cada commit.
+
+            checkpoint : callable
+                Função chamada antes de cada commit com a quantidade de Points
+                já consumidos, para que seu registro seja escrito na mesma transação
+
+            total : int
+                Quantidade estimada de Points (ver count_points), usada para
+                estimar o tempo restante no relatório de progresso
+
+            progress : Progress
+                Relatório de progresso a ser continuado. None para criar um novo
         '''
-        i = 0
-        for data in self.data:
-            # Se há informação sobre País
-            if data.country:
-                country_ID = self.model.insert(table='Country',
-                                            columns='countryName',
-                                            values=data.country.lower())
-            # Se há informação sobre Estado
-            if data.state and country_ID:
-                state_ID = self.model.insert(table='State',
-                                            columns=['stateUF',
-                                                    'countryID'],
-                                            values=[data.state.lower(),
-                                                    country_ID])
-            # Se há informação sobre Cidade
-            if data.city and state_ID:
-                city_ID = self.model.insert(table='City',
-                                            columns=['cityName',
-                                                    'stateID'],
-                                            values=[data.city.lower(),
-                                                    state_ID])
-            # Se há informação sobre Bairro
-            if data.suburb and city_ID:
-                suburb_ID = self.model.insert(table='Suburb',
-                                            columns=['suburbName',
-                                                      'cityID'],
-                                            values=[data.suburb.lower(),
-                                                    city_ID])
-            point_columns = []
-            point_values = []
-            # Se há informação sobre Latitude
-            if data.lat:
-                point_columns.append('pointLAT')
-                point_values.append(data.lat)
-            # Se há informação sobre Longitude
-            if data.lng:
-                point_columns.append('pointLNG')
-                point_values.append(data.lng)
-            # Se há informação sobre Rua
-            if data.street:
-                point_columns.append('pointStreetName')
-                point_values.append(data.street.lower())
-            # Se há informação sobre Número da Residência
-            if data.housenumber:
-                point_columns.append('pointHouseNumber')
-                point_values.append(data.housenumber.lower())
-            # Se há informação sobre CEP
-            if data.postal:
-                point_columns.append('pointPostalCode')
-                point_values.append(data.postal.lower())
-            # Dados que não contém a informação sobre bairro (Suburb) não são armazenados
-            if data.suburb and len(point_columns) > 0 and len(point_values) > 0:
-                point_columns.append('suburbID')
-                point_values.append(suburb_ID)
-                point_ID = self.model.insert(table='Point',
-                                            columns=point_columns,
-                                            values=point_values)
+        own_progress = progress is None
+        if own_progress:
+            progress = Progress(LOGGER, total=total)
 
-                print('\nID: {}'.format(point_ID))
-                print(data)
-            
-            # Contador para a frequẽncia de commits
-            i += 1
-            if i == commit:
-                i = 0
-                self._commit()
+        if checkpoint is None and self.model.pool.size > 1:
+            self._load_concurrent(commit, batch_size, progress)
+        else:
+            n_points = 0
+            for batch in batches(self.data, commit):
+                n_points += len(batch)
+                n_rows, n_skipped = self.model.retry(self._load_interval, batch, batch_size,
+                                                    checkpoint, n_points)
+                self._loaded(progress, len(batch), n_rows, n_skipped)
+
+        if own_progress:
+            progress.finish()
+
+    def loaders(self):
+        '''
+        Método para criar uma cópia do ETL por conexão do pool (pool_size),
+        usadas para inserir intervalos de commit em paralelo. Cada cópia tem o
+        seu próprio Model (ver Model.clone); a primeira é o próprio ETL.
+        As conexões devem ser devolvidas com release_loaders.
+
+        Returns:
+            list
+                Cópias do ETL
+        '''
+        loaders = [self]
+        for _ in range(self.model.pool.size - 1):
+            loader = copy(self)
+            loader.model = self.model.clone()
+            loaders.append(loader)
+        return loaders
+
+    def release_loaders(self, loaders):
+        '''
+        Método para devolver ao pool as conexões das cópias criadas por loaders
+        '''
+        for loader in loaders:
+            if loader is not self:
+                loader.model.release()
+
+    def _load_concurrent(self, commit, batch_size, progress):
+        '''
+        Método auxiliar para inserir os intervalos de commit em paralelo, um
+        por conexão do pool. Cada intervalo é uma transação independente,
+        então os intervalos podem terminar fora de ordem (e os IDs dos Pontos
+        não seguem a ordem dos arquivos). Há no máximo um intervalo em
+        memória por conexão.
+
+        Args:
+            commit, batch_size : ver load_data
+
+            progress : Progress
+                Relatório de progresso da carga
+        '''
+        from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+        loaders = self.loaders()
+        idle = list(loaders)
+        # Intervalos em execução: {Future: (cópia do ETL, quantidade de Points)}
+        pending = {}
+
+        def collect(done):
+            for future in done:
+                loader, n_points = pending.pop(future)
+                idle.append(loader)
+                n_rows, n_skipped = future.result()
+                self._loaded(progress, n_points, n_rows, n_skipped)
+
+        try:
+            with ThreadPoolExecutor(max_workers=len(loaders)) as executor:
+                for batch in batches(self.data, commit):
+                    if not idle:
+                        collect(wait(pending, return_when=FIRST_COMPLETED)[0])
+                    loader = idle.pop()
+                    future = executor.submit(loader.model.retry, loader._load_interval,
+                                            batch, batch_size, None, len(batch))
+                    pending[future] = (loader, len(batch))
+                collect(wait(pending)[0])
+        finally:
+            self.release_loaders(loaders)
+
+    @timed('etl_method_seconds', stage='load', method='load_incremental')
+    def load_incremental(self, files_path, commit=1, batch_size=None, engine='python',
+                        chunk_size=1024 * 1024, buffer_size=1024 * 1024, cluster_radius=None,
+                        workers=1, rate=None, total=None):
+        '''
+        Método para executar o ETL de forma incremental, arquivo por arquivo.
+        O hash do conteúdo de cada arquivo e a quantidade de coordenadas já
+        carregadas são registrados na tabela Ledger a cada commit, na mesma
+        transação dos dados. Arquivos já carregados e não modificados são
+        ignorados e arquivos carregados parcialmente continuam de onde pararam,
+        sem acessar a API de Mapas novamente para as coordenadas já carregadas.
+        Cada Ponto guarda o registro do seu arquivo (ledgerID): quando um
+        arquivo é modificado, seus Pontos da carga anterior são apagados, na
+        mesma transação em que o registro volta ao início, antes de o arquivo
+        ser carregado novamente.
+
+        Args:
+            files_path : str
+                Diretório onde encontram-se os arquivos com os dados dos Pontos
+
+            commit, batch_size : ver load_data
+
+            engine, chunk_size : ver clear_points
 
-    def show(self, max_rows=None, max_columns=None):
+            buffer_size : ver extract_points_from_file
+
+            cluster_radius : float
+                Tamanho (em metros) das células do agrupamento. None para não agrupar
+
+            workers, rate : ver extract_data_from_API
+
+            total : ver load_data
+        '''
+        self.files_path = files_path
+        progress = Progress(LOGGER, total=total)
+        # A ordem dos Points precisa ser a mesma das coordenadas para o registro das posições
+        options = self._options(engine, chunk_size, buffer_size, cluster_radius,
+                                workers, rate, True)
+
+        try:
+            for file_name in exct.get_files(files_path):
+                self._load_file(file_name, options, commit, batch_size, cluster_radius, progress)
+        finally:
+            self._ledger_ID = None
+
+        progress.finish()
+
+    def _reset_file(self, file_name, file_hash):
         '''
-        Método para mostrar a tabela de dados
+        Método auxiliar para (re)iniciar a carga de um arquivo em uma única
+        transação: apaga os Pontos da carga anterior e volta o registro para o início
+
+        Returns:
+            int
+                Quantidade de Pontos apagados
+        '''
+        n_rows = self.model.reset_checkpoint(file_name, file_hash)
+        self._commit()
+        return n_rows
+
+    def _load_file(self, file_name, options, commit, batch_size, cluster_radius, progress):
+        '''
+        Método auxiliar para carregar um arquivo na carga incremental (ver load_incremental).
+        O arquivo é registrado pelo caminho relativo ao diretório dos arquivos,
+        então o mesmo diretório passado de outra forma (ex.: './data_points' ou
+        um caminho absoluto) não carrega os arquivos novamente.
+        '''
+        name = relpath(file_name, self.files_path)
+        file_hash = exct.hash_file(file_name)
+        offset = 0
+        ledger = self.model.get_checkpoint(name)
+        if ledger and ledger[1] == file_hash:
+            ledger_ID, _, offset, done = ledger
+            if done:
+                LOGGER.info("Skipping '%s' (already loaded)", file_name)
+                if progress.total:
+                    progress.total -= exct.count_points([file_name])
+                return
+            LOGGER.info("Resuming '%s' from point %d", file_name, offset)
+            if progress.total:
+                progress.total -= offset
+        else:
+            n_deleted = self.model.retry(self._reset_file, name, file_hash)
+            if ledger:
+                LOGGER.info("'%s' has changed, replacing its %d points", file_name, n_deleted)
+            ledger_ID = self.model.get_checkpoint(name)[0]
+        self._ledger_ID = ledger_ID
+
+        self.data = self._normalized(timed_iter('geocode', exct.get_data_points(
+                                        _file_points(file_name, options, offset,
+                                                    simplifier=self.simplifier),
+                                        cache=self.cache,
+                                        backend=self.geocoder,
+                                        clustered=bool(cluster_radius),
+                                        **options['geocoder'])))
+        self.load_data(commit=commit, batch_size=batch_size, progress=progress,
+                    checkpoint=lambda n_points: self.model.set_checkpoint(
+                        name, file_hash, offset + n_points))
+        self.model.finish_checkpoint(name, file_hash)
+        self._commit()
+
+    @timed('etl_method_seconds', method='run_async')
+    def run_async(self, files_path, commit=1, batch_size=None, workers=1, rate=None,
+                queue_size=1000, buffer_size=1024 * 1024, total=None):
+        '''
+        Método para executar o ETL completo (leitura, tratamento, API de Mapas
+        e carga) com as etapas em paralelo, ligadas por filas limitadas.
+        Enquanto a API é consultada, a Base de Dados continua recebendo dados,
+        e vice-versa. Ao final são mostradas a vazão e a profundidade das filas
+        de cada etapa.
+
+        Args:
+            files_path : str
+                Diretório onde encontram-se os arquivos com os dados dos Pontos
+
+            commit, batch_size : ver load_data
+
+            workers, rate : ver extract_data_from_API
+
+            queue_size : int
+                Tamanho máximo de cada fila entre as etapas
+
+            buffer_size : ver extract_points_from_file
+
+            total : ver load_data
+        '''
+        from pipeline import AsyncPipeline
+
+        if self.simplifier is not None:
+            LOGGER.warning('Trajectory simplification is not applied in async mode')
+        self.files_path = files_path
+        AsyncPipeline(self, files_path, commit=commit, batch_size=batch_size,
+                    workers=workers, rate=rate, queue_size=queue_size,
+                    buffer_size=buffer_size, total=total).run()
+
+    def _tsv_value(self, value):
+        '''
+        Método auxiliar para formatar um valor como campo de arquivo TSV do LOAD DATA
+
+        Args:
+            value : str | int | float | None
+                Valor a ser formatado
+
+        Returns:
+            str
+                Valor formatado, com \\N para valores nulos
+        '''
+        if value is None:
+            return '\\N'
+        if isinstance(value, str):
+            return (value.replace('\\', '\\\\')
+                        .replace('\t', '\\t')
+                        .replace('\n', '\\n'))
+        return repr(value)
+
+    @timed('etl_method_seconds', stage='load', method='bulk_load')
+    def bulk_load(self, disable_keys=True):
+        '''
+        Método para inserir dados na Base de Dados com LOAD DATA LOCAL INFILE.
+        Indicado para cargas iniciais em tabelas vazias: os IDs de País, Estado,
+        Cidade e Bairro são resolvidos primeiro, os Pontos são escritos em um
+        arquivo TSV temporário e carregados de uma só vez.
+
+        Args:
+            disable_keys : bool
+                Flag para desativar os índices e as verificações de chaves
+                durante a carga
+        '''
+        from tempfile import NamedTemporaryFile
+
+        start = time()
+        with NamedTemporaryFile('w', suffix='.tsv', encoding='utf-8', delete=False) as file:
+            for batch in batches(self.data, BULK_BATCH_SIZE):
+                for _, row in self._rows(batch):
+                    # Dados sem Bairro (Suburb) ou sem outras informações não são armazenados
+                    if row is None:
+                        REGISTRY.inc('load_points_skipped_total')
+                        continue
+                    file.write('\t'.join(map(self._tsv_value, row)) + '\n')
+        # Escreve as tabelas de dimensão antes de carregar os Pontos
+        self._commit()
+
+        try:
+            load_start = time()
+            n_rows = self.model.load_file('Point', self._point_columns(), file.name,
+                                        disable_keys=disable_keys)
+            REGISTRY.inc('load_rows_total', n_rows)
+            self._commit()
+        finally:
+            remove(file.name)
+
+        end = time()
+        LOGGER.info('Bulk load: %d rows in %.2fs (%.0f rows/s, LOAD DATA %.0f rows/s)',
+                    n_rows, end - start,
+                    n_rows / max(end - start, 1e-9),
+                    n_rows / max(end - load_start, 1e-9))
+
+    def _view_pages(self, columns, max_rows, chunk_size):
+        '''
+        Método auxiliar para ler a visão dos Pontos em blocos: com max_rows,
+        páginas pelo ID do Ponto (LIMIT); sem max_rows, um cursor do servidor
+
+        Returns:
+            rows : generator
+                Um gerador dos blocos de linhas (ID do Ponto seguido das colunas)
+        '''
+        if max_rows is None:
+            yield from self.model.stream_view(columns, chunk_size=chunk_size)
+            return
+
+        after = 0
+        while max_rows > 0:
+            rows = self.model.select_page(columns, after=after, limit=min(chunk_size, max_rows))
+            if not rows:
+                return
+            yield rows
+            after = rows[-1][0]
+            max_rows -= len(rows)
+
+    def write_metrics(self, json_path=None, prometheus_path=None):
+        '''
+        Método para escrever as métricas da execução (ver metrics.py): tempo e
+        itens de cada etapa, duração dos métodos do ETL e das operações na Base
+        de Dados (p50/p95/p99), requisições à API, viagens à Base de Dados,
+        acertos do cache e linhas carregadas
+
+        Args:
+            json_path : str
+                Arquivo JSON do resumo. None para apenas registrá-lo no log (nível INFO)
+
+            prometheus_path : str
+                Arquivo no formato texto do Prometheus. None para não escrever
+        '''
+        if self.cache is not None:
+            REGISTRY.set('geocode_cache_hits', self.cache.hits)
+            REGISTRY.set('geocode_cache_misses', self.cache.misses)
+        for field, (hits, misses) in self.normalizer.stats().items():
+            REGISTRY.set('normalize_cache_hits', hits, field=field)
+            REGISTRY.set('normalize_cache_misses', misses, field=field)
+        if self.simplifier is not None:
+            REGISTRY.set('simplify_points_in', self.simplifier.points_in)
+            REGISTRY.set('simplify_points_out', self.simplifier.points_out)
+        REGISTRY.write(json_path=json_path, prometheus_path=prometheus_path)
+
+    @timed('etl_method_seconds', method='show')
+    def show(self, max_rows=None, max_columns=None, columns=None, chunk_size=10000):
+        '''
+        Método para mostrar a tabela de dados.
+        Apenas as linhas e colunas mostradas são lidas da Base de Dados, em
+        blocos de chunk_size linhas, e cada bloco é mostrado assim que é lido.
 
         Args:
             max_rows : int
-                Quantidade de linhas da tabela a serem mostradas
+                Quantidade de linhas da tabela a serem mostradas.
+                None para mostrar todas
             
             max_columns : int
                 Quantidade de colunas da tabela a serem mostradas 
+
+            columns : tuple
+                Colunas a serem mostradas (ver load.VIEW_COLUMNS). None para todas
+
+            chunk_size : int
+                Quantidade de linhas lidas e mostradas por vez
         '''
         print("\nData Visualization\n")
-        data = self.model.select_all()
-        if not data:
+        columns = tuple(columns or SHOW_COLUMNS)
+        first = True
+        for rows in self._view_pages(columns, max_rows, chunk_size):
+            self._print_rows(rows, [SHOW_COLUMNS[column] for column in columns],
+                            max_columns, header=first)
+            first = False
+
+        if first:
             print("\nNenhum dado a ser mostrado!\nCrie as tabelas e carregue os dados primeiro.\n")
-            return
+
+    def _print_rows(self, rows, names, max_columns, header=True):
+        '''
+        Método auxiliar para mostrar um bloco de linhas da visão dos Pontos
+
+        Args:
+            rows : list
+                Linhas (ID do Ponto seguido das colunas)
+
+            names : list
+                Nomes das colunas mostrados no cabeçalho
+
+            max_columns : int
+                Quantidade de colunas da tabela a serem mostradas
+
+            header : bool
+                Flag para mostrar o cabeçalho
+        '''
+        import pandas as pd
 
         # Torna os dados mais apresentáveis com os métodos title() e upper()
-        data = [list(row) for row in data]
-        for row in data:
-            for j, elem in enumerate(row):
-                if isinstance(elem, str):
-                    row[j] = elem.title()
-                    if len(elem) == 2:
-                        row[j] = elem.upper()
-        # Cria DataFrame de dados
-        df = pd.DataFrame(data=list(data),
-                        columns=['Latitude', 'Longitude', 'Rua', 'Número',
-                                'Bairro', 'Cidade', 'CEP', 'Estado', 'País'])
-        # Mostra DataFrame
-        with pd.option_context('display.max_rows', max_rows, 'display.max_columns', max_columns):
-            print(df)
\ No newline at end of file
+        data = [[_display(elem) if isinstance(elem, str) else elem for elem in row[1:]]
+                for row in rows]
+        # Cria DataFrame do bloco, indexado pelo ID do Ponto
+        df = pd.DataFrame(data=data, index=[row[0] for row in rows], columns=names)
+        print(df.to_string(header=header, max_cols=max_columns))
+
+    @timed('etl_method_seconds', method='points_in_box')
+    def points_in_box(self, min_lat, min_lng, max_lat, max_lng, columns=None, limit=None):
+        '''
+        Método para buscar os Pontos dentro de um retângulo de coordenadas,
+        pelo índice espacial (as tabelas devem ter sido criadas com spatial=True)
+
+        Args:
+            min_lat, min_lng, max_lat, max_lng : float
+                Limites do retângulo (em graus)
+
+            columns : tuple
+                Colunas da visão dos Pontos (ver load.VIEW_COLUMNS). None para todas
+
+            limit : int
+                Quantidade máxima de Pontos. None para todos
+
+        Returns:
+            rows : tuple | None
+                Linhas (ID do Ponto seguido das colunas) ou None caso as
+                tabelas não tenham o esquema espacial
+        '''
+        return self.model.select_box(min_lat, min_lng, max_lat, max_lng,
+                                    columns=columns, limit=limit)
+
+    @timed('etl_method_seconds', method='points_near')
+    def points_near(self, lat, lng, radius, columns=None, limit=None):
+        '''
+        Método para buscar os Pontos a até `radius` metros de uma coordenada,
+        pelo índice espacial (as tabelas devem ter sido criadas com spatial=True)
+
+        Args:
+            lat, lng : float
+                Coordenada do centro da busca
+
+            radius : float
+                Raio da busca (em metros)
+
+            columns, limit : ver points_in_box
+
+        Returns:
+            rows : tuple | None
+                Linhas (ID do Ponto seguido das colunas e da distância em metros),
+                da mais próxima para a mais distante, ou None caso as tabelas
+                não tenham o esquema espacial
+        '''
+        return self.model.select_radius(lat, lng, radius, columns=columns, limit=limit)
+
+    @timed('etl_method_seconds', method='show_area')
+    def show_area(self, bbox=None, center=None, radius=None, max_rows=None, max_columns=None,
+                columns=None):
+        '''
+        Método para mostrar os Pontos de uma área: um retângulo (bbox) ou um
+        círculo (center e radius)
+
+        Args:
+            bbox : tuple
+                Limites do retângulo (min_lat, min_lng, max_lat, max_lng)
+
+            center : tuple
+                Centro do círculo (lat, lng)
+
+            radius : float
+                Raio do círculo (em metros)
+
+            max_rows, max_columns, columns : ver show
+        '''
+        columns = tuple(columns or SHOW_COLUMNS)
+        names = [SHOW_COLUMNS[column] for column in columns]
+        if radius is not None:
+            rows = self.points_near(center[0], center[1], radius, columns=columns, limit=max_rows)
+            names.append('Distância (m)')
+        else:
+            rows = self.points_in_box(*bbox, columns=columns, limit=max_rows)
+
+        print("\nData Visualization\n")
+        if rows:
+            self._print_rows(rows, names, max_columns)
+        else:
+            print("\nNenhum Ponto encontrado na área.\n")
+
+    @timed('etl_method_seconds', method='export_csv')
+    def export_csv(self, path, columns=None, chunk_size=10000):
+        '''
+        Método para exportar a visão desnormalizada dos Pontos para um arquivo CSV.
+        Os dados são lidos com um cursor do servidor e escritos em blocos,
+        sem carregar a tabela inteira em memória.
+
+        Args:
+            path : str
+                Caminho do arquivo CSV
+
+            columns : tuple
+                Colunas a serem exportadas (ver load.VIEW_COLUMNS). None para todas
+
+            chunk_size : int
+                Quantidade de linhas lidas e escritas por vez
+        '''
+        columns = tuple(columns or SHOW_COLUMNS)
+        n_rows = 0
+        start = time()
+        with open(path, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(('pointID',) + columns)
+            for rows in self.model.stream_view(columns, chunk_size=chunk_size):
+                writer.writerows(rows)
+                n_rows += len(rows)
+
+        LOGGER.info("Exported %d rows to '%s' in %.2fs", n_rows, path, time() - start)
+
+    @timed('etl_method_seconds', method='export_parquet')
+    def export_parquet(self, path, chunk_size=100000, compression='snappy', max_open_files=64):
+        '''
+        Método para exportar a visão desnormalizada dos Pontos para arquivos
+        Parquet particionados por Estado e data da carga
+        (<path>/stateUF=<estado>/loadDate=<data>/part-<n>.parquet), com as colunas
+        de texto codificadas em dicionário. Os dados são lidos com um cursor do
+        servidor e escritos em blocos, para que as análises leiam os arquivos
+        em vez de consultar a Base de Dados.
+
+        Args:
+            path : str
+                Diretório raiz dos arquivos Parquet
+
+            chunk_size : int
+                Quantidade de linhas lidas e escritas por vez
+
+            compression : str
+                Compressão dos arquivos ('snappy', 'gzip', 'zstd' ou None)
+
+            max_open_files : int
+                Quantidade máxima de arquivos abertos ao mesmo tempo
+        '''
+        from export import write_parquet
+
+        columns = tuple(VIEW_COLUMNS)
+        start = time()
+        n_rows, n_partitions = write_parquet(self.model.stream_view(columns, chunk_size=chunk_size),
+                                            columns, path, compression=compression,
+                                            max_open_files=max_open_files)
+        LOGGER.info("Exported %d rows to %d partitions in '%s' in %.2fs",
+                    n_rows, n_partitions, path, time() - start)
@@ -0,0 +1,156 @@
+from collections import OrderedDict
+from os import makedirs
+from os.path import join
+
+# Nome da partição usada para valores nulos (convenção do Hive)
+NULL_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+
+# Colunas numéricas da visão dos Pontos; as demais (textos) são codificadas em dicionário
+NUMERIC_COLUMNS = ('pointID', 'pointLAT', 'pointLNG')
+
+def _schema(pa, columns):
+    '''
+    Função auxiliar para montar o esquema Arrow dos arquivos Parquet.
+    As colunas de texto são codificadas em dicionário: cada valor distinto
+    (ex.: nome do bairro) é armazenado uma única vez por grupo de linhas.
+
+    Args:
+        pa : module
+            Módulo pyarrow
+
+        columns : tuple
+            Colunas dos arquivos
+
+    Returns:
+        pyarrow.Schema
+            Esquema dos arquivos
+    '''
+    fields = []
+    for column in columns:
+        if column == 'pointID':
+            fields.append(pa.field(column, pa.int64()))
+        elif column in NUMERIC_COLUMNS:
+            fields.append(pa.field(column, pa.float64()))
+        elif column == 'pointCreatedAt':
+            fields.append(pa.field(column, pa.timestamp('s')))
+        else:
+            fields.append(pa.field(column, pa.dictionary(pa.int32(), pa.string())))
+    return pa.schema(fields)
+
+
+def _partition(state, created):
+    '''
+    Função auxiliar para montar o diretório da partição de um Ponto,
+    no formato do Hive: stateUF=<estado>/loadDate=<data da carga>
+
+    Returns:
+        tuple
+            Nomes dos diretórios da partição
+    '''
+    return ('stateUF={}'.format(state or NULL_PARTITION),
+            'loadDate={}'.format(created.date().isoformat() if created else NULL_PARTITION))
+
+
+def _table(pa, schema, rows):
+    '''
+    Função auxiliar para converter as linhas de uma partição em uma tabela Arrow
+
+    Args:
+        pa : module
+            Módulo pyarrow
+
+        schema : pyarrow.Schema
+            Esquema dos arquivos (ver _schema)
+
+        rows : list
+            Linhas da partição, na ordem das colunas do esquema
+
+    Returns:
+        pyarrow.Table
+            Tabela com as linhas da partição
+    '''
+    arrays = []
+    for i, field in enumerate(schema):
+        values = [row[i] for row in rows]
+        if pa.types.is_dictionary(field.type):
+            arrays.append(pa.array(values, type=pa.string()).dictionary_encode())
+        else:
+            arrays.append(pa.array(values, type=field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def write_parquet(chunks, columns, path, compression='snappy', max_open_files=64):
+    '''
+    Função para escrever a visão desnormalizada dos Pontos em arquivos Parquet
+    particionados por Estado e data da carga. Os blocos de linhas são escritos
+    à medida que são recebidos, cada um como um grupo de linhas (row group)
+    do arquivo de sua partição, então a memória usada depende apenas do
+    tamanho dos blocos e da quantidade de arquivos abertos.
+
+    Ao ultrapassar `max_open_files`, o arquivo da partição usada há mais tempo
+    é fechado; se a partição receber mais linhas, elas são escritas em um novo
+    arquivo (part-1.parquet, part-2.parquet, ...) no mesmo diretório.
+
+    Args:
+        chunks : generator
+            Um gerador de blocos de linhas (ID do Ponto seguido das colunas),
+            como o de load.Model.stream_view
+
+        columns : tuple
+            Colunas das linhas (sem o ID do Ponto). Devem conter
+            'stateUF' e 'pointCreatedAt', usadas no particionamento
+
+        path : str
+            Diretório raiz dos arquivos Parquet
+
+        compression : str
+            Compressão dos arquivos ('snappy', 'gzip', 'zstd' ou None)
+
+        max_open_files : int
+            Quantidade máxima de arquivos abertos ao mesmo tempo
+
+    Returns:
+        tuple
+            Quantidade de linhas escritas e de partições
+    '''
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns = ('pointID',) + tuple(columns)
+    state_index = columns.index('stateUF')
+    created_index = columns.index('pointCreatedAt')
+    # O Estado fica apenas no nome do diretório da partição
+    file_columns = tuple(column for column in columns if column != 'stateUF')
+    schema = _schema(pa, file_columns)
+
+    # Arquivos abertos, do usado há mais tempo ao mais recente
+    writers = OrderedDict()
+    # Quantidade de arquivos de cada partição
+    parts = {}
+    n_rows = 0
+    try:
+        for rows in chunks:
+            partitions = {}
+            for row in rows:
+                key = _partition(row[state_index], row[created_index])
+                partitions.setdefault(key, []).append(row[:state_index] + row[state_index + 1:])
+
+            for key, partition_rows in partitions.items():
+                if key in writers:
+                    writers.move_to_end(key)
+                else:
+                    if len(writers) >= max_open_files:
+                        writers.popitem(last=False)[1].close()
+                    part = parts.get(key, 0)
+                    makedirs(join(path, *key), exist_ok=True)
+                    writers[key] = pq.ParquetWriter(
+                        join(path, *key, 'part-{}.parquet'.format(part)), schema,
+                        compression=compression)
+                    parts[key] = part + 1
+                writers[key].write_table(_table(pa, schema, partition_rows))
+            n_rows += len(rows)
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    return n_rows, len(parts)
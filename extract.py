@@ -1,11 +1,29 @@
-import geocoder
+from hashlib import sha256
 from os import walk
 from os.path import isfile, isdir
-from collections import namedtuple
+from time import monotonic, perf_counter, sleep
+from threading import Lock
+from collections import namedtuple, deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
 
-def _get_files(files_path):
+from geocoders import OSMGeocoder
+from metrics import REGISTRY
+
+# Linha que marca o fim de cada arquivo em get_points. A leitura de um
+# arquivo nunca retorna uma linha vazia (linhas em branco contêm '\n')
+END_OF_FILE = ''
+
+class DataError(Exception):
+    '''
+    Erro ao obter os dados de uma coordenada no backend de geocodificação
+    '''
+
+
+def get_files(files_path):
     '''
-    Método auxiliar para pegar os nomes dos arquivos que contém os dados de coordenadas
+    Método para pegar os nomes dos arquivos que contém os dados de coordenadas.
+    Os subdiretórios são percorridos recursivamente e os arquivos são retornados
+    em ordem alfabética.
 
     Args:
         files_path : str
@@ -15,34 +33,121 @@ def _get_files(files_path):
         str | generator
             Um gerador contendo os nomes dos arquivos
     '''
-    for files_path, _, files in walk(files_path):
-        return (str(files_path) + '/' + elem.strip() for elem in files)
+    for path, dirs, files in walk(files_path):
+        # Ordena os subdiretórios para que a ordem de leitura seja sempre a mesma
+        dirs.sort()
+        for elem in sorted(files):
+            yield str(path) + '/' + elem.strip()
 
 
-def get_points(files_path):
+def read_file(file_name, buffer_size=1024 * 1024):
     '''
-    Método para ler as coordenadas dos arquivos de dados
+    Método para ler as linhas de um arquivo uma a uma, sem armazená-las em memória
 
     Args:
-        files : str
+        file_name : str
+            Caminho do arquivo com os dados dos Pontos
+
+        buffer_size : int
+            Tamanho (em bytes) do buffer de leitura do arquivo
+
+    Returns:
+        str | generator
+            Um gerador contendo as linhas do arquivo
+    '''
+    assert isfile(file_name) # Testa se o arquivo existe
+
+    with open(file_name, 'r', buffering=buffer_size) as file:
+        yield from file
+
+
+def hash_file(file_name, buffer_size=1024 * 1024):
+    '''
+    Método para calcular o hash (SHA-256) do conteúdo de um arquivo
+
+    Args:
+        file_name : str
+            Caminho do arquivo
+
+        buffer_size : int
+            Tamanho (em bytes) dos blocos lidos do arquivo
+
+    Returns:
+        str
+            Hash do conteúdo do arquivo em hexadecimal
+    '''
+    file_hash = sha256()
+    with open(file_name, 'rb') as file:
+        for block in iter(lambda: file.read(buffer_size), b''):
+            file_hash.update(block)
+    return file_hash.hexdigest()
+
+
+def count_points(file_names, buffer_size=1024 * 1024):
+    '''
+    Método para estimar a quantidade de Pontos dos arquivos pela quantidade
+    de linhas de Longitude (cada coordenada termina em uma Longitude). As
+    linhas inconsistentes descartadas no tratamento também são contadas.
+
+    Args:
+        file_names : list | generator
+            Caminhos dos arquivos com os dados dos Pontos
+
+        buffer_size : int
+            Tamanho (em bytes) do buffer de leitura dos arquivos
+
+    Returns:
+        int
+            Quantidade estimada de Pontos
+    '''
+    total = 0
+    for file_name in file_names:
+        with open(file_name, 'rb', buffering=buffer_size) as file:
+            total += sum(1 for line in file if line[:2] == b'Lo')
+    return total
+
+
+def _read_lines(files_path, buffer_size):
+    '''
+    Método auxiliar para ler as linhas dos arquivos uma a uma, sem armazená-las em memória
+
+    Args:
+        files_path : str
             Diretório onde encontram-se os arquivos com os dados dos Pontos
 
+        buffer_size : int
+            Tamanho (em bytes) do buffer de leitura dos arquivos
+
     Returns:
         str | generator
-            Um gerador contendo a lista de coordenadas
+            Um gerador contendo as linhas dos arquivos, com END_OF_FILE
+            no final de cada arquivo
     '''
-    points = []
+    for file_name in get_files(files_path):
+        yield from read_file(file_name, buffer_size)
+        yield END_OF_FILE
 
-    assert isdir(files_path) # Testa se o diretório existe
 
-    for file_name in _get_files(files_path):
+def get_points(files_path, buffer_size=1024 * 1024):
+    '''
+    Método para ler as coordenadas dos arquivos de dados
 
-        assert isfile(file_name) # Testa se o arquivo existe
+    Args:
+        files : str
+            Diretório onde encontram-se os arquivos com os dados dos Pontos
+
+        buffer_size : int
+            Tamanho (em bytes) do buffer de leitura dos arquivos
+
+    Returns:
+        str | generator
+            Um gerador contendo a lista de coordenadas. O fim de cada
+            arquivo é marcado com a linha END_OF_FILE
+    '''
+    assert isdir(files_path) # Testa se o diretório existe
 
-        with open(file_name, 'r') as file:
-            points += file.readlines()
     # Retorna generator
-    return (line for line in points)
+    return _read_lines(files_path, buffer_size)
 
 
 '''
@@ -51,15 +156,187 @@ pois não armazenam seus atributos em um dicionário.
 '''
 Point = namedtuple('Point', 'lat lng street housenumber suburb city postal state country')
 
-def get_data_points(points):
+class RateLimiter:
+    '''
+    Limitador de requisições (token bucket) compartilhado entre as threads
+    que acessam a API de Mapas. Cada requisição consome um token e os tokens
+    são repostos a uma taxa de `rate` por segundo.
+    '''
+    def __init__(self, rate, burst=1):
+        '''
+        Args:
+            rate : float
+                Quantidade máxima de requisições por segundo
+
+            burst : int
+                Quantidade máxima de requisições feitas de uma só vez
+        '''
+        self.rate = rate
+        self.capacity = burst
+        self._tokens = burst
+        self._last = monotonic()
+        self._lock = Lock()
+
+    def acquire(self):
+        '''
+        Método para aguardar até que uma requisição possa ser feita
+        '''
+        with self._lock:
+            now = monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            # O token é reservado mesmo que o saldo fique negativo,
+            # e a thread aguarda o tempo necessário para repô-lo
+            self._tokens -= 1
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0
+        if delay > 0:
+            sleep(delay)
+
+
+def reverse_point(point, backend, limiter=None):
+    '''
+    Método para pegar os dados de uma coordenada no backend de geocodificação
+
+    Args:
+        point : tuple
+            Coordenada (lat, lng)
+
+        backend : OSMGeocoder | OfflineGeocoder
+            Backend de geocodificação (ver geocoders.py)
+
+        limiter : RateLimiter
+            Limitador de requisições. None para não limitar
+
+    Returns:
+        Point
+            Namedtuple contendo os dados do ponto obtidos através do backend
+
+    Raises:
+        DataError
+            Caso não seja possível obter os dados
+    '''
+    if limiter is not None:
+        limiter.acquire()
+    name = type(backend).__name__
+    start = perf_counter()
+    try:
+        # Pega dados do backend
+        data = backend.reverse(point)
+    except Exception as e:
+        REGISTRY.inc('geocoder_errors_total', backend=name)
+        raise DataError('Could not get the data of {} from {}: {}'.format(point, name, e)) from e
+    finally:
+        REGISTRY.observe('geocoder_request_seconds', perf_counter() - start, backend=name)
+    REGISTRY.inc('geocoder_requests_total', backend=name)
+    return Point(lat=data.get('lat', None),
+                lng=data.get('lng', None),
+                street=data.get('street', None),
+                housenumber=data.get('housenumber', None),
+                suburb=data.get('suburb', None),
+                city=data.get('city', None),
+                postal=data.get('postal', None),
+                state=data.get('state', None),
+                country=data.get('country', None))
+
+
+def get_cached_point(cache, point):
+    '''
+    Método para buscar um ponto no cache
+
+    Returns:
+        Point | None
+            Ponto armazenado no cache ou None caso não exista
     '''
-    Método usado para acessar a API OpenStreetMap
+    if cache is None:
+        return None
+    data = cache.get(point)
+    return Point(**data) if data is not None else None
+
+
+def set_cached_point(cache, point, point_data):
+    '''
+    Método para armazenar um ponto no cache.
+    Apenas respostas válidas são armazenadas.
+    '''
+    if cache is not None and point_data.lat is not None:
+        cache.set(point, point_data._asdict())
+
+
+def _from_memo(memo, cell):
+    '''
+    Método auxiliar para buscar o resultado já obtido para uma célula do agrupamento espacial
+
+    Returns:
+        Future | Point | None
+            Resultado da célula ou None caso não exista
+    '''
+    if cell is None or cell not in memo:
+        return None
+    memo.move_to_end(cell)
+    return memo[cell]
+
+
+def _to_memo(memo, cell, result, size):
+    '''
+    Método auxiliar para armazenar o resultado de uma célula do agrupamento espacial.
+    As células menos usadas recentemente são descartadas ao ultrapassar `size`.
+    '''
+    if cell is None:
+        return
+    memo[cell] = result
+    memo.move_to_end(cell)
+    if len(memo) > size:
+        memo.popitem(last=False)
+
+
+def set_coordinates(point_data, point):
+    '''
+    Método para usar a coordenada original do arquivo nos dados de um ponto.
+    O backend retorna a coordenada do endereço encontrado (e o cache e os
+    agrupamentos, a de uma coordenada próxima); os Pontos são sempre
+    armazenados com a coordenada lida do arquivo, com ou sem agrupamento.
+
+    Returns:
+        Point
+            Dados do ponto com a coordenada original
+    '''
+    return point_data._replace(lat=point[0], lng=point[1])
+
+
+def get_data_points(points, cache=None, workers=1, rate=None, ordered=True, backend=None,
+                    clustered=False, memo_size=10000):
+    '''
+    Método usado para acessar o backend de geocodificação (por padrão, a API OpenStreetMap)
 
     Args:
-        lat : float
-            Latitude do ponto
-        lng : float
-            Longitude do ponto
+        points : generator | list
+            Lista de coordenadas (lat, lng) limpas (tratadas). Se `clustered`
+            for True, lista de tuplas (célula, (lat, lng)) de transform.cluster_points
+
+        cache : GeocodeCache
+            Cache persistente consultado antes de acessar a API. None para não usar cache
+
+        workers : int
+            Quantidade de threads acessando a API simultaneamente
+
+        rate : float
+            Quantidade máxima de requisições por segundo à API. None para não limitar.
+            Ignorado para backends sem limite de requisições (ver geocoders.py)
+
+        ordered : bool
+            Se True, os pontos são retornados na ordem de entrada; se False,
+            são retornados à medida que as requisições terminam
+
+        backend : OSMGeocoder | OfflineGeocoder
+            Backend de geocodificação. None para usar a API OpenStreetMap
+
+        clustered : bool
+            Se True, apenas a primeira coordenada de cada célula acessa a API e
+            seus dados são replicados para as demais coordenadas da célula
+            (cada uma com a sua própria coordenada, ver set_coordinates)
+
+        memo_size : int
+            Quantidade máxima de células mantidas em memória
 
     Returns:
         Point : generator
@@ -69,20 +346,76 @@ def get_data_points(points):
         DataError
             Caso não seja possível obter os dados
     '''
-    for point in points:        
-        try:
-            # Pega dados da API
-            data = geocoder.osm(point, method='reverse').json
-        except:
-            raise Exception("teste")
-        else:
+    backend = backend or OSMGeocoder()
+    limiter = RateLimiter(rate) if rate and backend.rate_limited else None
+    items = points if clustered else ((None, point) for point in points)
+    # Resultados já obtidos por célula do agrupamento espacial
+    memo = OrderedDict()
+
+    if workers <= 1:
+        for cell, point in items:
+            # Busca os dados no agrupamento e no cache antes de acessar a API
+            point_data = _from_memo(memo, cell) or get_cached_point(cache, point)
+            if point_data is None:
+                point_data = reverse_point(point, backend, limiter)
+                set_cached_point(cache, point, point_data)
+            _to_memo(memo, cell, point_data, memo_size)
             # Retorna generators de Point
-            yield Point(lat=data.get('lat', None),
-                    lng=data.get('lng', None),
-                    street=data.get('street', None),
-                    housenumber=data.get('housenumber', None),
-                    suburb=data.get('suburb', None),
-                    city=data.get('city', None),
-                    postal=data.get('postal', None),
-                    state=data.get('state', None),
-                    country=data.get('country', None))
\ No newline at end of file
+            yield set_coordinates(point_data, point)
+        return
+
+    # Quantidade máxima de requisições pendentes, para manter a memória limitada
+    window = workers * 4
+    # Pontos pendentes: (coordenada, Future | Point, flag de nova requisição)
+    pending = deque()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for cell, point in items:
+            # O cache é acessado apenas nesta thread
+            result = _from_memo(memo, cell) or get_cached_point(cache, point)
+            requested = result is None
+            if requested:
+                result = executor.submit(reverse_point, point, backend, limiter)
+            _to_memo(memo, cell, result, memo_size)
+
+            if not ordered and not isinstance(result, Future):
+                yield set_coordinates(result, point)
+                continue
+            pending.append((point, result, requested))
+
+            while len(pending) >= window:
+                yield from _next_results(pending, cache, ordered)
+
+        while pending:
+            yield from _next_results(pending, cache, ordered)
+
+
+def _next_results(pending, cache, ordered):
+    '''
+    Método auxiliar para retirar resultados da fila de requisições pendentes.
+    Se `ordered` for True, retorna o primeiro da fila; caso contrário,
+    aguarda e retorna todos os que já terminaram.
+
+    Returns:
+        Point : generator
+            Um gerador dos pontos retirados da fila
+    '''
+    if ordered:
+        point, result, requested = pending.popleft()
+        if isinstance(result, Future):
+            result = result.result()
+        if requested:
+            set_cached_point(cache, point, result)
+        yield set_coordinates(result, point)
+        return
+
+    wait([result for _, result, _ in pending], return_when=FIRST_COMPLETED)
+    for _ in range(len(pending)):
+        point, result, requested = pending.popleft()
+        if not result.done():
+            pending.append((point, result, requested))
+            continue
+        result = result.result()
+        if requested:
+            set_cached_point(cache, point, result)
+        yield set_coordinates(result, point)
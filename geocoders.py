@@ -0,0 +1,299 @@
+import csv
+import json
+from math import ceil, cos, radians, sqrt
+
+from log import get_logger
+
+LOGGER = get_logger('geocoders')
+
+# Campos retornados pelos backends (os mesmos da namedtuple extract.Point)
+FIELDS = ('lat', 'lng', 'street', 'housenumber', 'suburb', 'city', 'postal', 'state', 'country')
+
+# Propriedades de GeoJSON (tags do OpenStreetMap) correspondentes aos campos
+GEOJSON_PROPERTIES = {
+    'street'        :   ('street', 'addr:street', 'name'),
+    'housenumber'   :   ('housenumber', 'addr:housenumber'),
+    'suburb'        :   ('suburb', 'addr:suburb'),
+    'city'          :   ('city', 'addr:city'),
+    'postal'        :   ('postal', 'addr:postcode'),
+    'state'         :   ('state', 'addr:state'),
+    'country'       :   ('country', 'addr:country'),
+}
+
+
+class OSMGeocoder:
+    '''
+    Backend que acessa a API do OpenStreetMap (Nominatim) através do módulo geocoder
+    '''
+    # As requisições devem respeitar o limite de requisições por segundo do serviço
+    rate_limited = True
+
+    def __init__(self, url=None):
+        '''
+        Args:
+            url : str
+                URL do serviço de geocodificação. None para usar o OpenStreetMap
+        '''
+        # O módulo geocoder (e o requests) é importado apenas quando o backend é usado
+        import geocoder
+
+        self._osm = geocoder.osm
+        self._kwargs = {'url': url} if url else {}
+
+
+    def reverse(self, point):
+        '''
+        Método para pegar os dados de uma coordenada
+
+        Args:
+            point : tuple
+                Coordenada (lat, lng)
+
+        Returns:
+            dict
+                Dados do ponto (ver FIELDS)
+        '''
+        return self._osm(point, method='reverse', **self._kwargs).json
+
+
+class _KDTree:
+    '''
+    Árvore KD de duas dimensões para buscar o ponto mais próximo.
+    As coordenadas são projetadas em um plano (equiretangular) centrado na
+    latitude média dos pontos, o que é preciso o suficiente para uma região.
+    '''
+    def __init__(self, points):
+        '''
+        Args:
+            points : list
+                Lista de coordenadas (lat, lng)
+        '''
+        self._scale = cos(radians(sum(lat for lat, _ in points) / max(len(points), 1)))
+        self._points = [(lng * self._scale, lat) for lat, lng in points]
+        # Nós da árvore: (índice do ponto, eixo, filho esquerdo, filho direito)
+        self._nodes = []
+        self._root = self._build(list(range(len(points))), 0)
+
+
+    def _build(self, indexes, depth):
+        '''
+        Método auxiliar para montar a árvore, dividindo os pontos pela mediana
+
+        Returns:
+            int
+                Posição do nó em self._nodes, ou -1 para uma árvore vazia
+        '''
+        if not indexes:
+            return -1
+        axis = depth % 2
+        indexes.sort(key=lambda i: self._points[i][axis])
+        middle = len(indexes) // 2
+        node = len(self._nodes)
+        self._nodes.append(None)
+        left = self._build(indexes[:middle], depth + 1)
+        right = self._build(indexes[middle + 1:], depth + 1)
+        self._nodes[node] = (indexes[middle], axis, left, right)
+        return node
+
+
+    def nearest(self, point):
+        '''
+        Método para buscar o ponto mais próximo de uma coordenada
+
+        Args:
+            point : tuple
+                Coordenada (lat, lng)
+
+        Returns:
+            tuple
+                Índice do ponto mais próximo e sua distância em graus de latitude
+        '''
+        target = (point[1] * self._scale, point[0])
+        best, best_dist = -1, float('inf')
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node < 0:
+                continue
+            index, axis, left, right = self._nodes[node]
+            x, y = self._points[index]
+            dist = (x - target[0]) ** 2 + (y - target[1]) ** 2
+            if dist < best_dist:
+                best, best_dist = index, dist
+            diff = target[axis] - self._points[index][axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            # O outro lado só precisa ser visitado se puder ter um ponto mais próximo
+            if diff ** 2 < best_dist:
+                stack.append(far)
+            stack.append(near)
+        return best, sqrt(best_dist)
+
+
+class OfflineGeocoder:
+    '''
+    Backend que responde a partir de um arquivo local de endereços
+    (CSV ou GeoJSON), indexado em uma árvore KD. Cada coordenada recebe
+    os dados do endereço mais próximo.
+    '''
+    # Não há serviço externo, então não há limite de requisições
+    rate_limited = False
+
+    def __init__(self, path, max_distance=200):
+        '''
+        Args:
+            path : str
+                Arquivo de endereços. CSV com as colunas de FIELDS, ou GeoJSON
+                cujas geometrias (Point, LineString, Polygon...) têm os endereços
+                nas propriedades (ver GEOJSON_PROPERTIES)
+
+            max_distance : float
+                Distância máxima (em metros) até o endereço mais próximo.
+                Coordenadas mais distantes ficam sem dados
+        '''
+        self.max_distance = max_distance
+        if path.lower().endswith(('.json', '.geojson')):
+            self._features = list(self._read_geojson(path))
+        else:
+            self._features = list(self._read_csv(path))
+        self._tree = _KDTree([(feature['lat'], feature['lng']) for feature in self._features])
+
+
+    def _read_csv(self, path):
+        '''
+        Método auxiliar para ler os endereços de um arquivo CSV.
+        Linhas sem Latitude ou Longitude válidas são ignoradas.
+
+        Returns:
+            dict : generator
+                Um gerador dos endereços
+        '''
+        skipped, first = 0, None
+        with open(path, newline='') as file:
+            reader = csv.DictReader(file)
+            for row in reader:
+                feature = {field: row.get(field) or None for field in FIELDS}
+                try:
+                    feature['lat'] = float(feature['lat'])
+                    feature['lng'] = float(feature['lng'])
+                except (TypeError, ValueError):
+                    skipped += 1
+                    first = first or reader.line_num
+                    continue
+                yield feature
+        if skipped:
+            LOGGER.warning("Skipped %d rows without valid coordinates in '%s' (first at line %d)",
+                        skipped, path, first)
+
+
+    def _read_geojson(self, path):
+        '''
+        Método auxiliar para ler os endereços de um arquivo GeoJSON.
+        Cada vértice das geometrias é indexado com as propriedades da feature;
+        segmentos longos (ex.: ruas) recebem vértices intermediários a cada
+        max_distance / 2 metros, para que qualquer ponto do segmento seja encontrado.
+
+        Returns:
+            dict : generator
+                Um gerador dos endereços
+        '''
+        with open(path) as file:
+            collection = json.load(file)
+
+        for feature in collection.get('features', []):
+            properties = feature.get('properties') or {}
+            address = {}
+            for field, keys in GEOJSON_PROPERTIES.items():
+                address[field] = next((properties[key] for key in keys if properties.get(key)), None)
+            for line in self._lines((feature.get('geometry') or {}).get('coordinates', [])):
+                for lng, lat in self._densify(line):
+                    yield dict(address, lat=lat, lng=lng)
+
+
+    def _lines(self, coordinates):
+        '''
+        Método auxiliar para percorrer as sequências de vértices de qualquer geometria GeoJSON
+
+        Returns:
+            list : generator
+                Um gerador das listas de vértices [lng, lat]
+        '''
+        if not coordinates:
+            return
+        if isinstance(coordinates[0], (int, float)):
+            yield [coordinates]
+        elif isinstance(coordinates[0][0], (int, float)):
+            yield coordinates
+        else:
+            for item in coordinates:
+                yield from self._lines(item)
+
+
+    def _densify(self, line):
+        '''
+        Método auxiliar para adicionar vértices intermediários aos segmentos de uma linha
+
+        Returns:
+            tuple : generator
+                Um gerador dos vértices (lng, lat)
+        '''
+        step = self.max_distance / 2
+        yield line[0][0], line[0][1]
+        for (lng1, lat1, *_), (lng2, lat2, *_) in zip(line, line[1:]):
+            length = 111320.0 * sqrt((lat2 - lat1) ** 2 + ((lng2 - lng1) * cos(radians(lat1))) ** 2)
+            parts = max(1, int(ceil(length / step))) if step > 0 else 1
+            for i in range(1, parts + 1):
+                yield lng1 + (lng2 - lng1) * i / parts, lat1 + (lat2 - lat1) * i / parts
+
+
+    def reverse(self, point):
+        '''
+        Método para pegar os dados do endereço mais próximo de uma coordenada
+
+        Args:
+            point : tuple
+                Coordenada (lat, lng)
+
+        Returns:
+            dict
+                Dados do endereço (ver FIELDS) ou um dicionário vazio caso
+                não exista endereço a menos de max_distance metros
+        '''
+        index, distance = self._tree.nearest(point)
+        # Um grau de latitude tem aproximadamente 111.32 km
+        if index < 0 or distance * 111320.0 > self.max_distance:
+            return {}
+        return self._features[index]
+
+
+def get_geocoder(backend='osm', url=None, path=None, max_distance=200):
+    '''
+    Método para criar o backend de geocodificação
+
+    Args:
+        backend : str
+            'osm' para a API do OpenStreetMap ou 'offline' para um arquivo local
+
+        url : str
+            URL do serviço de geocodificação (backend 'osm')
+
+        path : str
+            Arquivo de endereços (backend 'offline')
+
+        max_distance : float
+            Distância máxima (em metros) até o endereço mais próximo (backend 'offline')
+
+    Returns:
+        OSMGeocoder | OfflineGeocoder
+            Backend de geocodificação
+
+    Raises:
+        ValueError
+            Caso o backend não exista ou o backend 'offline' não tenha arquivo de endereços
+    '''
+    if backend == 'offline':
+        if not path:
+            raise ValueError("The 'offline' geocoder backend needs an address file (path)")
+        return OfflineGeocoder(path, max_distance=max_distance)
+    if backend == 'osm':
+        return OSMGeocoder(url=url)
+    raise ValueError("Unknown geocoder backend '{}'".format(backend))
@@ -2,18 +2,260 @@
 # sudo apt-get install libmysqlclient-dev
 # pip install mysqlclient
 
-from MySQLdb import Connect
+from collections import OrderedDict
+from contextlib import contextmanager
+from math import cos, radians
+from queue import Queue, Empty
+from threading import Lock
+from time import sleep
+from MySQLdb import Connect, OperationalError, ProgrammingError
+from MySQLdb.cursors import SSCursor
+from log import get_logger
+from metrics import REGISTRY, timed
 from settings import DATABASE_SETTINGS
 
+LOGGER = get_logger('load')
+
+# Colunas do tipo UNIQUE das tabelas de dimensão
+UNIQUE_COLUMNS = {
+    'Country'   :   'countryName',
+    'State'     :   'stateUF',
+    'City'      :   'cityName',
+    'Suburb'    :   'suburbName',
+}
+
+# Colunas da visão desnormalizada dos Pontos (ver sql/select.sql): {coluna: expressão}
+VIEW_COLUMNS = OrderedDict([
+    ('pointLAT',            'Point.pointLAT'),
+    ('pointLNG',            'Point.pointLNG'),
+    ('pointStreetName',     'Point.pointStreetName'),
+    ('pointHouseNumber',    'Point.pointHouseNumber'),
+    ('suburbName',          'Suburb.suburbName'),
+    ('cityName',            'City.cityName'),
+    ('pointPostalCode',     'Point.pointPostalCode'),
+    ('stateUF',             'State.stateUF'),
+    ('countryName',         'Country.countryName'),
+    ('pointCreatedAt',      'Point.pointCreatedAt'),
+])
+
+VIEW_JOINS = '''
+    FROM Point
+    LEFT JOIN Suburb
+    ON Point.suburbID = Suburb.id
+    LEFT JOIN City
+    ON Suburb.cityID = City.id
+    LEFT JOIN State
+    ON City.stateID = State.id
+    LEFT JOIN Country
+    ON State.countryID = Country.id
+'''
+
+# Sistema de referência (WGS 84) da coluna pointGeom do esquema espacial
+SRID = 4326
+
+# Coluna pointGeom do esquema espacial: gerada (STORED) a partir das coordenadas,
+# então é preenchida por insert, insert_many e LOAD DATA sem mudanças na carga.
+# SRID é um atributo da coluna e vem depois da cláusula AS (...) STORED.
+# Internamente o MySQL guarda os pontos geográficos como (longitude, latitude)
+SPATIAL_COLUMNS = '''
+                    pointGeom POINT AS (ST_SRID(POINT(pointLNG, pointLAT), {srid})) STORED SRID {srid} NOT NULL,
+                    SPATIAL INDEX (pointGeom),'''.format(srid=SRID)
+
+# Quantidade aproximada de metros em um grau de latitude
+METERS_PER_DEGREE = 111320.0
+
+# Códigos de erro do MySQL para conexões perdidas ou recusadas
+# (2003: can't connect, 2006: server has gone away, 2013: lost connection, 2055: lost connection)
+CONNECTION_ERRORS = (2003, 2006, 2013, 2055)
+
+
+def _is_connection_error(error):
+    '''
+    Função auxiliar para testar se um erro é de conexão perdida
+    '''
+    return isinstance(error, OperationalError) and error.args and error.args[0] in CONNECTION_ERRORS
+
+
+# Códigos de erro do MySQL para conflitos entre transações simultâneas
+# (1205: lock wait timeout, 1213: deadlock). A transação é desfeita e pode
+# ser executada novamente na mesma conexão
+TRANSACTION_ERRORS = (1205, 1213)
+
+
+def _is_transaction_error(error):
+    '''
+    Função auxiliar para testar se um erro é de conflito entre transações
+    '''
+    return isinstance(error, OperationalError) and error.args and error.args[0] in TRANSACTION_ERRORS
+
+
+# Código de erro do MySQL para tabelas inexistentes (1146: table doesn't exist)
+NO_SUCH_TABLE = 1146
+
+
+class _Cursor:
+    '''
+    Cursor que conta as viagens de ida e volta à Base de Dados
+    (métrica db_roundtrips_total, ver metrics.py)
+    '''
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, args=None):
+        REGISTRY.inc('db_roundtrips_total')
+        return self._cursor.execute(query, args)
+
+    def executemany(self, query, args):
+        REGISTRY.inc('db_roundtrips_total')
+        return self._cursor.executemany(query, args)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class ConnectionPool:
+    '''
+    Pool de conexões com a Base de Dados. As conexões são criadas sob demanda
+    até `size`, testadas (ping) antes de serem entregues e recriadas com
+    espera exponencial (backoff) caso a conexão tenha sido perdida.
+    '''
+    def __init__(self, size=1, retries=3, backoff=1.0, **connect_args):
+        '''
+        Args:
+            size : int
+                Quantidade máxima de conexões abertas
+
+            retries : int
+                Quantidade de novas tentativas de conexão
+
+            backoff : float
+                Tempo (em segundos) de espera antes da primeira nova tentativa;
+                dobra a cada tentativa
+
+            connect_args : dict
+                Argumentos de MySQLdb.Connect
+        '''
+        self.size = size
+        self.retries = retries
+        self.backoff = backoff
+        self._connect_args = connect_args
+        self._idle = Queue()
+        self._created = 0
+        self._lock = Lock()
+
+
+    def _connect(self):
+        '''
+        Método auxiliar para abrir uma nova conexão, tentando novamente
+        com backoff caso o servidor não esteja acessível
+
+        Returns:
+            conn : Connection
+                Nova conexão com a Base de Dados
+        '''
+        for attempt in range(self.retries + 1):
+            try:
+                return Connect(**self._connect_args)
+            except OperationalError as e:
+                if not _is_connection_error(e) or attempt == self.retries:
+                    raise e
+                sleep(self.backoff * 2 ** attempt)
+
+
+    def acquire(self):
+        '''
+        Método para pegar uma conexão do pool. Aguarda caso todas estejam em uso.
+
+        Returns:
+            conn : Connection
+                Conexão testada com a Base de Dados
+        '''
+        try:
+            conn = self._idle.get_nowait()
+        except Empty:
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            if create:
+                try:
+                    return self._connect()
+                except Exception as e:
+                    with self._lock:
+                        self._created -= 1
+                    raise e
+            conn = self._idle.get()
+
+        # Verifica se a conexão continua ativa
+        try:
+            conn.ping()
+        except OperationalError:
+            self.discard(conn)
+            return self.acquire()
+        return conn
+
+
+    def release(self, conn):
+        '''
+        Método para devolver uma conexão ao pool
+        '''
+        self._idle.put(conn)
+
+
+    def discard(self, conn):
+        '''
+        Método para descartar uma conexão perdida, liberando espaço no pool
+        '''
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._created -= 1
+
+
+    @contextmanager
+    def connection(self):
+        '''
+        Gerenciador de contexto para usar uma conexão do pool e devolvê-la ao final
+        '''
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+
+    def close(self):
+        '''
+        Método para fechar as conexões que não estão em uso
+        '''
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except Empty:
+                break
+
+
 class Model:
     def __init__(self):
+        self.pool = None
         self._conn = None
         self._cursor = None
+        # Cache dos IDs das tabelas de dimensão: {tabela: {valor: ID}}
+        self._ids = {table: OrderedDict() for table in UNIQUE_COLUMNS}
+        # Instruções parametrizadas já montadas: {(tipo, tabela, colunas): instrução}
+        self._statements = {}
+        self._cache_size = None
 
 
-    def connect(self, host, user, password, database):
+    def connect(self, host, user, password, database, cache_size=None, local_infile=False,
+                pool_size=1, retries=3, backoff=1.0):
         '''
-        Método para conectar-se à Base de Dados
+        Método para conectar-se à Base de Dados.
+        Os IDs das tabelas de dimensão (Country, State, City, Suburb) são
+        carregados para a memória, de forma que as inserções de valores
+        já existentes não precisem consultar a Base de Dados.
 
         Args:
             host : str
@@ -27,14 +269,169 @@ class Model:
 
             database : str
                 Nome do Database a ser utilizado
+
+            cache_size : int
+                Quantidade máxima de IDs em memória por tabela de dimensão.
+                Ao ultrapassar este valor, os menos usados recentemente são
+                descartados. None para não limitar
+
+            local_infile : bool
+                Flag para permitir o uso de LOAD DATA LOCAL INFILE
+
+            pool_size : int
+                Quantidade máxima de conexões do pool. Uma delas é usada pelo
+                Model e as demais pelos Models criados com clone, usados
+                nas cargas concorrentes (ver ETL.load_data)
+
+            retries : int
+                Quantidade de novas tentativas ao perder a conexão
+
+            backoff : float
+                Tempo (em segundos) de espera antes da primeira nova tentativa
         '''
+        self._cache_size = cache_size
         try:
-            self._conn = Connect(host, user, password, database)
-            self._cursor = self._conn.cursor()
+            self.pool = ConnectionPool(size=pool_size, retries=retries, backoff=backoff,
+                                    host=host, user=user, passwd=password, db=database,
+                                    local_infile=int(local_infile))
+            self._conn = self.pool.acquire()
+            self._cursor = _Cursor(self._conn.cursor())
         except Exception as e:
             raise e
         else:
-            print("Connecting to '{}' database...".format(database))
+            LOGGER.info("Connecting to '%s' database...", database)
+        self._load_ids()
+
+
+    def clone(self):
+        '''
+        Método para criar um Model com outra conexão do mesmo pool, usado para
+        inserir dados em paralelo. Aguarda caso todas as conexões estejam em uso.
+        A conexão deve ser devolvida com release.
+
+        Returns:
+            Model
+                Model conectado, com o seu próprio cache de IDs
+        '''
+        model = Model()
+        model.pool = self.pool
+        model._cache_size = self._cache_size
+        model._conn = self.pool.acquire()
+        model._cursor = _Cursor(model._conn.cursor())
+        model._load_ids()
+        return model
+
+
+    def release(self):
+        '''
+        Método para devolver ao pool a conexão de um Model criado com clone
+        '''
+        self.pool.release(self._conn)
+        self._conn = self._cursor = None
+
+
+    def reconnect(self):
+        '''
+        Método para trocar a conexão perdida por uma nova conexão do pool.
+        Os dados não escritos (sem commit) foram perdidos, então o cache
+        de IDs é carregado novamente.
+        '''
+        self.pool.discard(self._conn)
+        self._conn = self.pool.acquire()
+        self._cursor = _Cursor(self._conn.cursor())
+        self._load_ids()
+        LOGGER.warning('Reconnecting...')
+
+
+    def rollback(self):
+        '''
+        Método para desfazer a transação atual. Os IDs inseridos na transação
+        foram desfeitos, então o cache de IDs é carregado novamente.
+        '''
+        self._conn.rollback()
+        self._load_ids()
+        LOGGER.warning('Transaction conflict, retrying...')
+
+
+    def retry(self, function, *args):
+        '''
+        Método para executar uma transação (tudo o que é feito entre dois commits),
+        executando-a novamente em uma nova conexão caso a conexão seja perdida,
+        ou na mesma conexão caso a transação seja desfeita por um conflito com
+        outra conexão (deadlock ou lock wait timeout, ver TRANSACTION_ERRORS).
+        A função deve terminar com o commit, para que nada seja escrito duas vezes.
+
+        Args:
+            function : callable
+                Função que executa a transação
+
+            args : tuple
+                Argumentos da função
+
+        Returns
+            O retorno da função
+        '''
+        for attempt in range(self.pool.retries + 1):
+            try:
+                return function(*args)
+            except OperationalError as e:
+                connection_error = _is_connection_error(e)
+                if not (connection_error or _is_transaction_error(e)) or attempt == self.pool.retries:
+                    raise e
+                sleep(self.pool.backoff * 2 ** attempt)
+                if connection_error:
+                    self.reconnect()
+                else:
+                    self.rollback()
+
+
+    def _load_ids(self):
+        '''
+        Método auxiliar para carregar os IDs das tabelas de dimensão,
+        com uma única consulta por tabela
+        '''
+        for table, column in UNIQUE_COLUMNS.items():
+            self._ids[table].clear()
+            query = 'SELECT id, {} FROM {} ORDER BY id'.format(column, table)
+            if self._cache_size:
+                # Carrega apenas os mais recentes
+                query = 'SELECT * FROM ({} DESC LIMIT {}) AS recent ORDER BY id'.format(
+                    query, self._cache_size)
+            try:
+                self._cursor.execute(query + ';')
+            except ProgrammingError as e:
+                # A tabela ainda não existe; os demais erros são propagados
+                if e.args and e.args[0] == NO_SUCH_TABLE:
+                    continue
+                raise
+            for _id, value in self._cursor.fetchall():
+                self._ids[table][value.lower()] = _id
+
+
+    def _get_id(self, table, value):
+        '''
+        Método auxiliar para buscar o ID de um valor no cache de uma tabela de dimensão
+
+        Returns:
+            _id : int | None
+                ID do valor ou None caso não esteja no cache
+        '''
+        ids = self._ids[table]
+        _id = ids.get(value)
+        if _id is not None:
+            ids.move_to_end(value)
+        return _id
+
+
+    def _set_id(self, table, value, _id):
+        '''
+        Método auxiliar para armazenar o ID de um valor no cache de uma tabela de dimensão
+        '''
+        ids = self._ids[table]
+        ids[value] = _id
+        ids.move_to_end(value)
+        if self._cache_size and len(ids) > self._cache_size:
+            ids.popitem(last=False)
 
 
     def close(self):
@@ -42,11 +439,12 @@ class Model:
         Método para fechar a conexão com a Base de Dados
         '''
         try:
-            self._conn.close()
+            self.pool.release(self._conn)
+            self.pool.close()
         except Exception as e:
             raise e
         else:
-            print("Closing connection...")
+            LOGGER.info('Closing connection...')
 
 
     def drop_table(self, table):
@@ -62,14 +460,18 @@ class Model:
         except:
             pass
         else:
-            print("Dropping '{}' table...".format(table))
+            if table in self._ids:
+                self._ids[table].clear()
+            LOGGER.info("Dropping '%s' table...", table)
 
 
+    @timed('db_operation_seconds', operation='commit')
     def commit(self):
         '''
         Método para escrever os dados na Base de Dados
         '''
         try:
+            REGISTRY.inc('db_roundtrips_total')
             self._conn.commit()
         except Exception as e:
             raise e
@@ -77,147 +479,512 @@ class Model:
             pass
         
 
-    def select(self, columns=[], tables=[], value=None):
+    def _statement(self, kind, table, columns):
         '''
-        Método para ler dados da Base de Dados
+        Método auxiliar para montar as instruções parametrizadas (INSERT/UPSERT).
+        Cada instrução é montada uma única vez por tabela e conjunto de colunas
+        e reutilizada nas chamadas seguintes.
 
         Args:
-            columns : list
-                Lista de colunas a serem selecionadas
+            kind : str
+                Tipo da instrução: 'INSERT' ou 'UPSERT'. O 'UPSERT'
+                é um INSERT que, se o valor UNIQUE já existir, retorna o ID
+                existente em lastrowid em vez de falhar
 
-            tables : list
-                Lista de tabelas
+            table : str
+                Tabela
 
-            value : str
-                Valor a ser usado com a cláusula WHERE
+            columns : tuple
+                Colunas da instrução
 
         Returns
-            n_rows : int
-                Quantidade de linhas retornadas
+            statement : str
+                Instrução com marcadores %s para os valores
+        '''
+        key = (kind, table, columns)
+        statement = self._statements.get(key)
+        if statement is None:
+            statement = 'INSERT INTO {} ({}) VALUES ({})'.format(
+                table, ', '.join(columns), ', '.join(['%s'] * len(columns)))
+            if kind == 'UPSERT':
+                statement += ' ON DUPLICATE KEY UPDATE id=LAST_INSERT_ID(id)'
+            statement += ';'
+            self._statements[key] = statement
+        return statement
+
+
+    def _view_query(self, columns=None, extra=None):
+        '''
+        Método auxiliar para montar a consulta da visão desnormalizada dos Pontos.
+        A primeira coluna retornada é sempre o ID do Ponto.
+
+        Args:
+            columns : tuple
+                Colunas de VIEW_COLUMNS a serem lidas. None para todas
+
+            extra : str
+                Expressão retornada após as colunas (ex.: distância). None para nenhuma
+
+        Returns:
+            query : str
+                Consulta (sem WHERE e ORDER BY)
         '''
-        columns = [columns] if not isinstance(columns, list) else columns
-        tables = [tables] if not isinstance(tables, list) else tables
+        columns = columns or tuple(VIEW_COLUMNS)
+        unknown = [column for column in columns if column not in VIEW_COLUMNS]
+        if unknown:
+            raise ValueError("Unknown columns: {}".format(', '.join(unknown)))
+        expressions = [VIEW_COLUMNS[column] for column in columns] + ([extra] if extra else [])
+        return 'SELECT Point.id, ' + ', '.join(expressions) + VIEW_JOINS
+
+
+    @timed('db_operation_seconds', operation='select_page')
+    def select_page(self, columns=None, after=0, limit=100):
+        '''
+        Método para ler uma página da visão desnormalizada dos Pontos.
+        A paginação é feita pelo ID do Ponto (keyset), então cada página
+        é lida pelo índice da chave primária, sem percorrer as anteriores.
+
+        Args:
+            columns : tuple
+                Colunas de VIEW_COLUMNS a serem lidas. None para todas
+
+            after : int
+                ID do último Ponto da página anterior (0 para a primeira página)
+
+            limit : int
+                Quantidade máxima de linhas da página
+
+        Returns
+            rows : tuple | None
+                Linhas (ID do Ponto seguido das colunas) ou None caso as
+                tabelas não existam
+        '''
+        query = self._view_query(columns) + 'WHERE Point.id > %s ORDER BY Point.id LIMIT %s;'
         try:
-            n_rows = self._cursor.execute('''SELECT {} FROM {} WHERE {}={};'''.format(
-                ', '.join(map(lambda item: str(item), columns)),
-                ', '.join(map(lambda item: str(item), tables)),
-                columns[1],
-                self._add_aspas(value)
-            ))
+            self._cursor.execute(query, (after, limit))
+        except:
+            return None
+        else:
+            return self._cursor.fetchall()
+
+
+    def _box(self, min_lat, min_lng, max_lat, max_lng):
+        '''
+        Método auxiliar para montar o retângulo de uma consulta espacial
+
+        Returns:
+            tuple
+                Condição (MBRContains, que usa o SPATIAL INDEX de pointGeom)
+                e seu parâmetro (o retângulo em WKT)
+        '''
+        polygon = 'POLYGON(({0} {1}, {2} {1}, {2} {3}, {0} {3}, {0} {1}))'.format(
+            min_lng, min_lat, max_lng, max_lat)
+        condition = "MBRContains(ST_GeomFromText(%s, {}, 'axis-order=long-lat'), Point.pointGeom)".format(SRID)
+        return condition, polygon
+
+
+    def has_spatial_schema(self):
+        '''
+        Método para verificar se a tabela Point foi criada com o esquema espacial
+        (ver create_tables)
+
+        Returns:
+            bool
+                True caso a tabela Point tenha a coluna pointGeom
+        '''
+        try:
+            n_rows = self._cursor.execute("SHOW COLUMNS FROM Point LIKE 'pointGeom';")
         except Exception as e:
             raise e
         else:
-            return n_rows
+            return bool(n_rows)
 
 
-    def select_all(self):
+    def _spatial_select(self, query, args):
         '''
-        Método para ler todos os dados da Base de Dados
+        Método auxiliar para executar uma consulta espacial
 
         Returns
-            self._cursor.fetchall() : tuple
-                Dados lidos da Base de Dados
+            rows : tuple | None
+                Linhas ou None caso as tabelas não tenham o esquema espacial
         '''
         try:
-            ret = self._cursor.execute(
-                '''
-                SELECT Point.pointLAT,
-                       Point.pointLNG,
-                       Point.pointStreetName,
-                       Point.pointHouseNumber, 
-                       Suburb.suburbName,
-                       City.cityName,
-                       Point.pointPostalCode,
-                       State.stateUF,
-                       Country.countryName 
-                FROM Point
-                LEFT JOIN Suburb
-                ON Point.suburbID = Suburb.id
-                LEFT JOIN City
-                ON Suburb.cityID = City.id
-                LEFT JOIN State
-                ON City.stateID = State.id
-                LEFT JOIN Country
-                ON State.countryID = Country.id;
-                '''
-            )
-        except:
+            self._cursor.execute(query, args)
+        except Exception as e:
+            LOGGER.error('Spatial query failed (tables must be created with the spatial schema): %s', e)
             return None
         else:
             return self._cursor.fetchall()
 
 
-    def _add_aspas(self, item):
+    @timed('db_operation_seconds', operation='select_box')
+    def select_box(self, min_lat, min_lng, max_lat, max_lng, columns=None, limit=None):
         '''
-        Método para formatar dados: se o item é uma String, 
-        são adicionadas aspas ('') no item.
+        Método para ler os Pontos dentro de um retângulo de coordenadas.
+        Requer o esquema espacial (ver create_tables): a busca é feita pelo
+        SPATIAL INDEX da coluna pointGeom, sem percorrer a tabela.
 
         Args:
-            item : str | int | float
-                Item a ser formatado
+            min_lat, min_lng, max_lat, max_lng : float
+                Limites do retângulo (em graus)
+
+            columns : tuple
+                Colunas de VIEW_COLUMNS a serem lidas. None para todas
+
+            limit : int
+                Quantidade máxima de linhas. None para todas
 
         Returns
-            str(item) : str
-                Item formatado
+            rows : tuple | None
+                Linhas (ID do Ponto seguido das colunas), na ordem dos IDs,
+                ou None caso as tabelas não tenham o esquema espacial
         '''
-        if isinstance(item, str):
-            return f"'{item.lower()}'"
-        return str(item)
+        condition, polygon = self._box(min_lat, min_lng, max_lat, max_lng)
+        query = self._view_query(columns) + 'WHERE ' + condition + ' ORDER BY Point.id'
+        args = [polygon]
+        if limit is not None:
+            query += ' LIMIT %s'
+            args.append(limit)
+        return self._spatial_select(query + ';', args)
+
 
-    
-    def insert(self, table=None, columns=[], values=[]):
+    @timed('db_operation_seconds', operation='select_radius')
+    def select_radius(self, lat, lng, radius, columns=None, limit=None):
+        '''
+        Método para ler os Pontos a até `radius` metros de uma coordenada.
+        Requer o esquema espacial (ver create_tables): os Pontos do retângulo
+        que contém o círculo são buscados pelo SPATIAL INDEX da coluna pointGeom
+        e apenas eles têm a distância (ST_Distance_Sphere) calculada.
+
+        Args:
+            lat, lng : float
+                Centro do círculo (em graus)
+
+            radius : float
+                Raio do círculo (em metros)
+
+            columns : tuple
+                Colunas de VIEW_COLUMNS a serem lidas. None para todas
+
+            limit : int
+                Quantidade máxima de linhas. None para todas
+
+        Returns
+            rows : tuple | None
+                Linhas (ID do Ponto seguido das colunas e da distância em
+                metros), da mais próxima para a mais distante, ou None caso
+                as tabelas não tenham o esquema espacial
+        '''
+        delta_lat = radius / METERS_PER_DEGREE
+        # A largura de um grau de longitude diminui com o cosseno da latitude
+        delta_lng = min(180.0, radius / (METERS_PER_DEGREE * max(cos(radians(lat)), 1e-6)))
+        condition, polygon = self._box(max(lat - delta_lat, -90.0), max(lng - delta_lng, -180.0),
+                                    min(lat + delta_lat, 90.0), min(lng + delta_lng, 180.0))
+        distance = 'ST_Distance_Sphere(Point.pointGeom, ST_SRID(POINT(%s, %s), {}))'.format(SRID)
+        # Os parâmetros seguem a ordem da consulta: centro (distância), retângulo e raio
+        query = (self._view_query(columns, extra=distance + ' AS pointDistance')
+                + 'WHERE ' + condition + ' HAVING pointDistance <= %s ORDER BY pointDistance')
+        args = [lng, lat, polygon, radius]
+        if limit is not None:
+            query += ' LIMIT %s'
+            args.append(limit)
+        return self._spatial_select(query + ';', args)
+
+
+    def stream_view(self, columns=None, chunk_size=10000):
+        '''
+        Método para ler toda a visão desnormalizada dos Pontos em blocos, com
+        um cursor do lado do servidor (SSCursor): as linhas são recebidas à
+        medida que são lidas, sem carregar o resultado inteiro em memória.
+        Enquanto o gerador não termina, a conexão não pode ser usada para
+        outras consultas.
+
+        Args:
+            columns : tuple
+                Colunas de VIEW_COLUMNS a serem lidas. None para todas
+
+            chunk_size : int
+                Quantidade de linhas de cada bloco
+
+        Returns:
+            rows : generator
+                Um gerador dos blocos de linhas (ID do Ponto seguido das colunas)
+        '''
+        cursor = _Cursor(self._conn.cursor(SSCursor))
+        try:
+            cursor.execute(self._view_query(columns) + 'ORDER BY Point.id;')
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
+
+    @timed('db_operation_seconds', operation='insert')
+    def insert(self, table=None, columns=(), values=()):
         '''
         Método para inserir dados na Base de Dados.
         Se a coluna for do tipo UNIQUE (countryName, stateUF, cityName, suburbName),
-        é testado se o dado já existe na Base de Dados. Se já existir, o ID do dado
-        é retornado; se o dado não existir, o dado é adicionado à Base de Dados e
-        seu ID é retornado.
+        é testado se o dado já existe no cache de IDs. Se não existir, o dado é
+        inserido com ON DUPLICATE KEY UPDATE, que retorna o ID do dado já existente
+        na Base de Dados ou o ID da nova inserção. Assim, várias conexões podem
+        inserir o mesmo valor ao mesmo tempo sem conflitos.
+
+        Os valores são enviados como parâmetros da instrução, então não precisam
+        de aspas nem de tratamento de caracteres especiais.
 
         Args:
             table : str
                 Tabela onde os dados serão inseridos
 
-            columns : list
-                Lista de colunas
+            columns : str | tuple
+                Coluna ou tupla de colunas
 
-            values : list
-                Lista de valores correspondentes às colunas
+            values : str | int | float | tuple | list
+                Valor ou lista de valores correspondentes às colunas
 
         Returns
             _id | self._cursor.lastrowid : int
                 ID do dado adicionado ou do dado já existente
         '''
-        columns = [columns] if not isinstance(columns, list) else columns
-        values = [values] if not isinstance(values, list) else values
+        columns = (columns,) if isinstance(columns, str) else columns
+        values = values if isinstance(values, (tuple, list)) else (values,)
 
-        # Busca o ID e o valor Único da tabela na base de dados para
-        # verificar se já existe (countryName, stateUF, cityName, suburbName)
-        n_rows = self.select(columns=['id', columns[0]], tables=table, value=values[0])
-        
-        if n_rows > 0: # Se o valor já existe, retorna o ID
-            _data = self._cursor.fetchall()[0]
-            
-            # Testa se os valores são iguais
-            _id, _value = _data
-            if values[0] == _value:
+        if table in self._ids:
+            key = str(values[0]).lower()
+            # Busca o ID no cache da tabela de dimensão
+            _id = self._get_id(table, key)
+            if _id is not None:
                 return _id
-        
-        # Se o valor não existe, insere ele
+
+            # Insere o valor ou, se ele já existir (inserido por outra conexão
+            # ou descartado do cache), obtém o ID existente
+            try:
+                self._cursor.execute(self._statement('UPSERT', table, columns), values)
+            except Exception as e:
+                raise e
+            else:
+                self._set_id(table, key, self._cursor.lastrowid)
+                return self._cursor.lastrowid
+
         try:
-            ret = self._cursor.execute('''INSERT INTO {} ({}) VALUES ({});'''.format(
-                table,
-                ', '.join(map(lambda item: str(item), columns)), 
-                ', '.join(map(lambda item: self._add_aspas(item), values))
-            ))
+            self._cursor.execute(self._statement('INSERT', table, columns), values)
         except Exception as e:
             raise e
         else:
             return self._cursor.lastrowid # retorna o ID da nova inserção
 
 
-    def create_tables(self):
+    @timed('db_operation_seconds', operation='insert_many')
+    def insert_many(self, table=None, columns=(), rows=()):
+        '''
+        Método para inserir várias linhas de uma só vez na Base de Dados.
+        A instrução é parametrizada e enviada com executemany, que a
+        transforma em um único INSERT com várias linhas.
+
+        Args:
+            table : str
+                Tabela onde os dados serão inseridos
+
+            columns : tuple
+                Tupla de colunas
+
+            rows : list
+                Lista de linhas, cada uma com os valores correspondentes às colunas
+
+        Returns
+            n_rows : int
+                Quantidade de linhas inseridas
+        '''
+        columns = (columns,) if isinstance(columns, str) else tuple(columns)
+        try:
+            n_rows = self._cursor.executemany(self._statement('INSERT', table, columns), rows)
+        except Exception as e:
+            raise e
+        else:
+            return n_rows
+
+
+    @timed('db_operation_seconds', operation='load_file')
+    def load_file(self, table, columns, file_name, disable_keys=True):
+        '''
+        Método para carregar um arquivo TSV em uma tabela com LOAD DATA LOCAL INFILE.
+        O arquivo deve estar codificado em UTF-8, os valores nulos representados
+        por \\N e os caracteres especiais (\\, tab e quebra de linha) escapados com \\.
+
+        Args:
+            table : str
+                Tabela onde os dados serão inseridos
+
+            columns : tuple
+                Tupla de colunas, na mesma ordem dos campos do arquivo
+
+            file_name : str
+                Caminho do arquivo TSV
+
+            disable_keys : bool
+                Flag para desativar os índices e as verificações de chaves
+                durante a carga, reativando-os ao final
+
+        Returns
+            n_rows : int
+                Quantidade de linhas inseridas
+        '''
+        columns = (columns,) if isinstance(columns, str) else columns
+        if disable_keys:
+            self._cursor.execute('SET unique_checks=0;')
+            self._cursor.execute('SET foreign_key_checks=0;')
+            self._cursor.execute(f'ALTER TABLE {table} DISABLE KEYS;')
+        try:
+            n_rows = self._cursor.execute('''
+                LOAD DATA LOCAL INFILE %s INTO TABLE {}
+                CHARACTER SET utf8mb4
+                FIELDS TERMINATED BY '\\t'
+                LINES TERMINATED BY '\\n'
+                ({});
+            '''.format(table, ', '.join(columns)), (file_name,))
+        except Exception as e:
+            raise e
+        else:
+            return n_rows
+        finally:
+            if disable_keys:
+                self._enable_keys(table)
+
+
+    def _enable_keys(self, table):
+        '''
+        Método auxiliar para reativar os índices e as verificações de chaves
+        desativados por load_file. Se a conexão foi perdida, as opções da sessão
+        já não existem e o erro original da carga não é substituído.
+        '''
+        try:
+            self._cursor.execute(f'ALTER TABLE {table} ENABLE KEYS;')
+            self._cursor.execute('SET foreign_key_checks=1;')
+            self._cursor.execute('SET unique_checks=1;')
+        except OperationalError as e:
+            if not _is_connection_error(e):
+                raise e
+            LOGGER.warning("Connection lost during LOAD DATA; run 'ALTER TABLE %s ENABLE KEYS;' "
+                        "if the table uses MyISAM", table)
+
+
+    def get_checkpoint(self, file_name):
+        '''
+        Método para ler o registro de carga de um arquivo na tabela Ledger
+
+        Args:
+            file_name : str
+                Caminho do arquivo, relativo ao diretório dos arquivos
+
+        Returns
+            tuple | None
+                (ID do registro, hash do arquivo, quantidade de coordenadas
+                carregadas, flag de arquivo concluído) ou None caso o arquivo
+                nunca tenha sido carregado
+        '''
+        try:
+            n_rows = self._cursor.execute(
+                'SELECT id, fileHash, pointOffset, done FROM Ledger WHERE fileName=%s;',
+                (file_name,))
+        except Exception as e:
+            raise e
+        else:
+            return self._cursor.fetchone() if n_rows else None
+
+
+    def set_checkpoint(self, file_name, file_hash, offset):
+        '''
+        Método para registrar a quantidade de coordenadas de um arquivo já
+        carregadas. Deve ser chamado antes do commit, para que o registro seja
+        escrito na mesma transação dos dados.
+
+        Args:
+            file_name : str
+                Caminho do arquivo, relativo ao diretório dos arquivos
+
+            file_hash : str
+                Hash do conteúdo do arquivo
+
+            offset : int
+                Quantidade de coordenadas do arquivo já carregadas
+        '''
+        try:
+            self._cursor.execute(
+                '''
+                    INSERT INTO Ledger (fileName, fileHash, pointOffset, done)
+                    VALUES (%s, %s, %s, FALSE)
+                    ON DUPLICATE KEY UPDATE fileHash=VALUES(fileHash),
+                                            pointOffset=VALUES(pointOffset),
+                                            done=FALSE;
+                ''', (file_name, file_hash, offset))
+        except Exception as e:
+            raise e
+
+
+    def reset_checkpoint(self, file_name, file_hash):
+        '''
+        Método para (re)iniciar a carga de um arquivo: apaga os Pontos de uma
+        carga anterior do arquivo (ledgerID) e volta o registro para o início,
+        com o novo hash. Deve ser chamado antes do commit, para que a deleção e
+        o registro sejam escritos na mesma transação.
+
+        Args:
+            file_name : str
+                Caminho do arquivo, relativo ao diretório dos arquivos
+
+            file_hash : str
+                Hash do conteúdo do arquivo
+
+        Returns
+            n_rows : int
+                Quantidade de Pontos apagados
+        '''
+        try:
+            n_rows = self._cursor.execute(
+                'DELETE FROM Point WHERE ledgerID = (SELECT id FROM Ledger WHERE fileName=%s);',
+                (file_name,))
+        except Exception as e:
+            raise e
+        self.set_checkpoint(file_name, file_hash, 0)
+        return n_rows
+
+
+    def finish_checkpoint(self, file_name, file_hash):
+        '''
+        Método para marcar um arquivo como completamente carregado
+
+        Args:
+            file_name : str
+                Caminho do arquivo, relativo ao diretório dos arquivos
+
+            file_hash : str
+                Hash do conteúdo do arquivo
+        '''
+        try:
+            self._cursor.execute(
+                '''
+                    INSERT INTO Ledger (fileName, fileHash, done)
+                    VALUES (%s, %s, TRUE)
+                    ON DUPLICATE KEY UPDATE done=TRUE;
+                ''', (file_name, file_hash))
+        except Exception as e:
+            raise e
+
+
+    def create_tables(self, spatial=False):
         '''
         Método para criar as tabelas
+
+        Args:
+            spatial : bool
+                Flag para criar a tabela Point com o esquema espacial: a coluna
+                pointGeom (POINT SRID 4326), gerada a partir das coordenadas, com
+                um SPATIAL INDEX usado por select_box e select_radius (MySQL 8).
+                O SPATIAL INDEX exige uma coluna NOT NULL, então nesse esquema
+                os Pontos sem Latitude ou Longitude não são carregados (ver ETL._rows)
         '''
         try:
             self._cursor.execute(
@@ -266,22 +1033,39 @@ class Model:
             '''
             )
 
+            # Ledger é criada antes de Point, que a referencia (ledgerID)
+            self._cursor.execute(
+            '''
+                CREATE TABLE IF NOT EXISTS Ledger (
+                    id INT NOT NULL AUTO_INCREMENT,
+                    fileName VARCHAR(255) NOT NULL UNIQUE,
+                    fileHash CHAR(64) NOT NULL,
+                    pointOffset INT NOT NULL DEFAULT 0,
+                    done BOOLEAN NOT NULL DEFAULT FALSE,
+                    PRIMARY KEY (id)
+                );
+            '''
+            )
+
             self._cursor.execute(
             '''
                 CREATE TABLE IF NOT EXISTS Point (
                     id INT NOT NULL AUTO_INCREMENT,
-                    pointLAT FLOAT,
-                    pointLNG FLOAT,
+                    pointLAT DOUBLE,
+                    pointLNG DOUBLE,
                     pointStreetName VARCHAR(100),
                     pointHouseNumber VARCHAR(20),
                     pointPostalCode VARCHAR(20),
                     suburbID INT(11) NOT NULL,
+                    ledgerID INT,
+                    pointCreatedAt TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,{}
                     PRIMARY KEY (id),
-                    FOREIGN KEY (suburbID) REFERENCES Suburb(id)
+                    FOREIGN KEY (suburbID) REFERENCES Suburb(id),
+                    FOREIGN KEY (ledgerID) REFERENCES Ledger(id)
                 );
-            '''
+            '''.format(SPATIAL_COLUMNS if spatial else '')
             )
         except Exception as e:
             raise e
         else:
-            print("Creating tables...")
\ No newline at end of file
+            LOGGER.info('Creating tables...')
\ No newline at end of file
@@ -0,0 +1,125 @@
+import logging
+from datetime import timedelta
+from time import monotonic
+
+# Formato das mensagens
+FORMAT = '%(asctime)s %(levelname)-7s %(name)s: %(message)s'
+
+# Intervalo (em segundos) entre os relatórios de progresso (ver setup)
+PROGRESS_INTERVAL = 10.0
+
+def setup(level='INFO', path=None, progress_interval=10.0):
+    '''
+    Função para configurar as mensagens do ETL
+
+    Args:
+        level : str
+            Nível mínimo das mensagens: 'DEBUG' (inclui os dados de cada Ponto
+            carregado), 'INFO', 'WARNING' ou 'ERROR'
+
+        path : str
+            Arquivo onde as mensagens também são escritas. None para apenas a tela
+
+        progress_interval : float
+            Intervalo (em segundos) entre os relatórios de progresso da carga
+    '''
+    global PROGRESS_INTERVAL
+    PROGRESS_INTERVAL = progress_interval
+    handlers = [logging.StreamHandler()]
+    if path:
+        handlers.append(logging.FileHandler(path))
+    logging.basicConfig(level=level, format=FORMAT, handlers=handlers)
+
+
+def get_logger(name):
+    '''
+    Função para pegar o logger de um módulo do ETL
+
+    Args:
+        name : str
+            Nome do módulo (ex.: 'load')
+
+    Returns:
+        logging.Logger
+            Logger 'etl.<name>'
+    '''
+    return logging.getLogger('etl.' + name)
+
+
+class Progress:
+    '''
+    Relatório periódico do progresso da carga: Pontos consumidos, linhas
+    inseridas, Pontos ignorados (sem Bairro ou sem outras informações), vazão e tempo restante estimado.
+    Substitui as mensagens por Ponto, que tornavam a carga mais lenta.
+    '''
+    def __init__(self, logger, total=None, interval=None):
+        '''
+        Args:
+            logger : logging.Logger
+                Logger onde os relatórios são escritos
+
+            total : int
+                Quantidade estimada de Pontos, usada para o tempo restante.
+                None para não estimar
+
+            interval : float
+                Intervalo (em segundos) entre os relatórios. None para usar
+                o intervalo de setup
+        '''
+        self.logger = logger
+        self.total = total
+        self.interval = PROGRESS_INTERVAL if interval is None else interval
+        self.points = 0
+        self.rows = 0
+        self.skipped = 0
+        self._start = self._last = monotonic()
+
+
+    def update(self, points, rows, skipped):
+        '''
+        Método para somar o progresso de um intervalo de commit e, caso o
+        intervalo de tempo tenha passado, escrever o relatório
+
+        Args:
+            points : int
+                Pontos consumidos
+
+            rows : int
+                Linhas inseridas na tabela Point
+
+            skipped : int
+                Pontos ignorados por não conterem Bairro ou outras informações
+        '''
+        self.points += points
+        self.rows += rows
+        self.skipped += skipped
+        now = monotonic()
+        if now - self._last >= self.interval:
+            self._last = now
+            self.report()
+
+
+    def report(self, final=False):
+        '''
+        Método para escrever o relatório de progresso
+
+        Args:
+            final : bool
+                Flag para o relatório do final da carga (sem tempo restante)
+        '''
+        elapsed = max(monotonic() - self._start, 1e-9)
+        message = '%s %d rows (%d points, %d skipped) in %s, %.0f rows/s'
+        args = ['Loaded' if final else 'Loading', self.rows, self.points, self.skipped,
+                timedelta(seconds=round(elapsed)), self.rows / elapsed]
+        if not final and self.total and self.points:
+            remaining = max(self.total - self.points, 0) * elapsed / self.points
+            message += ', %.0f%%, ETA %s'
+            args += [min(100.0, 100.0 * self.points / self.total), timedelta(seconds=round(remaining))]
+        self.logger.info(message, *args)
+
+
+    def finish(self):
+        '''
+        Método para escrever o relatório do final da carga
+        '''
+        self.report(final=True)
@@ -8,95 +8,443 @@ Este projeto usou FAÇADE como Padrão de Projeto Estrutural.
 Neste projeto a classe ETL age como a camada intermediária entre a main.py
 e os demais subsistemas, como extract, transform e load.
 
+Cada ação é um comando que importa apenas os módulos de que precisa e
+executa apenas as etapas do ETL que usa: comandos administrativos
+(create, drop, show, export) não leem nem tratam os arquivos de coordenadas.
+
 Exemplos de execução:
 
-1 - Deleta tabelas existentes, cria as tabelas novamente, executa o ETL
-    e mostra a tabela de resultados
+1 - Cria as tabelas, executa o ETL e mostra 10 linhas da tabela de resultados
 
-        $ python3 main.py -dt 1 -ct 1 -ld 1 -v 1
+        $ python3 main.py create
+        $ python3 main.py load -c 100
+        $ python3 main.py show -mr 10
 
 2 - Configura data_points como o diretório onde os dados de coordenadas estão,
 configura o host como localhost, a senha como 1234 e o database etl
 
-        $ python3 main.py -p data_points -H localhost -P 12345 -D etl
+        $ python3 main.py load -p data_points -H localhost -P 1234 -D etl
+
+3 - Exporta os dados carregados para CSV e para Parquet
+
+        $ python3 main.py export -ex pontos.csv -pq pontos
+
+4 - Cria as tabelas com o índice espacial e mostra os Pontos a até 500 metros de uma coordenada
 
-3 - Configura para mostrar apenas 10 linhas e 10 colunas do DataFrame
-e configura para realizar a escrita na Base de Dados a cada 10 dados inseridos.
+        $ python3 main.py create -sp
+        $ python3 main.py query -rd -30.03 -51.23 500
 
-        $ python3 main.py -mr 10 -mc 10 -c 10
+5 - Sem comando, as flags de versões anteriores continuam funcionando (comando run)
+
+        $ python3 main.py -dt 1 -ct 1 -ld 1 -v 1
 '''
 import sys
 import argparse
 
-from etl import ETL
-from settings import FILE_SETTINGS, DATABASE_SETTINGS, VISUALIZATION_SETTINGS
+from settings import FILE_SETTINGS, DATABASE_SETTINGS, VISUALIZATION_SETTINGS, CACHE_SETTINGS, \
+                    GEOCODER_SETTINGS, TRANSFORM_SETTINGS, PIPELINE_SETTINGS, EXPORT_SETTINGS, \
+                    METRICS_SETTINGS, LOGGING_SETTINGS
 
 __author__ = "Giulliano Paz"
 __email__ = "workgiullianopaz@gmail.com"
 
-# Tratamento de argumentos
-parser = argparse.ArgumentParser()
-parser.add_argument('-p', '--path', type=str, help='Diretório com os arquivos de coordenadas')
+# Tabelas deletadas pelo comando drop, na ordem das chaves estrangeiras
+TABLES = ['Point', 'Ledger', 'Suburb', 'City', 'State', 'Country']
+
+# Tratamento de argumentos. As opções são agrupadas e cada comando recebe apenas os grupos que usa
+database_args = argparse.ArgumentParser(add_help=False)
+database_args.add_argument('-H', '--host', type=str, default=DATABASE_SETTINGS['host'], help='Host da Base de Dados')
+database_args.add_argument('-U', '--user', type=str, default=DATABASE_SETTINGS['user'], help='Usuário da Base de Dados')
+database_args.add_argument('-P', '--password', type=str, default=DATABASE_SETTINGS['password'], help='Senha da Base de Dados')
+database_args.add_argument('-D', '--database', type=str, default=DATABASE_SETTINGS['database'], help='Database a ser utilizado')
+
+log_args = argparse.ArgumentParser(add_help=False)
+log_args.add_argument('-dbg', '--debug', action='store_true', help='Mostra os dados de cada Ponto carregado')
+log_args.add_argument('-q', '--quiet', action='store_true', help='Mostra apenas avisos e erros')
+log_args.add_argument('-lf', '--logfile', type=str, default=LOGGING_SETTINGS['path'], help='Arquivo onde as mensagens também são escritas')
+
+metrics_args = argparse.ArgumentParser(add_help=False)
+metrics_args.add_argument('-nm', '--nometrics', action='store_true', help='Desativa as métricas da execução')
+metrics_args.add_argument('-mj', '--metricsjson', type=str, default=METRICS_SETTINGS['json_path'], help='Arquivo JSON do resumo das métricas')
+metrics_args.add_argument('-mp', '--metricsprometheus', type=str, default=METRICS_SETTINGS['prometheus_path'], help='Arquivo das métricas no formato texto do Prometheus')
+
+load_args = argparse.ArgumentParser(add_help=False)
+load_args.add_argument('-p', '--path', type=str, default=FILE_SETTINGS['path'], help='Diretório com os arquivos de coordenadas')
+load_args.add_argument('-c', '--commit', type=int, default=DATABASE_SETTINGS['commit'], help='[int] Valor para intervalo de commits na Base de Dados')
+load_args.add_argument('-i', '--incremental', action='store_true', default=DATABASE_SETTINGS['incremental'], help='Carrega apenas arquivos novos ou incompletos (tabela Ledger)')
+load_args.add_argument('-bl', '--bulkload', action='store_true', default=DATABASE_SETTINGS['bulk_load'], help='Carrega os Pontos com LOAD DATA LOCAL INFILE')
+load_args.add_argument('-ps', '--poolsize', type=int, default=DATABASE_SETTINGS['pool_size'], help='[int] Quantidade de conexões com a Base de Dados usadas para inserir em paralelo')
+load_args.add_argument('-b', '--batchsize', type=int, default=DATABASE_SETTINGS['batch_size'], help='[int] Tamanho dos lotes de Pontos inseridos de uma só vez')
+
+load_args.add_argument('-e', '--engine', type=str, choices=['python', 'numpy'], default=TRANSFORM_SETTINGS['engine'], help='Engine usada para tratar as coordenadas')
+load_args.add_argument('-cr', '--clusterradius', type=float, default=TRANSFORM_SETTINGS['cluster_radius'], help='Tamanho (em metros) do agrupamento de coordenadas próximas')
+
+load_args.add_argument('-w', '--workers', type=int, default=GEOCODER_SETTINGS['workers'], help='Quantidade de threads acessando a API de Mapas')
+load_args.add_argument('-r', '--rate', type=float, default=GEOCODER_SETTINGS['rate'], help='Quantidade máxima de requisições por segundo à API de Mapas')
+load_args.add_argument('-u', '--unordered', action='store_true', help='Retorna os pontos à medida que a API responde')
+load_args.add_argument('-gu', '--geocoderurl', type=str, default=GEOCODER_SETTINGS['url'], help='URL do serviço de geocodificação')
+load_args.add_argument('-gb', '--geocoder', type=str, choices=['osm', 'offline'], default=GEOCODER_SETTINGS['backend'], help='Backend de geocodificação')
+load_args.add_argument('-of', '--offlinefile', type=str, default=GEOCODER_SETTINGS['offline_path'], help='Arquivo de endereços (CSV ou GeoJSON) do backend offline')
+
+load_args.add_argument('-md', '--mindistance', type=float, default=TRANSFORM_SETTINGS['min_distance'], help='Distância mínima (em metros) entre coordenadas consecutivas de uma trajetória')
+load_args.add_argument('-st', '--simplifytolerance', type=float, default=TRANSFORM_SETTINGS['simplify_tolerance'], help='Tolerância (em metros) da simplificação Douglas-Peucker das trajetórias')
+
+load_args.add_argument('-np', '--processes', type=int, default=PIPELINE_SETTINGS['processes'], help='Quantidade de processos lendo e geocodificando arquivos em paralelo')
+
+load_args.add_argument('-am', '--asyncmode', action='store_true', default=PIPELINE_SETTINGS['async'], help='Executa as etapas do ETL de forma assíncrona e simultânea')
+
+load_args.add_argument('-nc', '--nocache', action='store_true', help='Desativa o cache da API de Mapas')
+load_args.add_argument('-cf', '--cachefile', type=str, default=CACHE_SETTINGS['path'], help='Arquivo SQLite do cache da API de Mapas')
+
+show_args = argparse.ArgumentParser(add_help=False)
+show_args.add_argument('-mr', '--maxrows', type=int, default=VISUALIZATION_SETTINGS['max_rows'], help='Quantidade de linhas a serem visualizadas')
+show_args.add_argument('-mc', '--maxcolumns', type=int, default=VISUALIZATION_SETTINGS['max_columns'], help='Quantidade de colunas a serem visualizadas')
+
+columns_args = argparse.ArgumentParser(add_help=False)
+columns_args.add_argument('-sc', '--showcolumns', type=str, help='Colunas a serem visualizadas, separadas por vírgula (ex.: pointLAT,pointLNG,suburbName)')
+
+spatial_args = argparse.ArgumentParser(add_help=False)
+spatial_args.add_argument('-sp', '--spatial', action='store_true', default=DATABASE_SETTINGS['spatial'], help='Cria a tabela Point com a coluna espacial e o SPATIAL INDEX (MySQL 8)')
+
+export_args = argparse.ArgumentParser(add_help=False)
+export_args.add_argument('-ex', '--exportcsv', type=str, default=EXPORT_SETTINGS['csv_path'], help='Arquivo CSV para onde os dados carregados são exportados')
+export_args.add_argument('-pq', '--exportparquet', type=str, default=EXPORT_SETTINGS['parquet_path'], help='Diretório para onde os dados carregados são exportados em Parquet')
+
+parser = argparse.ArgumentParser(description='ETL de coordenadas GPS')
+commands = parser.add_subparsers(dest='command', metavar='command')
+
+commands.add_parser('create', parents=[database_args, spatial_args, log_args],
+                    help='Cria as tabelas').set_defaults(nometrics=True)
+
+drop_parser = commands.add_parser('drop', parents=[database_args, log_args],
+                                help='Deleta todas as tabelas')
+drop_parser.add_argument('-y', '--yes', action='store_true', help='Não pede confirmação')
+drop_parser.set_defaults(nometrics=True)
+
+load_parser = commands.add_parser('load', parents=[database_args, load_args, spatial_args, log_args, metrics_args],
+                                help='Executa o ETL e carrega os Pontos na Base de Dados')
+load_parser.add_argument('-ct', '--createtables', action='store_true', help='Cria as tabelas antes da carga')
+
+commands.add_parser('show', parents=[database_args, show_args, columns_args, log_args],
+                    help='Mostra a tabela de dados').set_defaults(nometrics=True)
+
+query_parser = commands.add_parser('query', parents=[database_args, show_args, columns_args, log_args],
+                                help='Mostra os Pontos de uma área, pelo índice espacial')
+query_parser.add_argument('-bb', '--bbox', type=float, nargs=4, metavar=('MINLAT', 'MINLNG', 'MAXLAT', 'MAXLNG'), help='Retângulo de coordenadas')
+query_parser.add_argument('-rd', '--radius', type=float, nargs=3, metavar=('LAT', 'LNG', 'METROS'), help='Círculo: centro e raio em metros')
+query_parser.set_defaults(nometrics=True)
+
+commands.add_parser('export', parents=[database_args, export_args, columns_args, log_args, metrics_args],
+                    help='Exporta os dados carregados para CSV e/ou Parquet')
+
+run_parser = commands.add_parser('run', parents=[database_args, load_args, spatial_args, show_args, columns_args,
+                                                export_args, log_args, metrics_args],
+                                help='Executa as ações escolhidas pelas flags (padrão)')
+run_parser.add_argument('-dt', '--droptables', type=int, default=DATABASE_SETTINGS['drop_tables'], help='[0/1] Flag para deleção das tabelas existentes')
+run_parser.add_argument('-ct', '--createtables', type=int, default=DATABASE_SETTINGS['create_tables'], help='[0/1] Flag para criar das tabelas')
+run_parser.add_argument('-ld', '--loaddata', type=int, default=DATABASE_SETTINGS['load_data'], help='[0/1] Flag para realizar o ETL')
+run_parser.add_argument('-v', '--visualize', type=int, default=VISUALIZATION_SETTINGS['visualize'], help='[0/1] Flag para visualizar os dados')
+
+
+def setup(args):
+    '''
+    Função para configurar as mensagens e as métricas da execução
+    '''
+    import log
+    from metrics import REGISTRY
+
+    if args.debug:
+        level = 'DEBUG'
+    elif args.quiet:
+        level = 'WARNING'
+    else:
+        level = LOGGING_SETTINGS['level']
+    log.setup(level, path=args.logfile, progress_interval=LOGGING_SETTINGS['progress_interval'])
+    REGISTRY.enabled = METRICS_SETTINGS['enabled'] and not args.nometrics
+
+
+def connect(args, local_infile=False):
+    '''
+    Função para criar o ETL e conectá-lo à Base de Dados
+
+    Returns:
+        ETL
+            Instância do ETL conectada
+    '''
+    from etl import ETL
+
+    etl = ETL()
+    etl.connect(args.host, args.user, args.password, args.database,
+                cache_size=DATABASE_SETTINGS['cache_size'],
+                local_infile=local_infile,
+                pool_size=getattr(args, 'poolsize', DATABASE_SETTINGS['pool_size']),
+                retries=DATABASE_SETTINGS['retries'],
+                backoff=DATABASE_SETTINGS['backoff'])
+    return etl
+
+
+def finish(etl, args):
+    '''
+    Função para fechar a conexão e escrever as métricas da execução
+    '''
+    # Fecha conexão com a Base de Dados
+    etl.close()
+
+    if not args.nometrics and METRICS_SETTINGS['enabled']:
+        # Escreve as métricas da execução
+        etl.write_metrics(json_path=args.metricsjson, prometheus_path=args.metricsprometheus)
+
+
+def columns(args):
+    '''
+    Função para pegar as colunas escolhidas (-sc)
+    '''
+    return args.showcolumns.split(',') if args.showcolumns else VISUALIZATION_SETTINGS['columns']
+
+
+def check_load(args):
+    '''
+    Função para rejeitar combinações inválidas das opções de carga
+    '''
+    if args.geocoder == 'offline' and not args.offlinefile:
+        parser.error('o backend offline (-gb offline) precisa do arquivo de endereços (-of)')
+
+    if args.asyncmode:
+        # Opções que o modo assíncrono (-am) não suporta
+        unsupported = [option for option, used in (('-i', args.incremental),
+                                                    ('-bl', args.bulkload),
+                                                    ('-np', args.processes > 1),
+                                                    ('-e numpy', args.engine == 'numpy'),
+                                                    ('-cr', args.clusterradius),
+                                                    ('-md', args.mindistance),
+                                                    ('-st', args.simplifytolerance)) if used]
+        if unsupported:
+            parser.error('o modo assíncrono (-am) não suporta: {}'.format(', '.join(unsupported)))
+
+    if args.incremental:
+        # Opções que a carga incremental (-i) não suporta
+        unsupported = [option for option, used in (('-bl', args.bulkload),
+                                                    ('-np', args.processes > 1)) if used]
+        if unsupported:
+            parser.error('a carga incremental (-i) não suporta: {}'.format(', '.join(unsupported)))
+
+
+def confirm_drop(args):
+    '''
+    Função para pedir a confirmação da deleção das tabelas
+    '''
+    res = input("\nTem certeza que deseja deletar todas as tabelas de '{}'? [S/N]:".format(args.database))
+    return res.upper() == 'S'
+
+
+def load_data(etl, args):
+    '''
+    Função para executar o ETL: leitura e tratamento dos arquivos,
+    acesso à API de Mapas e carga na Base de Dados
+    '''
+    ordered = GEOCODER_SETTINGS['ordered'] and not args.unordered
+    # O backend offline não acessa a rede, então não usa o cache da API de Mapas
+    use_cache = CACHE_SETTINGS['enabled'] and not args.nocache and args.geocoder == 'osm'
+
+    # Escolhe o backend de geocodificação
+    etl.set_geocoder(args.geocoder, url=args.geocoderurl, path=args.offlinefile,
+                    max_distance=GEOCODER_SETTINGS['max_distance'])
+
+    # Configura a normalização dos dados da API (caixa, acentos, espaços, siglas dos Estados)
+    etl.set_normalizer(cache_size=TRANSFORM_SETTINGS['normalize_cache_size'])
+
+    # Configura a simplificação das trajetórias (desativada sem -md e -st)
+    etl.set_simplifier(min_distance=args.mindistance, tolerance=args.simplifytolerance,
+                    segment_size=TRANSFORM_SETTINGS['segment_size'],
+                    max_gap=TRANSFORM_SETTINGS['max_gap'])
+
+    if use_cache:
+        # Abre o cache da API de Mapas
+        etl.open_cache(args.cachefile,
+                    precision=CACHE_SETTINGS['precision'],
+                    ttl=CACHE_SETTINGS['ttl'],
+                    max_entries=CACHE_SETTINGS['max_entries'])
+
+    # Quantidade estimada de Pontos, para o tempo restante no relatório de progresso
+    # (com a simplificação, a quantidade de Pontos carregados não é conhecida antes)
+    simplify = args.mindistance or args.simplifytolerance
+    total = etl.count_points(args.path) if LOGGING_SETTINGS['estimate_total'] and not simplify else None
+
+    if args.asyncmode:
+        # Realiza ETL com as etapas em paralelo
+        etl.run_async(args.path, commit=args.commit, batch_size=args.batchsize,
+                    workers=args.workers, rate=args.rate,
+                    queue_size=PIPELINE_SETTINGS['queue_size'],
+                    buffer_size=FILE_SETTINGS['buffer_size'],
+                    total=total)
+        return
+
+    if args.incremental:
+        # Realiza ETL apenas dos arquivos novos ou incompletos
+        etl.load_incremental(args.path, commit=args.commit, batch_size=args.batchsize,
+                            engine=args.engine,
+                            chunk_size=TRANSFORM_SETTINGS['chunk_size'],
+                            buffer_size=FILE_SETTINGS['buffer_size'],
+                            cluster_radius=args.clusterradius,
+                            workers=args.workers, rate=args.rate, total=total)
+        return
+
+    if args.processes > 1:
+        # Lê, trata e pega dados da API em paralelo, um arquivo por processo
+        etl.extract_parallel(args.path, args.processes,
+                            engine=args.engine,
+                            chunk_size=TRANSFORM_SETTINGS['chunk_size'],
+                            buffer_size=FILE_SETTINGS['buffer_size'],
+                            cluster_radius=args.clusterradius,
+                            workers=args.workers, rate=args.rate, ordered=ordered)
+    else:
+        # Pega coordenadas dos arquivos
+        etl.extract_points_from_file(args.path, buffer_size=FILE_SETTINGS['buffer_size'])
+
+        # Trata coordenadas 'sujas' obtidas através dos arquivos
+        etl.clear_points(engine=args.engine, chunk_size=TRANSFORM_SETTINGS['chunk_size'])
+
+        if args.clusterradius:
+            # Agrupa coordenadas próximas para acessar a API apenas uma vez por agrupamento
+            etl.cluster_points(args.clusterradius)
+
+        # Pega dados da API do OpenStreetView (ou do backend offline)
+        etl.extract_data_from_API(workers=args.workers, rate=args.rate, ordered=ordered)
+
+    if args.bulkload:
+        # Realiza ETL com LOAD DATA LOCAL INFILE
+        etl.bulk_load(disable_keys=DATABASE_SETTINGS['disable_keys'])
+    else:
+        # Realiza ETL
+        etl.load_data(commit=args.commit, batch_size=args.batchsize, total=total)
+
+
+def export_data(etl, args):
+    '''
+    Função para exportar os dados carregados para CSV e/ou Parquet
+    '''
+    if args.exportcsv:
+        # Exporta os dados carregados para CSV
+        etl.export_csv(args.exportcsv, columns=columns(args),
+                    chunk_size=EXPORT_SETTINGS['chunk_size'])
+
+    if args.exportparquet:
+        # Exporta os dados carregados para Parquet, particionados por Estado e data da carga
+        etl.export_parquet(args.exportparquet, chunk_size=EXPORT_SETTINGS['chunk_size'],
+                        compression=EXPORT_SETTINGS['compression'],
+                        max_open_files=EXPORT_SETTINGS['max_open_files'])
+
+
+def show(etl, args):
+    '''
+    Função para mostrar a tabela de dados
+    '''
+    etl.show(args.maxrows, args.maxcolumns, columns=columns(args),
+            chunk_size=VISUALIZATION_SETTINGS['chunk_size'])
+
+
+def create_command(args):
+    etl = connect(args)
+    etl.create_tables(spatial=args.spatial)
+    finish(etl, args)
+
+
+def drop_command(args):
+    if not args.yes and not confirm_drop(args):
+        return
+    etl = connect(args)
+    etl.drop_tables(TABLES)
+    finish(etl, args)
+
+
+def load_command(args):
+    check_load(args)
+    etl = connect(args, local_infile=args.bulkload)
+    if args.createtables:
+        etl.create_tables(spatial=args.spatial)
+    load_data(etl, args)
+    finish(etl, args)
+
+
+def show_command(args):
+    etl = connect(args)
+    show(etl, args)
+    finish(etl, args)
+
+
+def query_command(args):
+    if not args.bbox and not args.radius:
+        parser.error('query: informe -bb ou -rd')
+    etl = connect(args)
+    if args.radius:
+        lat, lng, radius = args.radius
+        etl.show_area(center=(lat, lng), radius=radius, max_rows=args.maxrows,
+                    max_columns=args.maxcolumns, columns=columns(args))
+    else:
+        etl.show_area(bbox=args.bbox, max_rows=args.maxrows,
+                    max_columns=args.maxcolumns, columns=columns(args))
+    finish(etl, args)
+
 
-parser.add_argument('-H', '--host', type=str, help='Host da Base de Dados')
-parser.add_argument('-U', '--user', type=str, help='Usuário da Base de Dados')
-parser.add_argument('-P', '--password', type=str, help='Senha da Base de Dados')
-parser.add_argument('-D', '--database', type=str, help='Database a ser utilizado')
-parser.add_argument('-dt', '--droptables', type=int, help='[0/1] Flag para deleção das tabelas existentes')
-parser.add_argument('-ct', '--createtables', type=int, help='[0/1] Flag para criar das tabelas')
-parser.add_argument('-ld', '--loaddata', type=int, help='[0/1] Flag para realizar o ETL')
-parser.add_argument('-c', '--commit', type=int, help='[int] Valor para intervalo de commits na Base de Dados')
+def export_command(args):
+    if not args.exportcsv and not args.exportparquet:
+        parser.error('export: informe -ex e/ou -pq')
+    etl = connect(args)
+    export_data(etl, args)
+    finish(etl, args)
 
-parser.add_argument('-mr', '--maxrows', type=int, help='Quantidade de linhas a serem visualizadas')
-parser.add_argument('-mc', '--maxcolumns', type=int, help='Quantidade de colunas a serem visualizadas')
-parser.add_argument('-v', '--visualize', type=int, help='[0/1] Flag para visualizar os dados')
 
-ARGS = parser.parse_args()
+def run_command(args):
+    '''
+    Comando com as flags de versões anteriores (-dt, -ct, -ld, -v...).
+    Os arquivos são lidos e tratados apenas se a carga for executada.
+    '''
+    if not (args.droptables or args.createtables or args.loaddata or args.visualize
+            or args.exportcsv or args.exportparquet):
+        # Nenhuma ação escolhida: não é preciso conectar-se à Base de Dados
+        return
 
-PATH = ARGS.path if ARGS.path else FILE_SETTINGS['path']
+    if args.loaddata:
+        check_load(args)
+    etl = connect(args, local_infile=args.bulkload and bool(args.loaddata))
 
-HOST = ARGS.host if ARGS.host else DATABASE_SETTINGS['host']
-USER = ARGS.user if ARGS.user else DATABASE_SETTINGS['user']
-PASSWORD = ARGS.password if ARGS.password else DATABASE_SETTINGS['password']
-DATABASE = ARGS.database if ARGS.database else DATABASE_SETTINGS['database']
-DROP_TABLES = ARGS.droptables if ARGS.droptables else DATABASE_SETTINGS['drop_tables']
-CREATE_TABLES = ARGS.createtables if ARGS.createtables else DATABASE_SETTINGS['create_tables']
-LOAD_DATA = ARGS.loaddata if ARGS.loaddata else DATABASE_SETTINGS['load_data']
-COMMIT = ARGS.commit if ARGS.commit else DATABASE_SETTINGS['commit']
+    if args.droptables and confirm_drop(args):
+        etl.drop_tables(TABLES)
 
-MAX_ROWS = ARGS.maxrows if ARGS.maxrows else VISUALIZATION_SETTINGS['max_rows']
-MAX_COLUMNS = ARGS.maxcolumns if ARGS.maxcolumns else VISUALIZATION_SETTINGS['max_columns']
-VISUALIZE = ARGS.visualize if ARGS.visualize else VISUALIZATION_SETTINGS['visualize']
+    if args.createtables:
+        etl.create_tables(spatial=args.spatial)
 
-etl = ETL()
+    if args.loaddata:
+        load_data(etl, args)
 
-# Pega coordenadas dos arquivos
-etl.extract_points_from_file(PATH)
+    export_data(etl, args)
 
-# Trata coordenadas 'sujas' obtidas através dos arquivos
-etl.clear_points()
+    if args.visualize:
+        # Mostra tabela de dados
+        show(etl, args)
 
-# Pega dados da API do OpenStreetView
-etl.extract_data_from_API()
+    finish(etl, args)
 
-# Conecta à Base de Dados
-etl.connect(HOST, USER, PASSWORD, DATABASE)
 
-if DROP_TABLES:
-    res = input("\nTem certeza que deseja deletar todas as tabelas de '{}'? [S/N]:".format(DATABASE))
-    if res.upper() == 'S':
-        etl.drop_tables(['Point', 'Suburb', 'City', 'State', 'Country'])
+COMMANDS = {
+    'create'    :   create_command,
+    'drop'      :   drop_command,
+    'load'      :   load_command,
+    'show'      :   show_command,
+    'query'     :   query_command,
+    'export'    :   export_command,
+    'run'       :   run_command,
+}
 
-if CREATE_TABLES:
-    etl.create_tables()
 
-if LOAD_DATA:
-    # Realiza ETL
-    etl.load_data(commit=COMMIT)
+def main(argv):
+    # Sem comando, as flags são as de versões anteriores (comando run)
+    if not argv or (argv[0] not in COMMANDS and argv[0] not in ('-h', '--help')):
+        argv = ['run'] + argv
+    args = parser.parse_args(argv)
+    setup(args)
+    COMMANDS[args.command](args)
 
-if VISUALIZE:
-    # Mostra tabela de dados
-    etl.show(MAX_ROWS, MAX_COLUMNS)
 
-# Fecha conexão com a Base de Dados
-etl.close()
\ No newline at end of file
+if __name__ == '__main__':
+    main(sys.argv[1:])
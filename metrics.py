@@ -0,0 +1,379 @@
+import json
+import logging
+from bisect import bisect_left
+from functools import wraps
+from threading import Lock, local
+from time import perf_counter
+
+from log import get_logger
+
+LOGGER = get_logger('metrics')
+
+# Limites superiores (em segundos) dos intervalos dos histogramas:
+# de 1 µs a ~2 minutos, crescendo por um fator de raiz de 2
+BUCKETS = tuple(1e-6 * 2 ** (i / 2) for i in range(54))
+
+# Quantis mostrados no resumo dos histogramas
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _name(name, labels):
+    '''
+    Função auxiliar para formatar o nome de uma métrica com seus rótulos,
+    no formato do Prometheus (ex.: db_operation_seconds{operation="insert"})
+    '''
+    if not labels:
+        return name
+    return '{}{{{}}}'.format(name, ','.join('{}="{}"'.format(key, value) for key, value in labels))
+
+
+class Histogram:
+    '''
+    Histograma de durações com intervalos fixos (ver BUCKETS). Cada observação
+    custa uma busca binária e a memória usada não depende da quantidade de
+    observações; os quantis são estimados pelos limites dos intervalos.
+    '''
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+
+    def observe(self, value):
+        '''
+        Método para registrar uma duração (em segundos)
+        '''
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+
+    def quantile(self, q):
+        '''
+        Método para estimar um quantil
+
+        Args:
+            q : float
+                Quantil entre 0 e 1 (ex.: 0.95)
+
+        Returns:
+            float
+                Limite superior do intervalo que contém o quantil
+        '''
+        rank = q * self.count
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= rank and count:
+                return min(BUCKETS[i], self.max) if i < len(BUCKETS) else self.max
+        return self.max
+
+
+    def merge(self, other):
+        '''
+        Método para somar as observações de outro histograma
+        '''
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+
+class Registry:
+    '''
+    Registro das métricas do ETL: contadores, valores (gauges) e histogramas
+    de duração, identificados por nome e rótulos. Pode ser usado por várias
+    threads. O tempo de cada etapa do ETL é registrado sem o tempo das etapas
+    anteriores, que são executadas dentro dela (os geradores são encadeados).
+    '''
+    def __init__(self):
+        self.enabled = True
+        self._lock = Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        # Pilha (por thread) do tempo das etapas executadas dentro da etapa atual
+        self._local = local()
+
+
+    def inc(self, name, value=1, **labels):
+        '''
+        Método para incrementar um contador
+        '''
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+
+    def set(self, name, value, **labels):
+        '''
+        Método para atribuir um valor (gauge)
+        '''
+        if not self.enabled:
+            return
+        with self._lock:
+            self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+
+    def observe(self, name, value, **labels):
+        '''
+        Método para registrar uma duração (em segundos) em um histograma
+        '''
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+
+    def _stack(self):
+        '''
+        Método auxiliar para pegar a pilha de tempos das etapas da thread atual
+        '''
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+
+    def _start(self):
+        '''
+        Método auxiliar para iniciar a medição de uma etapa
+        '''
+        self._stack().append(0.0)
+        return perf_counter()
+
+
+    def _stop(self, start):
+        '''
+        Método auxiliar para terminar a medição de uma etapa
+
+        Returns:
+            tuple
+                Tempo total e tempo próprio da etapa (sem as etapas internas)
+        '''
+        elapsed = perf_counter() - start
+        stack = self._local.stack
+        inner = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        return elapsed, elapsed - inner
+
+
+    def timed(self, name, stage=None, **labels):
+        '''
+        Decorador para registrar a duração de cada chamada de uma função no
+        histograma `name`. Se `stage` for informado, o tempo próprio da função
+        também é somado ao tempo da etapa (etl_stage_seconds_total).
+
+        Args:
+            name : str
+                Nome do histograma
+
+            stage : str
+                Nome da etapa do ETL. None para não somar ao tempo das etapas
+
+            labels : dict
+                Rótulos do histograma
+        '''
+        def decorator(function):
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                if stage is None:
+                    start = perf_counter()
+                    try:
+                        return function(*args, **kwargs)
+                    finally:
+                        self.observe(name, perf_counter() - start, **labels)
+
+                start = self._start()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    elapsed, own = self._stop(start)
+                    self.observe(name, elapsed, **labels)
+                    self.inc('etl_stage_seconds_total', own, stage=stage)
+            return wrapper
+        return decorator
+
+
+    def timed_iter(self, stage, iterable):
+        '''
+        Método para medir uma etapa do ETL executada por um gerador: soma o
+        tempo próprio de cada item (sem o tempo das etapas anteriores) e a
+        quantidade de itens. Os totais são registrados ao final do gerador.
+
+        Args:
+            stage : str
+                Nome da etapa do ETL
+
+            iterable : generator | list
+                Itens produzidos pela etapa
+
+        Returns:
+            generator
+                Os mesmos itens de iterable
+        '''
+        if not self.enabled:
+            yield from iterable
+            return
+
+        iterator = iter(iterable)
+        # O gerador é consumido sempre pela mesma thread; a medição de _start e
+        # _stop é feita aqui diretamente, pois é executada a cada item
+        stack = self._stack()
+        seconds = 0.0
+        items = 0
+        try:
+            while True:
+                stack.append(0.0)
+                start = perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    elapsed = perf_counter() - start
+                    inner = stack.pop()
+                    if stack:
+                        stack[-1] += elapsed
+                    seconds += elapsed - inner
+                items += 1
+                yield item
+        finally:
+            self.inc('etl_stage_seconds_total', seconds, stage=stage)
+            self.inc('etl_stage_items_total', items, stage=stage)
+
+
+    def reset(self):
+        '''
+        Método para apagar todas as métricas
+        '''
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+
+    def snapshot(self):
+        '''
+        Método para copiar as métricas, para enviá-las de um processo a outro (ver merge)
+
+        Returns:
+            dict
+                Cópia das métricas
+        '''
+        with self._lock:
+            return {'counters': dict(self._counters),
+                    'gauges': dict(self._gauges),
+                    'histograms': {key: (list(h.counts), h.count, h.sum, h.max)
+                                for key, h in self._histograms.items()}}
+
+
+    def merge(self, snapshot):
+        '''
+        Método para somar as métricas de outro processo (ver snapshot)
+        '''
+        with self._lock:
+            for key, value in snapshot['counters'].items():
+                self._counters[key] = self._counters.get(key, 0) + value
+            self._gauges.update(snapshot['gauges'])
+            for key, (counts, count, total, maximum) in snapshot['histograms'].items():
+                other = Histogram()
+                other.counts, other.count, other.sum, other.max = counts, count, total, maximum
+                self._histograms.setdefault(key, Histogram()).merge(other)
+
+
+    def summary(self):
+        '''
+        Método para resumir as métricas
+
+        Returns:
+            dict
+                Contadores, valores e histogramas (quantidade, soma, p50, p95,
+                p99 e máximo, em segundos), pelo nome formatado com os rótulos
+        '''
+        with self._lock:
+            summary = {
+                'counters': {_name(*key): value for key, value in sorted(self._counters.items())},
+                'gauges': {_name(*key): value for key, value in sorted(self._gauges.items())},
+                'histograms': {},
+            }
+            for key, histogram in sorted(self._histograms.items()):
+                summary['histograms'][_name(*key)] = dict(
+                    [('count', histogram.count), ('sum', histogram.sum)]
+                    + [('p{}'.format(int(q * 100)), histogram.quantile(q)) for q in QUANTILES]
+                    + [('max', histogram.max)])
+        return summary
+
+
+    def prometheus(self):
+        '''
+        Método para formatar as métricas no formato texto do Prometheus
+        (por exemplo, para o textfile collector do node_exporter)
+
+        Returns:
+            str
+                Métricas formatadas
+        '''
+        lines = []
+        with self._lock:
+            for kind, metrics in (('counter', self._counters), ('gauge', self._gauges)):
+                for name in sorted({key[0] for key in metrics}):
+                    lines.append('# TYPE {} {}'.format(name, kind))
+                    for key, value in sorted(metrics.items()):
+                        if key[0] == name:
+                            lines.append('{} {}'.format(_name(*key), value))
+
+            for name in sorted({key[0] for key in self._histograms}):
+                lines.append('# TYPE {} histogram'.format(name))
+                for (_, labels), histogram in sorted(self._histograms.items()):
+                    if _ != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(BUCKETS + (float('inf'),), histogram.counts):
+                        cumulative += count
+                        le = '+Inf' if bound == float('inf') else '{:.6g}'.format(bound)
+                        lines.append('{} {}'.format(
+                            _name(name + '_bucket', labels + (('le', le),)), cumulative))
+                    lines.append('{} {}'.format(_name(name + '_sum', labels), histogram.sum))
+                    lines.append('{} {}'.format(_name(name + '_count', labels), histogram.count))
+        return '\n'.join(lines) + '\n'
+
+
+    def write(self, json_path=None, prometheus_path=None):
+        '''
+        Método para escrever as métricas em JSON e, opcionalmente, no formato do Prometheus
+
+        Args:
+            json_path : str
+                Arquivo JSON do resumo. None para apenas registrá-lo no log,
+                no nível INFO (omitido com -q)
+
+            prometheus_path : str
+                Arquivo no formato texto do Prometheus. None para não escrever
+        '''
+        if json_path:
+            with open(json_path, 'w') as file:
+                file.write(json.dumps(self.summary(), indent=2))
+        elif LOGGER.isEnabledFor(logging.INFO):
+            LOGGER.info('Metrics\n%s', json.dumps(self.summary(), indent=2))
+        if prometheus_path:
+            with open(prometheus_path, 'w') as file:
+                file.write(self.prometheus())
+
+
+# Registro usado por todo o ETL
+REGISTRY = Registry()
+timed = REGISTRY.timed
+timed_iter = REGISTRY.timed_iter
@@ -0,0 +1,286 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from time import monotonic
+
+import extract as exct
+import transform as trm
+from batch import PointBatch
+from geocoders import OSMGeocoder
+from log import Progress, get_logger
+
+LOGGER = get_logger('pipeline')
+
+class _Stats:
+    '''
+    Estatísticas de uma etapa do pipeline: quantidade de itens produzidos,
+    tempo de execução e profundidade da fila de saída
+    '''
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.start = None
+        self.end = None
+        self.max_depth = 0
+        self._depth_sum = 0
+        self._samples = 0
+
+    def sample(self, queue):
+        '''
+        Método para registrar a profundidade da fila de saída da etapa
+        '''
+        depth = queue.qsize()
+        self.max_depth = max(self.max_depth, depth)
+        self._depth_sum += depth
+        self._samples += 1
+
+    def report(self):
+        '''
+        Método para formatar as estatísticas da etapa
+
+        Returns:
+            str
+                Linha com itens, vazão e profundidade da fila
+        '''
+        elapsed = (self.end or monotonic()) - (self.start or monotonic())
+        line = '{:<10} {:>10} items {:>10.1f} items/s'.format(
+            self.name, self.items, self.items / max(elapsed, 1e-9))
+        # A etapa de carga não tem fila de saída
+        if self._samples:
+            line += '   queue avg {:>6.1f} max {:>5}'.format(
+                self._depth_sum / self._samples, self.max_depth)
+        return line
+
+
+class AsyncPipeline:
+    '''
+    Pipeline assíncrono do ETL. As etapas de leitura, tratamento, acesso à API
+    de Mapas e carga na Base de Dados são executadas ao mesmo tempo, ligadas
+    por filas de tamanho limitado: quando uma etapa é mais lenta, as anteriores
+    aguardam (backpressure), então a memória usada não depende do tamanho
+    dos arquivos. As operações bloqueantes (arquivos, cache, API e Base de Dados)
+    são executadas em threads.
+    '''
+    def __init__(self, etl, files_path, commit=1, batch_size=None, workers=1, rate=None,
+                queue_size=1000, chunk_lines=1000, buffer_size=1024 * 1024, total=None):
+        '''
+        Args:
+            etl : ETL
+                Instância do ETL, já conectada à Base de Dados
+
+            files_path : str
+                Diretório onde encontram-se os arquivos com os dados dos Pontos
+
+            commit, batch_size : ver ETL.load_data
+
+            workers, rate : ver ETL.extract_data_from_API
+
+            queue_size : int
+                Tamanho máximo de cada fila entre as etapas
+
+            chunk_lines : int
+                Quantidade de linhas lidas dos arquivos por vez
+
+            buffer_size : int
+                Tamanho (em bytes) do buffer de leitura dos arquivos
+
+            total : ver ETL.load_data
+        '''
+        self.etl = etl
+        self.files_path = files_path
+        self.commit = commit
+        self.batch_size = batch_size
+        self.workers = workers
+        # Backend escolhido em ETL.set_geocoder (por padrão, a API OpenStreetMap)
+        self.backend = etl.geocoder or OSMGeocoder()
+        self.limiter = exct.RateLimiter(rate) if rate and self.backend.rate_limited else None
+        self.queue_size = queue_size
+        self.chunk_lines = chunk_lines
+        self.buffer_size = buffer_size
+        self.stats = [_Stats(name) for name in ('extract', 'clear', 'geocode', 'load')]
+        self.progress = Progress(LOGGER, total=total)
+
+
+    async def _put(self, queue, item, stats):
+        '''
+        Método auxiliar para colocar um item na fila de saída de uma etapa
+        '''
+        await queue.put(item)
+        stats.sample(queue)
+
+
+    async def _extract(self, lines_queue):
+        '''
+        Etapa de leitura: lê blocos de linhas dos arquivos
+        '''
+        stats = self.stats[0]
+        stats.start = monotonic()
+        lines = exct.get_points(self.files_path, buffer_size=self.buffer_size)
+        read = lambda: list(islice(lines, self.chunk_lines))
+        while True:
+            chunk = await self._loop.run_in_executor(self._io, read)
+            if not chunk:
+                break
+            stats.items += len(chunk)
+            await self._put(lines_queue, chunk, stats)
+        await lines_queue.put(None)
+        stats.end = monotonic()
+
+
+    async def _clear(self, lines_queue, points_queue):
+        '''
+        Etapa de tratamento: forma as coordenadas a partir dos blocos de linhas
+        '''
+        stats = self.stats[1]
+        stats.start = monotonic()
+        lat = None
+        while True:
+            chunk = await lines_queue.get()
+            if chunk is None:
+                break
+            points, lat = trm.pair_lines(chunk, lat)
+            for point in points:
+                stats.items += 1
+                await self._put(points_queue, point, stats)
+        # Um sinal de fim para cada thread de acesso à API
+        for _ in range(self.workers):
+            await points_queue.put(None)
+        stats.end = monotonic()
+
+
+    async def _geocode(self, points_queue, data_queue):
+        '''
+        Etapa de acesso à API de Mapas. São executadas `workers` cópias
+        desta etapa; a última a terminar sinaliza o fim para a carga.
+        '''
+        stats = self.stats[2]
+        stats.start = stats.start or monotonic()
+        cache = self.etl.cache
+        while True:
+            point = await points_queue.get()
+            if point is None:
+                break
+            # O cache (SQLite) é acessado em uma única thread, fora do loop de eventos
+            point_data = None
+            if cache is not None:
+                point_data = await self._loop.run_in_executor(
+                    self._cache, exct.get_cached_point, cache, point)
+            if point_data is None:
+                point_data = await self._loop.run_in_executor(
+                    self._api, exct.reverse_point, point, self.backend, self.limiter)
+                if cache is not None:
+                    await self._loop.run_in_executor(
+                        self._cache, exct.set_cached_point, cache, point, point_data)
+            stats.items += 1
+            await self._put(data_queue, exct.set_coordinates(point_data, point), stats)
+
+        self._active_workers -= 1
+        if not self._active_workers:
+            await data_queue.put(None)
+            stats.end = monotonic()
+
+
+    async def _load(self, data_queue):
+        '''
+        Etapa de carga: normaliza os Points (ver transform.Normalizer) e os
+        insere na Base de Dados a cada intervalo de commit. Os intervalos são
+        inseridos em paralelo, um por conexão do pool (ver ETL.loaders); quando
+        todas estão em uso, a etapa aguarda (backpressure).
+        '''
+        stats = self.stats[3]
+        stats.start = monotonic()
+        normalize = self.etl.normalizer.normalize
+        # Cópias do ETL livres, uma por conexão
+        idle = asyncio.Queue()
+        for loader in self._loaders:
+            idle.put_nowait(loader)
+        running = []
+        batch = PointBatch()
+        try:
+            while True:
+                point_data = await data_queue.get()
+                if point_data is not None:
+                    batch.append(normalize(point_data))
+                if len(batch) and (point_data is None or len(batch) == self.commit):
+                    stats.items += len(batch)
+                    loader = await idle.get()
+                    # Os erros dos intervalos já terminados são propagados aqui
+                    for task in running:
+                        if task.done():
+                            task.result()
+                    running = [task for task in running if not task.done()]
+                    running.append(asyncio.ensure_future(self._load_batch(loader, batch, idle)))
+                    batch = PointBatch()
+                if point_data is None:
+                    break
+            await asyncio.gather(*running)
+        except BaseException:
+            # Em caso de erro ou cancelamento, aguarda os intervalos em execução
+            await asyncio.gather(*running, return_exceptions=True)
+            raise
+        stats.end = monotonic()
+
+
+    async def _load_batch(self, loader, batch, idle):
+        '''
+        Método auxiliar que insere um intervalo de commit com uma das cópias
+        do ETL e a devolve às cópias livres ao terminar
+        '''
+        try:
+            n_rows, n_skipped = await self._loop.run_in_executor(
+                self._db, loader.model.retry, loader._load_interval,
+                batch, self.batch_size, None, len(batch))
+        finally:
+            idle.put_nowait(loader)
+        self.etl._loaded(self.progress, len(batch), n_rows, n_skipped)
+
+
+    async def _run(self):
+        '''
+        Método auxiliar que cria as filas e executa as etapas. Se uma etapa
+        falhar, as demais são canceladas e o erro é propagado.
+        '''
+        lines_queue = asyncio.Queue(maxsize=self.queue_size)
+        points_queue = asyncio.Queue(maxsize=self.queue_size)
+        data_queue = asyncio.Queue(maxsize=self.queue_size)
+        self._active_workers = self.workers
+
+        tasks = [asyncio.ensure_future(self._extract(lines_queue)),
+                asyncio.ensure_future(self._clear(lines_queue, points_queue)),
+                asyncio.ensure_future(self._load(data_queue))]
+        tasks += [asyncio.ensure_future(self._geocode(points_queue, data_queue))
+                for _ in range(self.workers)]
+
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in pending:
+            task.cancel()
+        # Aguarda o cancelamento das demais etapas antes de fechar o loop
+        await asyncio.gather(*pending, return_exceptions=True)
+        for task in done:
+            if task.exception() is not None:
+                raise task.exception()
+
+
+    def run(self):
+        '''
+        Método para executar o pipeline e mostrar as estatísticas de cada etapa
+        '''
+        self._loop = asyncio.new_event_loop()
+        # Threads separadas para arquivos, cache, API e Base de Dados
+        # (uma thread por conexão do pool para a Base de Dados)
+        self._loaders = self.etl.loaders()
+        self._io = ThreadPoolExecutor(max_workers=1)
+        self._cache = ThreadPoolExecutor(max_workers=1)
+        self._api = ThreadPoolExecutor(max_workers=self.workers)
+        self._db = ThreadPoolExecutor(max_workers=len(self._loaders))
+        try:
+            self._loop.run_until_complete(self._run())
+        finally:
+            self._loop.close()
+            for executor in (self._io, self._cache, self._api, self._db):
+                executor.shutdown()
+            self.etl.release_loaders(self._loaders)
+
+        self.progress.finish()
+        for stats in self.stats:
+            LOGGER.info(stats.report())
@@ -9,6 +9,22 @@ como dados de conexão e ações.
 
 Em VISUALIZATION_SETTINGS estão as configurações relativas à visualização.
 
+Em EXPORT_SETTINGS estão as configurações relativas à exportação dos dados.
+
+Em TRANSFORM_SETTINGS estão as configurações relativas ao tratamento das coordenadas.
+
+Em GEOCODER_SETTINGS estão as configurações relativas ao acesso à API de Mapas.
+
+Em PIPELINE_SETTINGS estão as configurações relativas à execução do ETL.
+
+Em CACHE_SETTINGS estão as configurações relativas ao cache dos dados
+obtidos através da API de Mapas.
+
+Em METRICS_SETTINGS estão as configurações relativas às métricas da execução.
+
+Em LOGGING_SETTINGS estão as configurações relativas às mensagens e ao
+relatório de progresso da carga.
+
 Os dados podem ser modificados aqui neste arquivo ou por parâmetros na hora
 da execução.
 '''
@@ -16,6 +32,8 @@ da execução.
 FILE_SETTINGS = {
     # Diretório onde encontram-se os arquivos com as coordenadas brutas
     'path' : 'data_points',
+    # Tamanho (em bytes) do buffer de leitura dos arquivos
+    'buffer_size' : 1024 * 1024,
 }
 
 DATABASE_SETTINGS = {
@@ -35,11 +53,136 @@ DATABASE_SETTINGS = {
     'load_data'     :       False,
      # Valor de inserções até armazenar os dados definitivamente na Base de dados
     'commit'        :       50,
+    # Tamanho dos lotes de Pontos inseridos de uma só vez. None para inserir um a um
+    'batch_size'    :       None,
+    # Flag para carregar apenas arquivos novos ou incompletos (tabela Ledger)
+    'incremental'   :       False,
+    # Flag para carregar os Pontos com LOAD DATA LOCAL INFILE (cargas iniciais)
+    'bulk_load'     :       False,
+    # Flag para desativar índices e verificações de chaves durante o LOAD DATA
+    'disable_keys'  :       True,
+    # Quantidade máxima de conexões abertas com a Base de Dados. Com mais de uma,
+    # os intervalos de commit são inseridos em paralelo (exceto na carga incremental)
+    'pool_size'     :       1,
+    # Quantidade de novas tentativas ao perder a conexão com a Base de Dados
+    'retries'       :       3,
+    # Tempo (em segundos) de espera antes da primeira nova tentativa (dobra a cada tentativa)
+    'backoff'       :       1.0,
+    # Quantidade máxima de IDs em memória por tabela de dimensão (ex.: Suburb)
+    'cache_size'    :       100000,
+    # Flag para criar a tabela Point com a coluna espacial pointGeom (POINT SRID 4326)
+    # e seu SPATIAL INDEX, usados nas buscas por área (MySQL 8)
+    'spatial'       :       False,
 }
 
 VISUALIZATION_SETTINGS = {
     # Flag para visualizar ou não os dados
     'visualize'     :       True,
+    # Quantidade de linhas mostradas. None para mostrar todas
     'max_rows'      :       None,
     'max_columns'   :       None,
-}
\ No newline at end of file
+    # Colunas mostradas (ver load.VIEW_COLUMNS). None para todas
+    'columns'       :       None,
+    # Quantidade de linhas lidas da Base de Dados e mostradas por vez
+    'chunk_size'    :       10000,
+}
+
+EXPORT_SETTINGS = {
+    # Arquivo CSV para onde a visão desnormalizada dos Pontos é exportada.
+    # None para não exportar
+    'csv_path'      :       None,
+    # Diretório para onde a visão é exportada em arquivos Parquet particionados
+    # por Estado e data da carga. None para não exportar
+    'parquet_path'  :       None,
+    # Compressão dos arquivos Parquet ('snappy', 'gzip', 'zstd' ou None)
+    'compression'   :       'snappy',
+    # Quantidade de linhas lidas da Base de Dados e escritas por vez
+    'chunk_size'    :       10000,
+    # Quantidade máxima de arquivos Parquet (partições) abertos ao mesmo tempo
+    'max_open_files':       64,
+}
+
+TRANSFORM_SETTINGS = {
+    # Engine usada para tratar as coordenadas: 'python' (linha a linha) ou 'numpy' (em blocos)
+    'engine'         :      'python',
+    # Tamanho aproximado (em bytes) dos blocos lidos pela engine 'numpy'
+    'chunk_size'     :      1024 * 1024,
+    # Tamanho (em metros) das células usadas para agrupar coordenadas próximas
+    # antes de acessar a API de Mapas. None para não agrupar
+    'cluster_radius' :      None,
+    # Quantidade máxima de valores normalizados (nomes de ruas, bairros...)
+    # mantidos em cache por campo na etapa de normalização
+    'normalize_cache_size' : 100000,
+    # Distância mínima (em metros) entre coordenadas consecutivas de uma trajetória:
+    # coordenadas mais próximas da última mantida (paradas) são descartadas. 0 para não filtrar
+    'min_distance'   :      0,
+    # Tolerância (em metros) da simplificação Douglas-Peucker das trajetórias. 0 para não simplificar
+    'simplify_tolerance' :  0,
+    # Quantidade máxima de coordenadas por segmento simplificado (limita a memória usada)
+    'segment_size'   :      1000,
+    # Distância (em metros) entre coordenadas consecutivas a partir da qual
+    # a trajetória é dividida em duas. None para não dividir
+    'max_gap'        :      None,
+}
+
+GEOCODER_SETTINGS = {
+    # Quantidade de threads acessando a API de Mapas simultaneamente
+    'workers'       :       1,
+    # Quantidade máxima de requisições por segundo (política do OpenStreetMap: 1)
+    'rate'          :       1.0,
+    # Flag para manter os pontos na mesma ordem dos arquivos
+    'ordered'       :       True,
+    # Backend de geocodificação: 'osm' (API do OpenStreetMap) ou 'offline'
+    # (arquivo local de endereços, sem acesso à rede e sem limite de requisições)
+    'backend'       :       'osm',
+    # URL do serviço de geocodificação. None para usar o OpenStreetMap
+    'url'           :       None,
+    # Arquivo de endereços (CSV ou GeoJSON) do backend 'offline'
+    'offline_path'  :       None,
+    # Distância máxima (em metros) até o endereço mais próximo no backend 'offline'
+    'max_distance'  :       200,
+}
+
+PIPELINE_SETTINGS = {
+    # Quantidade de processos lendo, tratando e geocodificando arquivos em paralelo.
+    # Com 1 processo os arquivos são processados em sequência
+    'processes'     :       1,
+    # Flag para executar as etapas do ETL de forma assíncrona e simultânea
+    'async'         :       False,
+    # Tamanho máximo das filas entre as etapas do modo assíncrono
+    'queue_size'    :       1000,
+}
+
+CACHE_SETTINGS = {
+    # Flag para usar ou não o cache da API de Mapas
+    'enabled'       :       True,
+    # Arquivo SQLite onde o cache é armazenado
+    'path'          :       'cache/geocode.sqlite',
+    # Casas decimais usadas para arredondar as coordenadas (5 casas ~ 1 metro)
+    'precision'     :       5,
+    # Tempo de vida (em segundos) de cada entrada. None para não expirar
+    'ttl'           :       30 * 24 * 60 * 60,
+    # Quantidade máxima de entradas armazenadas. None para não limitar
+    'max_entries'   :       1000000,
+}
+
+METRICS_SETTINGS = {
+    # Flag para registrar as métricas (tempo de cada etapa, latência da API e
+    # da Base de Dados, contadores) e escrevê-las ao final da execução
+    'enabled'           :       True,
+    # Arquivo JSON do resumo das métricas. None para apenas registrá-lo no log (nível INFO)
+    'json_path'         :       None,
+    # Arquivo no formato texto do Prometheus. None para não escrever
+    'prometheus_path'   :       None,
+}
+
+LOGGING_SETTINGS = {
+    # Nível mínimo das mensagens. 'DEBUG' mostra os dados de cada Ponto carregado
+    'level'             :       'INFO',
+    # Arquivo onde as mensagens também são escritas. None para apenas a tela
+    'path'              :       None,
+    # Intervalo (em segundos) entre os relatórios de progresso da carga
+    'progress_interval' :       10,
+    # Flag para contar os Pontos dos arquivos antes da carga, para estimar o tempo restante
+    'estimate_total'    :       True,
+}
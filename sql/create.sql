@@ -33,14 +33,26 @@ CREATE TABLE IF NOT EXISTS Suburb (
     FOREIGN KEY (cityID) REFERENCES City(id)
 );
 
+CREATE TABLE IF NOT EXISTS Ledger (
+    id INT NOT NULL AUTO_INCREMENT,
+    fileName VARCHAR(255) NOT NULL UNIQUE,
+    fileHash CHAR(64) NOT NULL,
+    pointOffset INT NOT NULL DEFAULT 0,
+    done BOOLEAN NOT NULL DEFAULT FALSE,
+    PRIMARY KEY (id)
+);
+
 CREATE TABLE IF NOT EXISTS Point (
     id INT NOT NULL AUTO_INCREMENT,
-    pointLAT FLOAT,
-    pointLNG FLOAT,
+    pointLAT DOUBLE,
+    pointLNG DOUBLE,
     pointStreetName VARCHAR(100),
     pointHouseNumber VARCHAR(20),
     pointPostalCode VARCHAR(20),
     suburbID INT(11) NOT NULL,
+    ledgerID INT,
+    pointCreatedAt TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     PRIMARY KEY (id),
-    FOREIGN KEY (suburbID) REFERENCES Suburb(id)
+    FOREIGN KEY (suburbID) REFERENCES Suburb(id),
+    FOREIGN KEY (ledgerID) REFERENCES Ledger(id)
 );
\ No newline at end of file
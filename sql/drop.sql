@@ -2,4 +2,5 @@ DROP TABLE Point;
 DROP TABLE Suburb;
 DROP TABLE City;
 DROP TABLE State;
-DROP TABLE Country;
\ No newline at end of file
+DROP TABLE Country;
+DROP TABLE Ledger;
\ No newline at end of file
@@ -0,0 +1,20 @@
+USE etl;
+
+-- Registro de carga (Ledger) usado pela carga incremental (-i), para bases
+-- criadas por versões anteriores. Cada arquivo é registrado pelo caminho
+-- relativo ao diretório dos arquivos (-p); quando um arquivo é modificado,
+-- os Pontos da carga anterior são apagados antes de ele ser carregado novamente.
+CREATE TABLE IF NOT EXISTS Ledger (
+    id INT NOT NULL AUTO_INCREMENT,
+    fileName VARCHAR(255) NOT NULL UNIQUE,
+    fileHash CHAR(64) NOT NULL,
+    pointOffset INT NOT NULL DEFAULT 0,
+    done BOOLEAN NOT NULL DEFAULT FALSE,
+    PRIMARY KEY (id)
+);
+
+-- Os Pontos carregados antes desta migração ficam sem registro (ledgerID NULL)
+-- e não são apagados quando seu arquivo é modificado.
+ALTER TABLE Point
+    ADD COLUMN ledgerID INT AFTER suburbID,
+    ADD CONSTRAINT PointLedger FOREIGN KEY (ledgerID) REFERENCES Ledger(id);
@@ -0,0 +1,30 @@
+USE etl;
+
+-- Esquema espacial da tabela Point (MySQL 8): coordenadas em DOUBLE e a coluna
+-- pointGeom, gerada a partir das coordenadas, com um SPATIAL INDEX.
+-- O SPATIAL INDEX exige uma coluna NOT NULL, então os Pontos sem Latitude ou
+-- Longitude são removidos (a carga não os insere nesse esquema, ver ETL._rows).
+DELETE FROM Point WHERE pointLAT IS NULL OR pointLNG IS NULL;
+
+ALTER TABLE Point
+    MODIFY pointLAT DOUBLE,
+    MODIFY pointLNG DOUBLE,
+    ADD COLUMN pointGeom POINT AS (ST_SRID(POINT(pointLNG, pointLAT), 4326)) STORED SRID 4326 NOT NULL,
+    ADD SPATIAL INDEX (pointGeom);
+
+-- Pontos dentro de um retângulo (usa o SPATIAL INDEX)
+SELECT  Point.id,
+        Point.pointLAT,
+        Point.pointLNG
+FROM Point
+WHERE MBRContains(ST_GeomFromText('POLYGON((-51.25 -30.05, -51.20 -30.05, -51.20 -30.00, -51.25 -30.00, -51.25 -30.05))', 4326, 'axis-order=long-lat'), Point.pointGeom);
+
+-- Pontos a até 500 metros de uma coordenada, do mais próximo para o mais distante
+SELECT  Point.id,
+        Point.pointLAT,
+        Point.pointLNG,
+        ST_Distance_Sphere(Point.pointGeom, ST_SRID(POINT(-51.23, -30.03), 4326)) AS pointDistance
+FROM Point
+WHERE MBRContains(ST_GeomFromText('POLYGON((-51.2352 -30.0345, -51.2248 -30.0345, -51.2248 -30.0255, -51.2352 -30.0255, -51.2352 -30.0345))', 4326, 'axis-order=long-lat'), Point.pointGeom)
+HAVING pointDistance <= 500
+ORDER BY pointDistance;
@@ -0,0 +1,13 @@
+USE etl;
+
+-- Atualiza a tabela Point criada por versões anteriores:
+-- data da carga (pointCreatedAt), usada no particionamento da exportação Parquet,
+-- e coordenadas em DOUBLE, com a mesma precisão dos arquivos de coordenadas.
+-- Os Pontos já carregados recebem a data da execução deste script.
+ALTER TABLE Point
+    MODIFY pointLAT DOUBLE,
+    MODIFY pointLNG DOUBLE,
+    ADD COLUMN pointCreatedAt TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP;
+
+-- Depois deste script, use ledger.sql para a carga incremental (-i)
+-- e spatial.sql para as buscas por área (query).
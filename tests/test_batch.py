@@ -0,0 +1,44 @@
+from batch import Dictionary, PointBatch, batches
+from extract import Point
+
+POINTS = [
+    Point(lat=-30.0, lng=-51.0, street='rua a', housenumber='10', suburb='centro',
+          city='porto alegre', postal='90000-000', state='rs', country='brasil'),
+    Point(lat=None, lng=None, street='rua a', housenumber=None, suburb='centro',
+          city='porto alegre', postal=None, state='rs', country='brasil'),
+    Point(lat=-30.1, lng=-51.1, street=None, housenumber=None, suburb=None,
+          city=None, postal=None, state=None, country=None),
+    Point(lat=-30.2, lng=-51.2, street='rua b', housenumber='1', suburb='cidade baixa',
+          city='porto alegre', postal=None, state='rs', country='brasil'),
+]
+
+
+def test_dictionary_reserves_zero_for_none():
+    dictionary = Dictionary()
+    assert dictionary.encode(None) == 0
+    assert dictionary.encode('a') == dictionary.encode('a') == 1
+    assert dictionary.encode('b') == 2
+    assert len(dictionary) == 2
+    assert dictionary.values == [None, 'a', 'b']
+
+
+def test_point_batch_round_trip():
+    batch = PointBatch.from_points(POINTS)
+    assert len(batch) == len(POINTS)
+    assert list(batch.points()) == POINTS
+
+
+def test_point_batch_encodes_places_once():
+    batch = PointBatch.from_points(POINTS)
+    # Os dois primeiros Points estão no mesmo lugar; o terceiro não tem lugar
+    assert batch.place[0] == batch.place[1]
+    assert batch.places.values[batch.place[2]] == (None, None, None, None)
+    assert len(batch.places) == 3
+    assert len(batch.streets) == 2
+
+
+def test_batches():
+    sizes = [len(batch) for batch in batches(iter(POINTS * 3), 5)]
+    assert sizes == [5, 5, 2]
+    assert [point for batch in batches(POINTS, 3) for point in batch.points()] == POINTS
+    assert list(batches([], 3)) == []
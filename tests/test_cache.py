@@ -0,0 +1,100 @@
+from concurrent.futures import ThreadPoolExecutor
+import sqlite3
+
+import pytest
+
+from cache import GeocodeCache
+
+DATA = {'street': 'rua a', 'suburb': 'centro'}
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / 'geocode.sqlite')
+
+
+def test_hit_does_not_hold_a_write_transaction(cache_path):
+    first = GeocodeCache(cache_path)
+    first.set((-30.0, -51.0), DATA)
+    assert first.get((-30.0, -51.0)) == DATA
+    assert not first._conn.in_transaction
+
+    # Outro processo (outra conexão) pode escrever sem aguardar
+    second = GeocodeCache(cache_path)
+    second._conn.execute('PRAGMA busy_timeout = 0;')
+    second.set((-30.1, -51.1), DATA)
+    second.close(report=False)
+    first.close(report=False)
+
+
+def test_access_times_are_written_on_close(cache_path):
+    cache = GeocodeCache(cache_path)
+    cache.set((-30.0, -51.0), DATA)
+    cache.get((-30.0, -51.0))
+    accessed = dict(cache._accessed)
+    cache.close(report=False)
+
+    conn = sqlite3.connect(cache_path)
+    assert conn.execute('SELECT accessed FROM Geocode;').fetchone()[0] == accessed[(-30.0, -51.0)]
+    conn.close()
+
+
+def test_replacing_an_entry_keeps_the_size(cache_path):
+    cache = GeocodeCache(cache_path, max_entries=3)
+    for _ in range(10):
+        cache.set((-30.0, -51.0), DATA)
+    assert cache._size == 1
+    for i in range(3):
+        cache.set((-30.0 - i, -51.0), DATA)
+    # Nenhuma entrada válida foi removida
+    assert cache._size == 3
+    assert cache.get((-30.0, -51.0)) == DATA
+    cache.close(report=False)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('cache.time', lambda: now[0])
+    return now
+
+
+def test_expired_entries_are_removed(cache_path, clock):
+    cache = GeocodeCache(cache_path, ttl=60)
+    cache.set((-30.0, -51.0), DATA)
+    clock[0] += 60
+    assert cache.get((-30.0, -51.0)) == DATA
+    clock[0] += 1
+    assert cache.get((-30.0, -51.0)) is None
+    assert cache._size == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.close(report=False)
+
+
+def test_eviction_removes_least_recently_used(cache_path, clock):
+    cache = GeocodeCache(cache_path, max_entries=10)
+    points = [(-30.0 - i, -51.0) for i in range(10)]
+    for point in points:
+        clock[0] += 1
+        cache.set(point, DATA)
+    # O primeiro ponto passa a ser o mais usado recentemente
+    clock[0] += 1
+    assert cache.get(points[0]) == DATA
+
+    clock[0] += 1
+    cache.set((-40.0, -51.0), DATA)
+    # São removidos 10% das entradas além da que ultrapassou o limite
+    assert cache._size == 9
+    assert cache.get(points[0]) == DATA
+    assert cache.get(points[1]) is None
+    assert cache.get(points[2]) is None
+    assert cache.get(points[3]) == DATA
+    cache.close(report=False)
+
+
+def test_cache_can_be_used_from_another_thread(cache_path):
+    cache = GeocodeCache(cache_path)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        executor.submit(cache.set, (-30.0, -51.0), DATA).result()
+        assert executor.submit(cache.get, (-30.0, -51.0)).result() == DATA
+    cache.close(report=False)
@@ -0,0 +1,35 @@
+import pytest
+
+pytest.importorskip('MySQLdb')
+
+from batch import PointBatch
+from etl import ETL
+from extract import Point
+
+POINTS = [
+    Point(lat=-30.0, lng=-51.0, street='rua a', housenumber='10', suburb='centro',
+          city='porto alegre', postal='90000-000', state='rs', country='brasil'),
+    Point(lat=None, lng=None, street='rua b', housenumber=None, suburb='centro',
+          city='porto alegre', postal=None, state='rs', country='brasil'),
+]
+
+
+def point_rows(spatial):
+    etl = ETL()
+    etl._insert_dimensions = lambda place: 1
+    checks = []
+    etl.model.has_spatial_schema = lambda: checks.append(spatial) or spatial
+    batch = PointBatch.from_points(POINTS)
+    rows = [row for _, row in etl._rows(batch)] + [row for _, row in etl._rows(batch)]
+    # O esquema é verificado apenas uma vez
+    assert checks == [spatial]
+    return rows[:len(POINTS)]
+
+
+def test_rows_keep_points_without_coordinates():
+    assert point_rows(spatial=False) == [[-30.0, -51.0, 'rua a', '10', '90000-000', 1],
+                                         [None, None, 'rua b', None, None, 1]]
+
+
+def test_spatial_rows_skip_points_without_coordinates():
+    assert point_rows(spatial=True) == [[-30.0, -51.0, 'rua a', '10', '90000-000', 1], None]
@@ -0,0 +1,45 @@
+from datetime import datetime
+
+import pytest
+
+from export import write_parquet
+
+pq = pytest.importorskip('pyarrow.parquet')
+
+COLUMNS = ('pointLAT', 'stateUF', 'pointCreatedAt')
+DAY = datetime(2018, 1, 1, 12)
+
+
+def chunks():
+    # As partições se alternam entre os blocos
+    point_id = 0
+    for state in ['rs', 'sc', 'rs', None, 'sc', 'rs']:
+        rows = []
+        for _ in range(3):
+            point_id += 1
+            rows.append((point_id, -30.0 - point_id / 100, state, DAY))
+        yield rows
+
+
+def read(path):
+    table = pq.read_table(path, columns=['pointID', 'stateUF'])
+    return sorted(zip(table.column('pointID').to_pylist(), table.column('stateUF').to_pylist()),
+                  key=lambda row: row[0])
+
+
+@pytest.mark.parametrize('max_open_files', [1, 2, 64])
+def test_write_parquet_limits_open_files(tmp_path, max_open_files):
+    n_rows, n_partitions = write_parquet(chunks(), COLUMNS, str(tmp_path),
+                                         max_open_files=max_open_files)
+    assert (n_rows, n_partitions) == (18, 3)
+
+    # A partição de valores nulos é lida como nula
+    expected = [(row[0], row[2]) for rows in chunks() for row in rows]
+    expected.sort(key=lambda row: row[0])
+    assert read(str(tmp_path)) == expected
+
+
+def test_reopened_partitions_get_new_files(tmp_path):
+    write_parquet(chunks(), COLUMNS, str(tmp_path), max_open_files=1)
+    files = sorted(path.name for path in (tmp_path / 'stateUF=rs' / 'loadDate=2018-01-01').iterdir())
+    assert files == ['part-0.parquet', 'part-1.parquet', 'part-2.parquet']
@@ -0,0 +1,94 @@
+from threading import Lock
+from time import monotonic, sleep
+
+import pytest
+
+from cache import GeocodeCache
+from extract import RateLimiter, get_data_points
+
+POINTS = [(-30.0 - i / 100, -51.0 - i / 100) for i in range(8)]
+
+
+class StubGeocoder:
+    '''
+    Backend de geocodificação local: responde após `delays[ponto]` segundos
+    e registra as coordenadas consultadas
+    '''
+    def __init__(self, delays=None, rate_limited=False):
+        self.delays = delays or {}
+        self.rate_limited = rate_limited
+        self.requests = []
+        self._lock = Lock()
+
+
+    def reverse(self, point):
+        sleep(self.delays.get(point, 0))
+        with self._lock:
+            self.requests.append(point)
+        return {'lat': point[0] + 0.00001, 'lng': point[1], 'street': 'rua {}'.format(point[0])}
+
+
+def streets(points):
+    return ['rua {}'.format(point[0]) for point in points]
+
+
+def test_rate_limiter_spaces_requests():
+    limiter = RateLimiter(rate=20)
+    start = monotonic()
+    for _ in range(5):
+        limiter.acquire()
+    # A primeira requisição é imediata; as outras 4 aguardam 1/20 s cada
+    assert monotonic() - start >= 4 / 20 - 0.01
+
+
+def test_rate_limiter_allows_burst():
+    limiter = RateLimiter(rate=1, burst=3)
+    start = monotonic()
+    for _ in range(3):
+        limiter.acquire()
+    assert monotonic() - start < 0.5
+
+
+def test_rate_is_ignored_for_unlimited_backends():
+    start = monotonic()
+    list(get_data_points(POINTS, workers=4, rate=1, backend=StubGeocoder()))
+    assert monotonic() - start < 1
+
+
+def test_rate_limits_the_backend():
+    backend = StubGeocoder(rate_limited=True)
+    start = monotonic()
+    list(get_data_points(POINTS[:4], workers=4, rate=20, backend=backend))
+    assert monotonic() - start >= 3 / 20 - 0.01
+    assert len(backend.requests) == 4
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_ordered_output_keeps_input_order(workers):
+    # A primeira coordenada é a última a ser respondida
+    backend = StubGeocoder(delays={POINTS[0]: 0.2})
+    data_points = list(get_data_points(POINTS, workers=workers, backend=backend))
+    assert [point.street for point in data_points] == streets(POINTS)
+    # A coordenada original do arquivo é mantida
+    assert [(point.lat, point.lng) for point in data_points] == POINTS
+
+
+def test_unordered_output_yields_as_completed():
+    backend = StubGeocoder(delays={POINTS[0]: 0.2})
+    data_points = list(get_data_points(POINTS, workers=4, ordered=False, backend=backend))
+    assert sorted(point.street for point in data_points) == sorted(streets(POINTS))
+    assert data_points[-1].street == streets(POINTS)[0]
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_cached_points_skip_the_backend(tmp_path, workers):
+    cache = GeocodeCache(str(tmp_path / 'geocode.sqlite'))
+    backend = StubGeocoder()
+    first = list(get_data_points(POINTS, cache=cache, workers=workers, backend=backend))
+    assert len(backend.requests) == len(POINTS)
+
+    second = list(get_data_points(POINTS, cache=cache, workers=workers, backend=backend))
+    assert second == first
+    assert len(backend.requests) == len(POINTS)
+    assert (cache.hits, cache.misses) == (len(POINTS), len(POINTS))
+    cache.close(report=False)
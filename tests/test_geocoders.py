@@ -0,0 +1,65 @@
+import random
+from math import cos, radians, sqrt
+
+import pytest
+
+from geocoders import FIELDS, OfflineGeocoder, _KDTree, get_geocoder
+
+
+def distances(points, target):
+    '''
+    Distâncias (com a mesma projeção da árvore KD) de cada ponto até a coordenada
+    '''
+    scale = cos(radians(sum(lat for lat, _ in points) / len(points)))
+    return [sqrt(((lng - target[1]) * scale) ** 2 + (lat - target[0]) ** 2)
+            for lat, lng in points]
+
+
+@pytest.mark.parametrize('n_points', [1, 2, 7, 500])
+def test_kdtree_nearest_matches_brute_force(n_points):
+    rng = random.Random(n_points)
+    points = [(rng.uniform(-30.2, -29.9), rng.uniform(-51.3, -51.0)) for _ in range(n_points)]
+    tree = _KDTree(points)
+    for _ in range(200):
+        target = (rng.uniform(-30.3, -29.8), rng.uniform(-51.4, -50.9))
+        index, distance = tree.nearest(target)
+        expected = distances(points, target)
+        assert distance == pytest.approx(min(expected))
+        assert expected[index] == pytest.approx(distance)
+
+
+def test_kdtree_empty():
+    assert _KDTree([]).nearest((-30.0, -51.0)) == (-1, float('inf'))
+
+
+@pytest.fixture
+def address_file(tmp_path):
+    path = tmp_path / 'addresses.csv'
+    path.write_text(','.join(FIELDS) + '\n'
+                    '-30.0,-51.0,Rua A,10,Centro,Porto Alegre,90000-000,RS,Brasil\n'
+                    ',-51.1,Rua Sem Latitude,,Centro,Porto Alegre,,RS,Brasil\n'
+                    'abc,-51.2,Rua Inválida,,Centro,Porto Alegre,,RS,Brasil\n'
+                    '-30.01,-51.0,Rua B,,Cidade Baixa,Porto Alegre,,RS,Brasil\n',
+                    encoding='utf-8')
+    return str(path)
+
+
+def test_offline_geocoder_skips_invalid_rows(address_file, caplog):
+    geocoder = OfflineGeocoder(address_file)
+    assert [feature['street'] for feature in geocoder._features] == ['Rua A', 'Rua B']
+    assert 'Skipped 2 rows' in caplog.text
+
+
+def test_offline_geocoder_reverse(address_file):
+    geocoder = OfflineGeocoder(address_file, max_distance=200)
+    assert geocoder.reverse((-30.0001, -51.0001))['street'] == 'Rua A'
+    assert geocoder.reverse((-30.0099, -51.0))['suburb'] == 'Cidade Baixa'
+    # Mais longe que max_distance
+    assert geocoder.reverse((-30.1, -51.0)) == {}
+
+
+def test_get_geocoder_offline_needs_path():
+    with pytest.raises(ValueError):
+        get_geocoder('offline')
+    with pytest.raises(ValueError):
+        get_geocoder('unknown')
@@ -0,0 +1,36 @@
+import pytest
+
+MySQLdb = pytest.importorskip('MySQLdb')
+
+from load import NO_SUCH_TABLE, Model
+
+
+class FailingCursor:
+    '''
+    Cursor que falha em todas as consultas com o erro informado
+    '''
+    def __init__(self, error):
+        self.error = error
+
+
+    def execute(self, query, args=None):
+        raise self.error
+
+
+def test_load_ids_skips_missing_tables():
+    model = Model()
+    model._cursor = FailingCursor(MySQLdb.ProgrammingError(NO_SUCH_TABLE, "Table 'etl.City' doesn't exist"))
+    model._load_ids()
+    assert all(not ids for ids in model._ids.values())
+
+
+@pytest.mark.parametrize('error', [
+    MySQLdb.OperationalError(2006, 'MySQL server has gone away'),
+    MySQLdb.ProgrammingError(1064, 'You have an error in your SQL syntax'),
+    KeyboardInterrupt(),
+])
+def test_load_ids_propagates_other_errors(error):
+    model = Model()
+    model._cursor = FailingCursor(error)
+    with pytest.raises(type(error)):
+        model._load_ids()
@@ -0,0 +1,165 @@
+import pytest
+
+import extract as exct
+import transform as trm
+from extract import Point
+
+# Arquivos com linhas 'sujas': Distâncias, Latitudes sem Longitude, Longitudes
+# sem Latitude, linhas em branco e uma Latitude pendente no final do primeiro arquivo
+DIRTY_FILES = {
+    'a.txt': ('Latitude: 30°2\'59" S   -30.04982864\n'
+              'Longitude: 51°12\'5" W   -51.20150245\n'
+              'Distance: 2.2959 km  Bearing: 137.352°\n'
+              'Latitude: 30°4\'3" S   -30.06761588\n'
+              'Latitude: 30°3\'21" S   -30.05596474\n'
+              'Longitude: 51°10\'22" W   -51.17286827\n'
+              '\n'
+              'Longitude: 51°14\'58" W   -51.24943145\n'
+              'Latitude: 30°2\'18" S   -30.03841576\n'),
+    'b.txt': ('Longitude: 51°8\'11" W   -51.13644712\n'
+              'Latitude: 30°1\'55" S   -30.03200000\n'
+              'Longitude: 51°11\'2" W   -51.18400000\n'
+              'Distance: 1.0000 km  Bearing: 10.000°\n'
+              'Latitude: 30°0\'0" S   -30.00000000\n'
+              'Longitude: 51°0\'0" W   -51.00000000'),
+}
+
+
+@pytest.fixture
+def dirty_path(tmp_path):
+    for name, content in DIRTY_FILES.items():
+        (tmp_path / name).write_text(content, encoding='utf-8')
+    return str(tmp_path)
+
+
+def python_points(path):
+    return list(trm.clear_points(exct.get_points(path)))
+
+
+def numpy_points(path, chunk_size):
+    chunks = trm.clear_points_numpy(exct.get_files(path), chunk_size=chunk_size)
+    return [tuple(point) for chunk in chunks for point in chunk.tolist()]
+
+
+def test_clear_points_discards_inconsistent_lines(dirty_path):
+    assert python_points(dirty_path) == [(-30.04982864, -51.20150245),
+                                         (-30.05596474, -51.17286827),
+                                         (-30.032, -51.184),
+                                         (-30.0, -51.0)]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 64, 1024 * 1024])
+def test_numpy_engine_matches_python_engine(dirty_path, chunk_size):
+    # Blocos pequenos testam a Latitude pendente entre blocos de um arquivo
+    assert numpy_points(dirty_path, chunk_size) == python_points(dirty_path)
+
+
+def test_pair_lines_matches_clear_points(dirty_path):
+    lines = list(exct.get_points(dirty_path))
+    points, lat = [], None
+    for i in range(0, len(lines), 4):
+        chunk, lat = trm.pair_lines(lines[i:i + 4], lat)
+        points += chunk
+    assert points == python_points(dirty_path)
+
+
+def test_normalize_state_uses_abbreviations():
+    assert trm.normalize_state('Rio Grande do Sul') == 'rs'
+    assert trm.normalize_state('  Estado de São Paulo ') == 'sp'
+    assert trm.normalize_state('Ceará') == 'ce'
+    # Estados desconhecidos são apenas normalizados
+    assert trm.normalize_state('Buenos  Aires') == 'buenos aires'
+    assert trm.normalize_state('') is None
+
+
+def test_normalize_text_composes_accents():
+    composed = 'São João'
+    decomposed = 'São  João '
+    assert trm.normalize_text(composed) == trm.normalize_text(decomposed) == 'são joão'
+    assert trm.normalize_text(None) is None
+    assert trm.normalize_text('   ') is None
+
+
+def test_normalizer_normalizes_text_fields():
+    normalizer = trm.Normalizer(cache_size=10)
+    point = Point(lat=-30.0, lng=-51.0, street=' Rua  DA Praia', housenumber=None,
+                  suburb='Centro Histórico', city='Porto Alegre', postal='90010-000',
+                  state='Rio Grande do Sul', country='Brasil')
+    normalized = normalizer.normalize(point)
+    assert normalized == Point(lat=-30.0, lng=-51.0, street='rua da praia', housenumber=None,
+                               suburb='centro histórico', city='porto alegre',
+                               postal='90010-000', state='rs', country='brasil')
+    normalizer.normalize(point)
+    hits, misses = normalizer.stats()['state']
+    assert (hits, misses) == (1, 1)
+
+
+def line(n, lat=-30.0, step=0.001):
+    '''
+    Coordenadas igualmente espaçadas em uma reta norte-sul
+    '''
+    return [(lat + i * step, -51.0) for i in range(n)]
+
+
+def test_simplifier_empty_trajectory():
+    simplifier = trm.Simplifier(min_distance=10, tolerance=10)
+    assert list(simplifier.simplify([], 'empty')) == []
+    assert simplifier.stats() == (1, 0, 0)
+
+
+def test_simplifier_single_point():
+    simplifier = trm.Simplifier(min_distance=10, tolerance=10)
+    assert list(simplifier.simplify([(-30.0, -51.0)], 'single')) == [(-30.0, -51.0)]
+    assert simplifier.stats() == (1, 1, 1)
+
+
+def test_simplifier_keeps_line_endpoints():
+    points = line(10)
+    simplifier = trm.Simplifier(tolerance=10)
+    assert list(simplifier.simplify(points, 'line')) == [points[0], points[-1]]
+    assert simplifier.stats() == (1, 10, 2)
+
+    # As pontas de cada segmento são mantidas
+    simplifier = trm.Simplifier(tolerance=10, segment_size=4)
+    assert list(simplifier.simplify(points, 'line')) == points[::3]
+
+
+def test_simplifier_keeps_last_dropped_point():
+    # Parado no final da trajetória: a última coordenada é mantida
+    simplifier = trm.Simplifier(min_distance=50)
+    points = line(3, step=0.01) + [(-29.98, -51.0001), (-29.98, -51.0002)]
+    assert list(simplifier.simplify(points, 'stop')) == points[:3] + [points[-1]]
+
+
+def test_simplifier_splits_on_max_gap():
+    first = line(5)
+    second = line(5, lat=-29.0)
+    points = first + second
+
+    simplifier = trm.Simplifier(tolerance=10)
+    assert list(simplifier.simplify(points, 'gap')) == [first[0], second[-1]]
+
+    # Com max_gap, as pontas do salto são mantidas
+    simplifier = trm.Simplifier(tolerance=10, max_gap=1000)
+    assert list(simplifier.simplify(points, 'gap')) == [first[0], first[-1],
+                                                        second[0], second[-1]]
+
+
+@pytest.mark.parametrize('content, error', [
+    ('Latitude: -30.0\nLongitude: -51.0\nLatitude: 30°2\'59" S\n', ValueError),
+    ('Latitude: -30.0\nLongitude:\n', ValueError),
+    ('Latitude: -30.0\nLng: -51.0\n', Exception),
+])
+def test_engines_reject_the_same_malformed_lines(tmp_path, content, error):
+    (tmp_path / 'a.txt').write_text(content, encoding='utf-8')
+    with pytest.raises(error):
+        python_points(str(tmp_path))
+    with pytest.raises(error):
+        numpy_points(str(tmp_path), 1024)
+
+
+def test_engines_ignore_unpaired_malformed_longitude(tmp_path):
+    # A Longitude sem Latitude é descartada sem ser lida
+    (tmp_path / 'a.txt').write_bytes(b'Longitude: ?\r\nLatitude: -30.5 \r\nLongitude: \t-51.5\r\n')
+    assert python_points(str(tmp_path)) == [(-30.5, -51.5)]
+    assert numpy_points(str(tmp_path), 1024) == [(-30.5, -51.5)]
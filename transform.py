@@ -1,4 +1,18 @@
-from tqdm import tqdm
+import re
+import sys
+import unicodedata
+from functools import lru_cache
+from math import asin, cos, floor, hypot, radians, sin, sqrt
+from extract import Point, END_OF_FILE
+from log import get_logger
+
+LOGGER = get_logger('transform')
+
+# Raio médio da Terra (em metros)
+EARTH_RADIUS = 6371008.8
+
+# Um grau de latitude tem aproximadamente 111.32 km
+METERS_PER_DEGREE = 111320.0
 
 def clear_points(data_points):
     '''
@@ -6,6 +20,13 @@ def clear_points(data_points):
     Apaga as linhas de Distâncias e as informações de Longitude
     e Latitude que estão inconsistentes.
 
+    As linhas são consumidas uma única vez, sem serem armazenadas em memória:
+    uma Latitude fica pendente até a próxima linha de Longitude, formando uma
+    coordenada. Latitudes sem Longitude e Longitudes sem Latitude são descartadas.
+    Cada arquivo é uma trajetória, então uma Latitude pendente no final de um
+    arquivo (linha END_OF_FILE, ver extract.get_points) também é descartada,
+    como em clear_points_numpy.
+
     Args:
         data_points : generator | list
             Lista geradora de coordenadas
@@ -13,30 +34,629 @@ def clear_points(data_points):
     Returns:
         generator | list | tuples
             Retorna um gerador de uma lista de coordenadas limpas (tratadas)
-            
-
-    '''
-    # Filtra apenas as linhas com Latitude e Longitude
-    data = list(filter(lambda line: line[0] == 'L', data_points))
-    
-    to_delete = []
-
-    print('\nCleaning data')
-    for i in tqdm(iterable=range(1, len(data)), ncols=90, unit=' lines'):
-        previous = data[i-1]
-        current = data[i]
-
-        if previous[:2] == current[:2]: # Testa se está faltando informação
-            if current[:2] == 'Lo': # Se estiver faltando a informação de Latitude
-                to_delete.append(current) # Deleta a Longitude excedente
-            elif current[:2] == 'La': # Se estiver faltando a informação de Longitude
-                to_delete.append(previous) # Deleta a Latitude excedente
-            else:
-                raise Exception('Data Error: Inconsistent Data')
-
-    # Deleta valores inconsistentes
-    for line in to_delete:
-        data.remove(line)
-    # Retorna generator de coordenadas
-    for i in range(1, len(data), 2):
-         yield (float(data[i-1].split()[-1]), float(data[i].split()[-1]))
\ No newline at end of file
+
+    Raises:
+        Exception
+            Caso exista uma linha de coordenada que não seja Latitude nem Longitude
+    '''
+    from tqdm import tqdm
+
+    lat = None
+
+    LOGGER.info('Cleaning data')
+    # A barra de progresso é mostrada apenas em um terminal (disable=None)
+    for line in tqdm(iterable=data_points, ncols=90, unit=' lines', disable=None):
+        if line[:2] == 'La':
+            # Se já havia uma Latitude pendente, está faltando sua Longitude
+            lat = float(line.split()[-1])
+        elif line[:2] == 'Lo':
+            # Se não há Latitude pendente, a Longitude é descartada
+            if lat is not None:
+                yield (lat, float(line.split()[-1]))
+                lat = None
+        elif line == END_OF_FILE:
+            lat = None
+        elif line[:1] == 'L':
+            raise Exception('Data Error: Inconsistent Data')
+
+
+def pair_lines(lines, lat=None):
+    '''
+    Método para formar as coordenadas de um bloco de linhas, com a mesma regra
+    de clear_points. Usado quando as linhas chegam em blocos (ex.: pipeline
+    assíncrono): a Latitude pendente no final de um bloco é passada para o próximo.
+
+    Args:
+        lines : list
+            Bloco de linhas dos arquivos de dados
+
+        lat : float
+            Latitude pendente do bloco anterior
+
+    Returns:
+        tuple
+            Lista de coordenadas (lat, lng) e a Latitude pendente do bloco
+    '''
+    points = []
+    for line in lines:
+        if line[:2] == 'La':
+            lat = float(line.split()[-1])
+        elif line[:2] == 'Lo':
+            if lat is not None:
+                points.append((lat, float(line.split()[-1])))
+                lat = None
+        elif line == END_OF_FILE:
+            lat = None
+        elif line[:1] == 'L':
+            raise Exception('Data Error: Inconsistent Data')
+    return points, lat
+
+
+# Caracteres considerados espaços em branco (os mesmos de bytes.split), por código
+_SPACES = b' \t\n\r\x0b\x0c'
+
+
+def clear_points_numpy(files, chunk_size=1024 * 1024):
+    '''
+    Método para limpar as coordenadas dos arquivos de dados utilizando NumPy,
+    com as mesmas regras de clear_points. Cada arquivo é lido em blocos de
+    bytes terminados em uma linha completa; o tipo de cada linha é obtido
+    pelos dois primeiros bytes, com operações vetorizadas sobre o bloco, e
+    apenas o último campo das linhas usadas (Latitudes e Longitudes com
+    Latitude pendente) é convertido para float, como float(line.split()[-1])
+    em clear_points. Linhas inconsistentes geram os mesmos erros nas duas
+    engines. Cada arquivo é uma trajetória: a Latitude pendente não passa de
+    um arquivo para o próximo, como em clear_points.
+
+    Args:
+        files : generator | list
+            Lista de nomes dos arquivos com os dados dos Pontos
+
+        chunk_size : int
+            Tamanho aproximado (em bytes) de cada bloco lido dos arquivos
+
+    Returns:
+        generator | numpy.ndarray
+            Retorna um gerador de arrays (N, 2) float64 de coordenadas limpas (tratadas)
+
+    Raises:
+        Exception
+            Caso exista uma linha de coordenada que não seja Latitude nem Longitude
+
+        ValueError
+            Caso o valor de uma linha de coordenada usada não seja um número
+    '''
+    import numpy as np
+
+    spaces = np.zeros(256, dtype=bool)
+    spaces[list(_SPACES)] = True
+
+    LOGGER.info('Cleaning data (numpy)')
+    for file_name in files:
+        # Latitude do final do bloco anterior que ainda não tem Longitude
+        lat = None
+        rest = b''
+        with open(file_name, 'rb') as file:
+            while True:
+                data = file.read(chunk_size)
+                if data:
+                    # O bloco termina na última linha completa; o restante vai para o próximo
+                    data = rest + data
+                    end = data.rfind(b'\n') + 1
+                    data, rest = data[:end], data[end:]
+                    if not data:
+                        continue
+                elif rest:
+                    # Última linha do arquivo, sem '\n'
+                    data, rest = rest + b'\n', b''
+                else:
+                    break
+                points, lat = _pair_chunk(np, spaces, data, lat)
+                if len(points):
+                    yield points
+
+
+def _pair_chunk(np, spaces, data, lat):
+    '''
+    Método auxiliar para formar as coordenadas de um bloco de linhas completas
+    (ver clear_points_numpy)
+
+    Returns:
+        tuple
+            Array (N, 2) de coordenadas e a Latitude pendente do bloco
+    '''
+    buf = np.frombuffer(data, dtype=np.uint8)
+    ends = np.flatnonzero(buf == ord('\n'))
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    first = buf[starts]
+    second = buf[np.minimum(starts + 1, len(buf) - 1)]
+    is_line = first == ord('L')
+    is_lat = is_line & (second == ord('a'))
+    is_lng = is_line & (second == ord('o'))
+    if (is_line & ~is_lat & ~is_lng).any():
+        raise Exception('Data Error: Inconsistent Data')
+
+    # Linhas de coordenadas, na ordem do bloco: True para Latitude
+    lines = np.flatnonzero(is_lat | is_lng)
+    kinds = is_lat[lines]
+    if not len(kinds):
+        return np.empty((0, 2)), lat
+    # Longitudes com uma Latitude imediatamente antes (ou pendente do bloco anterior)
+    after_lat = np.concatenate(([lat is not None], kinds[:-1]))
+    paired = ~kinds & after_lat
+    used = kinds | paired
+
+    values = np.full(len(kinds), np.nan)
+    if used.any():
+        values[used] = _last_fields(np, spaces, buf, starts[lines[used]], ends[lines[used]])
+    previous = np.concatenate(([np.nan if lat is None else lat], values[:-1]))
+    points = np.column_stack((previous[paired], values[paired]))
+    return points, (values[-1] if kinds[-1] else None)
+
+
+def _last_fields(np, spaces, buf, starts, ends):
+    '''
+    Método auxiliar para converter o último campo (separado por espaços) de
+    cada linha buf[starts:ends] para float, todas as linhas de uma só vez
+
+    Returns:
+        numpy.ndarray
+            Valores float64 dos campos
+
+    Raises:
+        ValueError
+            Caso algum campo não seja um número
+    '''
+    # Remove os espaços do final e volta até o espaço antes do campo
+    end = ends.copy()
+    active = (end > starts) & spaces[buf[np.maximum(end - 1, 0)]]
+    while active.any():
+        end[active] -= 1
+        active &= (end > starts) & spaces[buf[np.maximum(end - 1, 0)]]
+    begin = end.copy()
+    active = (begin > starts) & ~spaces[buf[np.maximum(begin - 1, 0)]]
+    while active.any():
+        begin[active] -= 1
+        active &= (begin > starts) & ~spaces[buf[np.maximum(begin - 1, 0)]]
+
+    # Campos lado a lado em uma matriz de bytes, lida como strings de tamanho fixo
+    width = max(int((end - begin).max()), 1)
+    index = begin[:, None] + np.arange(width)
+    fields = buf[np.minimum(index, len(buf) - 1)]
+    fields[index >= end[:, None]] = 0
+    return fields.view('S{}'.format(width)).ravel().astype(np.float64)
+
+
+def _grid_cell(lat, lng, radius):
+    '''
+    Método auxiliar para calcular a célula da grade espacial de uma coordenada.
+    As células têm aproximadamente `radius` metros de lado.
+
+    Args:
+        lat : float
+            Latitude do ponto
+
+        lng : float
+            Longitude do ponto
+
+        radius : float
+            Tamanho (em metros) do lado das células
+
+    Returns:
+        tuple
+            Índices (linha, coluna) da célula
+    '''
+    size = radius / METERS_PER_DEGREE
+    row = floor(lat / size)
+    # A largura de um grau de longitude diminui com o cosseno da latitude
+    col = floor(lng * cos(radians((row + 0.5) * size)) / size)
+    return (row, col)
+
+
+def cluster_points(data_points, radius):
+    '''
+    Método para agrupar coordenadas próximas em células de uma grade espacial.
+    Coordenadas na mesma célula tendem a resultar no mesmo endereço, então
+    apenas uma delas precisa ser consultada na API de Mapas.
+
+    Args:
+        data_points : generator | list
+            Lista geradora de coordenadas limpas (tratadas)
+
+        radius : float
+            Tamanho (em metros) do lado das células
+
+    Returns:
+        generator | tuples
+            Retorna um gerador de tuplas (célula, (lat, lng))
+    '''
+    for lat, lng in data_points:
+        yield (_grid_cell(lat, lng, radius), (lat, lng))
+
+
+def haversine(lat1, lng1, lat2, lng2):
+    '''
+    Método para calcular a distância entre duas coordenadas pela fórmula de haversine
+
+    Returns:
+        float
+            Distância (em metros)
+    '''
+    lat1, lng1, lat2, lng2 = radians(lat1), radians(lng1), radians(lat2), radians(lng2)
+    h = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS * asin(sqrt(h))
+
+
+def douglas_peucker(points, tolerance):
+    '''
+    Método para simplificar uma sequência de coordenadas com o algoritmo de
+    Douglas-Peucker: são mantidas apenas as coordenadas que se afastam mais de
+    `tolerance` metros da reta entre as coordenadas mantidas vizinhas. As
+    coordenadas são projetadas em metros ao redor da primeira, o que é preciso
+    o suficiente para segmentos de poucos quilômetros.
+
+    Args:
+        points : list
+            Coordenadas (lat, lng) de um segmento da trajetória
+
+        tolerance : float
+            Distância máxima (em metros) de uma coordenada descartada até a trajetória simplificada
+
+    Returns:
+        list
+            Coordenadas mantidas, incluindo a primeira e a última
+    '''
+    n = len(points)
+    if n < 3 or not tolerance:
+        return list(points)
+
+    scale = cos(radians(points[0][0]))
+    xy = [(lng * scale * METERS_PER_DEGREE, lat * METERS_PER_DEGREE) for lat, lng in points]
+    keep = [False] * n
+    keep[0] = keep[-1] = True
+    # Pilha de trechos (primeira, última) ainda não simplificados, em vez de recursão
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        (x1, y1), (x2, y2) = xy[first], xy[last]
+        dx, dy = x2 - x1, y2 - y1
+        norm = dx * dx + dy * dy
+        index, farthest = None, tolerance
+        for i in range(first + 1, last):
+            x, y = xy[i]
+            # Distância até o trecho (e não até a reta infinita), para trajetórias que voltam
+            t = max(0.0, min(1.0, ((x - x1) * dx + (y - y1) * dy) / norm)) if norm else 0.0
+            distance = hypot(x - x1 - t * dx, y - y1 - t * dy)
+            if distance > farthest:
+                index, farthest = i, distance
+        if index is not None:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+class Simplifier:
+    '''
+    Etapa de simplificação das trajetórias, entre o tratamento e a
+    geocodificação. As coordenadas de cada arquivo formam uma trajetória,
+    percorrida em segmentos de tamanho limitado (a memória usada não depende
+    do tamanho do arquivo), que também terminam nos saltos maiores que
+    `max_gap`. Coordenadas a menos de `min_distance` metros da última mantida
+    (paradas, repetições) são descartadas e cada segmento é simplificado com
+    Douglas-Peucker, então coordenadas redundantes não chegam à API de Mapas
+    nem à Base de Dados.
+    '''
+    def __init__(self, min_distance=0, tolerance=0, segment_size=1000, max_gap=None):
+        '''
+        Args:
+            min_distance : float
+                Distância mínima (em metros) até a última coordenada mantida. 0 para não filtrar
+
+            tolerance : float
+                Tolerância (em metros) do Douglas-Peucker. 0 para não simplificar
+
+            segment_size : int
+                Quantidade máxima de coordenadas por segmento simplificado
+
+            max_gap : float
+                Distância (em metros) entre coordenadas consecutivas a partir
+                da qual a trajetória é dividida. None para não dividir
+        '''
+        self.min_distance = min_distance or 0
+        self.tolerance = tolerance or 0
+        self.segment_size = max(segment_size, 3)
+        self.max_gap = max_gap
+        # Arquivos, coordenadas recebidas e coordenadas mantidas
+        self.files = 0
+        self.points_in = 0
+        self.points_out = 0
+
+
+    def config(self):
+        '''
+        Método para pegar a configuração da etapa, usada para recriá-la em outros processos
+
+        Returns:
+            dict
+                Parâmetros de __init__
+        '''
+        return {'min_distance': self.min_distance,
+                'tolerance': self.tolerance,
+                'segment_size': self.segment_size,
+                'max_gap': self.max_gap}
+
+
+    def simplify(self, points, name=None):
+        '''
+        Método para simplificar a trajetória de um arquivo. Ao final, a taxa
+        de redução do arquivo é mostrada.
+
+        Args:
+            points : generator | list
+                Coordenadas (lat, lng) limpas (tratadas) da trajetória
+
+            name : str
+                Nome do arquivo, usado na mensagem da taxa de redução
+
+        Returns:
+            generator | tuples
+                Um gerador das coordenadas mantidas, na ordem da trajetória
+        '''
+        n_in = n_out = 0
+        segment = []
+        # Última coordenada descartada pela distância mínima, mantida caso termine a trajetória
+        dropped = None
+        for point in points:
+            n_in += 1
+            if segment:
+                distance = haversine(segment[-1][0], segment[-1][1], point[0], point[1])
+                if distance < self.min_distance:
+                    dropped = point
+                    continue
+                if self.max_gap and distance > self.max_gap:
+                    kept = douglas_peucker(segment, self.tolerance)
+                    n_out += len(kept)
+                    yield from kept
+                    segment = []
+            dropped = None
+            segment.append(point)
+            if len(segment) >= self.segment_size:
+                # A última coordenada do segmento é a primeira do próximo, e é retornada apenas nele
+                kept = douglas_peucker(segment, self.tolerance)[:-1]
+                n_out += len(kept)
+                yield from kept
+                segment = [segment[-1]]
+
+        if dropped is not None:
+            segment.append(dropped)
+        kept = douglas_peucker(segment, self.tolerance)
+        n_out += len(kept)
+        yield from kept
+
+        self.files += 1
+        self.points_in += n_in
+        self.points_out += n_out
+        LOGGER.info("Simplified '%s': %d -> %d points (%.1f%% reduction)",
+                    name, n_in, n_out, _reduction(n_in, n_out))
+
+
+    def stats(self):
+        '''
+        Método para pegar os totais da etapa
+
+        Returns:
+            tuple
+                Arquivos, coordenadas recebidas e coordenadas mantidas
+        '''
+        return (self.files, self.points_in, self.points_out)
+
+
+    def merge(self, stats):
+        '''
+        Método para somar os totais da etapa em outro processo (ver stats)
+        '''
+        files, points_in, points_out = stats
+        self.files += files
+        self.points_in += points_in
+        self.points_out += points_out
+
+
+    def report(self):
+        '''
+        Método para mostrar a taxa de redução de todos os arquivos
+        '''
+        if self.files:
+            LOGGER.info('Simplification: %d -> %d points in %d files (%.1f%% reduction)',
+                        self.points_in, self.points_out, self.files,
+                        _reduction(self.points_in, self.points_out))
+
+
+def _reduction(points_in, points_out):
+    '''
+    Método auxiliar para calcular a porcentagem de coordenadas descartadas
+    '''
+    return 100.0 * (points_in - points_out) / points_in if points_in else 0.0
+
+
+# Siglas dos Estados brasileiros pelo nome sem acentos (a coluna stateUF tem 5 caracteres)
+STATE_ABBREVIATIONS = {
+    'acre'                  :   'ac',
+    'alagoas'               :   'al',
+    'amapa'                 :   'ap',
+    'amazonas'              :   'am',
+    'bahia'                 :   'ba',
+    'ceara'                 :   'ce',
+    'distrito federal'      :   'df',
+    'espirito santo'        :   'es',
+    'goias'                 :   'go',
+    'maranhao'              :   'ma',
+    'mato grosso'           :   'mt',
+    'mato grosso do sul'    :   'ms',
+    'minas gerais'          :   'mg',
+    'para'                  :   'pa',
+    'paraiba'               :   'pb',
+    'parana'                :   'pr',
+    'pernambuco'            :   'pe',
+    'piaui'                 :   'pi',
+    'rio de janeiro'        :   'rj',
+    'rio grande do norte'   :   'rn',
+    'rio grande do sul'     :   'rs',
+    'rondonia'              :   'ro',
+    'roraima'               :   'rr',
+    'santa catarina'        :   'sc',
+    'sao paulo'             :   'sp',
+    'sergipe'               :   'se',
+    'tocantins'             :   'to',
+}
+
+# Prefixo de alguns nomes de Estados retornados pela API (ex.: 'Estado de São Paulo')
+_STATE_PREFIX = re.compile(r'^estado d[eo] ')
+
+
+def normalize_text(value):
+    '''
+    Método para normalizar um texto: composição Unicode (NFC), para que
+    acentos compostos e decompostos sejam iguais, espaços repetidos e nas
+    pontas removidos e letras minúsculas. O resultado é internado (sys.intern),
+    então os valores repetidos compartilham a mesma string.
+
+    Args:
+        value : str | None
+            Texto a ser normalizado
+
+    Returns:
+        str | None
+            Texto normalizado ou None para textos vazios
+    '''
+    if not value:
+        return None
+    value = ' '.join(unicodedata.normalize('NFC', str(value)).split()).lower()
+    return sys.intern(value) if value else None
+
+
+def strip_accents(value):
+    '''
+    Método para remover os acentos de um texto (ex.: 'são paulo' -> 'sao paulo')
+    '''
+    return ''.join(char for char in unicodedata.normalize('NFD', value)
+                   if not unicodedata.combining(char))
+
+
+def normalize_state(value):
+    '''
+    Método para normalizar o nome de um Estado, trocando os nomes dos
+    Estados brasileiros por suas siglas (ex.: 'Rio Grande do Sul' -> 'rs')
+
+    Returns:
+        str | None
+            Sigla ou nome normalizado do Estado
+    '''
+    value = normalize_text(value)
+    if value is None:
+        return None
+    abbreviation = STATE_ABBREVIATIONS.get(_STATE_PREFIX.sub('', strip_accents(value)))
+    return sys.intern(abbreviation) if abbreviation else value
+
+
+class Normalizer:
+    '''
+    Etapa de normalização dos dados obtidos através da API de Mapas, entre
+    a geocodificação e a carga. Cada campo tem um cache limitado (LRU) dos
+    valores já normalizados, então cada nome distinto é normalizado uma
+    única vez, e a taxa de acertos dos caches mostra a economia.
+    '''
+    # Campos de texto de um Point (ver extract.Point) e suas funções de normalização
+    FIELDS = (('street', normalize_text),
+              ('housenumber', normalize_text),
+              ('suburb', normalize_text),
+              ('city', normalize_text),
+              ('postal', normalize_text),
+              ('state', normalize_state),
+              ('country', normalize_text))
+
+    def __init__(self, cache_size=100000):
+        '''
+        Args:
+            cache_size : int
+                Quantidade máxima de valores em cache por campo. None para não limitar
+        '''
+        self.cache_size = cache_size
+        self._caches = {field: lru_cache(maxsize=cache_size)(function)
+                        for field, function in self.FIELDS}
+        # Acertos e falhas dos caches de outros processos (ver merge)
+        self._merged = {field: (0, 0) for field, _ in self.FIELDS}
+
+
+    def normalize(self, point):
+        '''
+        Método para normalizar os textos de um Point
+
+        Args:
+            point : Point
+                Dados do Ponto obtidos através da API
+
+        Returns:
+            Point
+                Dados do Ponto com os textos normalizados
+        '''
+        caches = self._caches
+        return Point(lat=point.lat,
+                    lng=point.lng,
+                    street=caches['street'](point.street),
+                    housenumber=caches['housenumber'](point.housenumber),
+                    suburb=caches['suburb'](point.suburb),
+                    city=caches['city'](point.city),
+                    postal=caches['postal'](point.postal),
+                    state=caches['state'](point.state),
+                    country=caches['country'](point.country))
+
+
+    def normalize_points(self, points):
+        '''
+        Método para normalizar os textos de um gerador de Points
+
+        Returns:
+            Point : generator
+                Um gerador dos Points normalizados
+        '''
+        normalize = self.normalize
+        for point in points:
+            yield normalize(point)
+
+
+    def stats(self):
+        '''
+        Método para pegar os acertos e falhas dos caches de cada campo
+
+        Returns:
+            dict
+                Tupla (acertos, falhas) pelo nome do campo
+        '''
+        stats = {}
+        for field, cache in self._caches.items():
+            info = cache.cache_info()
+            hits, misses = self._merged[field]
+            stats[field] = (info.hits + hits, info.misses + misses)
+        return stats
+
+
+    def merge(self, stats):
+        '''
+        Método para somar os acertos e falhas dos caches de outro processo (ver stats)
+        '''
+        for field, (hits, misses) in stats.items():
+            merged_hits, merged_misses = self._merged[field]
+            self._merged[field] = (merged_hits + hits, merged_misses + misses)
+
+
+    def report(self):
+        '''
+        Método para mostrar a taxa de acertos dos caches de normalização
+        '''
+        stats = self.stats()
+        hits = sum(hits for hits, _ in stats.values())
+        misses = sum(misses for _, misses in stats.values())
+        if hits + misses:
+            LOGGER.info('Normalization cache: %d hits, %d misses (%.1f%% hit rate)',
+                        hits, misses, 100.0 * hits / (hits + misses))